@@ -0,0 +1,280 @@
+"""
+Load Test: /chat/stream, /wrapped and /health
+
+Drives the API with a pool of concurrent virtual users (ramped up over
+--ramp seconds) that pick endpoints by a weighted mix, parses the SSE
+streams incrementally, and reports throughput, time to first byte, time to
+first token (first content event on /chat/stream), latency percentiles and
+error rates per endpoint.
+
+By default it starts the app in-process (uvicorn on a free localhost port)
+with the stub model backend, so no API key is needed:
+
+    python -m benchmarks.load_test --concurrency 50 --duration 30 --ramp 5
+
+Or point it at a running server:
+
+    python -m benchmarks.load_test --url http://localhost:8080 --mix chat=1
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+
+import httpx
+
+
+DEFAULT_MIX = "chat=0.6,wrapped=0.1,health=0.3"
+
+QUESTIONS = [
+    "What was my most watched show?",
+    "What's my viewing personality?",
+    "What did I watch last weekend?",
+    "How did my taste change over the year?",
+    "When did I start watching my top show?",
+    "How do I compare to other viewers?",
+]
+
+
+class SseParser:
+    """
+    Incremental Server-Sent Events parser.
+
+    Feed raw bytes as they arrive; complete events (multi-line data joined
+    with newlines) are returned as soon as their blank-line terminator is
+    seen.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._data: List[str] = []
+
+    def feed(self, chunk: bytes) -> List[str]:
+        self._buffer += chunk.decode("utf-8", errors="replace")
+        events = []
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            line = line.rstrip("\r")
+            if not line:
+                if self._data:
+                    events.append("\n".join(self._data))
+                    self._data = []
+            elif line.startswith("data:"):
+                value = line[5:]
+                self._data.append(value[1:] if value.startswith(" ") else value)
+        return events
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    errors: collections.Counter = field(default_factory=collections.Counter)
+    ttfb: List[float] = field(default_factory=list)
+    first_token: List[float] = field(default_factory=list)
+    latency: List[float] = field(default_factory=list)
+    events: int = 0
+    bytes: int = 0
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(p * len(values)), len(values) - 1)]
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in ("chat", "wrapped", "health"):
+            raise ValueError(f"Unknown endpoint in mix: {name}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, args):
+        self.client = client
+        self.args = args
+        self.mix = parse_mix(args.mix)
+        self.stats: Dict[str, EndpointStats] = collections.defaultdict(EndpointStats)
+        self.rng = random.Random(args.seed)
+
+    async def _timed_request(self, name: str, method: str, url: str, body: Optional[dict], sse: bool):
+        stats = self.stats[name]
+        stats.requests += 1
+        started = time.perf_counter()
+        try:
+            async with self.client.stream(method, url, json=body, timeout=self.args.timeout) as response:
+                parser = SseParser()
+                first_byte = first_token = None
+                error = None
+                async for chunk in response.aiter_raw():
+                    now = time.perf_counter()
+                    if first_byte is None:
+                        first_byte = now
+                    stats.bytes += len(chunk)
+                    if not sse:
+                        continue
+                    for event in parser.feed(chunk):
+                        stats.events += 1
+                        if event.startswith("[ERROR]") or event.startswith("Error:"):
+                            error = "sse_error"
+                        elif first_token is None and not event.startswith(("[STATUS]", "[INFO]", "[DONE]")):
+                            first_token = now
+                finished = time.perf_counter()
+
+            if response.status_code != 200:
+                stats.errors[f"http_{response.status_code}"] += 1
+                return
+            if error:
+                stats.errors[error] += 1
+                return
+            stats.latency.append(finished - started)
+            if first_byte is not None:
+                stats.ttfb.append(first_byte - started)
+            if first_token is not None:
+                stats.first_token.append(first_token - started)
+        except httpx.TimeoutException:
+            stats.errors["timeout"] += 1
+        except httpx.HTTPError as e:
+            stats.errors[type(e).__name__] += 1
+
+    async def _one_request(self, worker: int):
+        name = self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        user_id = f"load_user_{self.rng.randrange(self.args.users)}"
+        if name == "health":
+            await self._timed_request(name, "GET", "/health", None, sse=False)
+        elif name == "wrapped":
+            await self._timed_request(name, "POST", "/wrapped", {"user_id": user_id}, sse=False)
+        else:
+            body = {
+                "message": self.rng.choice(QUESTIONS),
+                "user_id": user_id,
+                "session_id": f"load_{worker}",
+            }
+            await self._timed_request(name, "POST", "/chat/stream", body, sse=True)
+
+    async def _worker(self, worker: int, start_delay: float, stop_at: float):
+        await asyncio.sleep(start_delay)
+        while time.perf_counter() < stop_at:
+            await self._one_request(worker)
+
+    async def run(self) -> float:
+        started = time.perf_counter()
+        stop_at = started + self.args.ramp + self.args.duration
+        step = self.args.ramp / self.args.concurrency
+        await asyncio.gather(*[
+            self._worker(i, i * step, stop_at) for i in range(self.args.concurrency)
+        ])
+        return time.perf_counter() - started
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        def ms(values, p):
+            value = percentile(values, p)
+            return round(value * 1000, 1) if value is not None else None
+
+        report = {"elapsed_s": round(elapsed, 2), "concurrency": self.args.concurrency, "endpoints": {}}
+        for name, stats in sorted(self.stats.items()):
+            errors = sum(stats.errors.values())
+            report["endpoints"][name] = {
+                "requests": stats.requests,
+                "throughput_rps": round(stats.requests / elapsed, 2),
+                "error_rate": round(errors / stats.requests, 4) if stats.requests else 0,
+                "errors": dict(stats.errors),
+                "ttfb_ms": {p: ms(stats.ttfb, q) for p, q in (("p50", .5), ("p95", .95), ("p99", .99))},
+                "first_token_ms": {p: ms(stats.first_token, q) for p, q in (("p50", .5), ("p95", .95), ("p99", .99))},
+                "latency_ms": {p: ms(stats.latency, q) for p, q in (("p50", .5), ("p95", .95), ("p99", .99))},
+                "sse_events": stats.events,
+                "bytes": stats.bytes,
+            }
+        return report
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n{report['concurrency']} virtual users, {report['elapsed_s']}s\n")
+    header = (f"{'endpoint':<10}{'reqs':>7}{'rps':>8}{'err %':>7}"
+              f"{'ttfb p50/p95/p99 ms':>24}{'first token p50/p95':>22}{'latency p50/p95/p99 ms':>27}")
+    print(header)
+    print("-" * len(header))
+
+    def fmt(values, keys):
+        return "/".join("-" if values[k] is None else f"{values[k]:.0f}" for k in keys)
+
+    for name, e in report["endpoints"].items():
+        print(f"{name:<10}{e['requests']:>7}{e['throughput_rps']:>8.1f}{e['error_rate'] * 100:>7.1f}"
+              f"{fmt(e['ttfb_ms'], ['p50', 'p95', 'p99']):>24}"
+              f"{fmt(e['first_token_ms'], ['p50', 'p95']):>22}"
+              f"{fmt(e['latency_ms'], ['p50', 'p95', 'p99']):>27}")
+        if e["errors"]:
+            print(f"{'':<10}errors: {e['errors']}")
+
+
+def start_in_process_server():
+    """Runs the app with uvicorn on a free localhost port in a background thread."""
+    import uvicorn
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    server = uvicorn.Server(uvicorn.Config("my_agent.api:app", host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("In-process server failed to start")
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def main_async(args, base_url: str) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+        test = LoadTest(client, args)
+        elapsed = await test.run()
+        return test.report(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the MyYear.AI API")
+    parser.add_argument("--url", help="Base URL of a running server (default: start the app in-process)")
+    parser.add_argument("--backend", default="stub", help="MODEL_BACKEND for the in-process app (stub/replay/gemini)")
+    parser.add_argument("--concurrency", type=int, default=20, help="Virtual users")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds at full concurrency")
+    parser.add_argument("--ramp", type=float, default=5, help="Seconds to ramp up to full concurrency")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Endpoint weights (default {DEFAULT_MIX})")
+    parser.add_argument("--users", type=int, default=100, help="Distinct user IDs")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request timeout (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        os.environ["MODEL_BACKEND"] = args.backend
+        server, base_url = start_in_process_server()
+
+    try:
+        report = asyncio.run(main_async(args, base_url))
+    finally:
+        if server is not None:
+            server.should_exit = True
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
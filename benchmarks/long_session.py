@@ -0,0 +1,107 @@
+"""
+Benchmark: per-turn latency over a long chat session, with and without compaction
+
+Replays a 100-turn conversation in which every turn calls an analysis tool
+with the viewing data (the same shape of history the agents build up), and
+sends each turn's request to a stub model whose latency grows with prompt
+size. Without compaction the prompt and latency grow with every turn; with
+compaction they level off once the token threshold is reached.
+
+Usage:
+    python -m benchmarks.long_session --turns 100 --ms-per-1k-tokens 2
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+import pandas as pd
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types
+
+from my_agent import config
+from my_agent.compaction import compact_contents, estimate_tokens
+from my_agent.models import StubLlm
+from my_agent.tools.csv_tools import calculate_personal_stats, read_viewing_history
+
+QUESTIONS = [
+    "What was my most watched show?",
+    "How many hours did I watch in total?",
+    "What's my favourite genre?",
+    "When do I usually watch?",
+    "Am I a binge watcher?",
+]
+
+
+def build_turn(i: int, csv_path: str, records: List[dict], stats: dict) -> List[types.Content]:
+    """One question -> tool call -> tool result -> answer exchange."""
+    question = QUESTIONS[i % len(QUESTIONS)]
+    if i == 0:
+        question = f"I want to chat about my viewing history from: {csv_path}"
+        call = types.FunctionCall(id=f"call-{i}", name="read_viewing_data", args={"file_path": csv_path})
+        result = read_viewing_history(csv_path)
+    else:
+        call = types.FunctionCall(id=f"call-{i}", name="calculate_stats", args={"data": records})
+        result = stats
+    return [
+        types.Content(role="user", parts=[types.Part(text=question)]),
+        types.Content(role="model", parts=[types.Part(function_call=call)]),
+        types.Content(role="user", parts=[types.Part(function_response=types.FunctionResponse(
+            id=call.id, name=call.name, response=result))]),
+        types.Content(role="model", parts=[types.Part(
+            text=f"Here's what I found for '{question}': " + "Your viewing shows some clear habits. " * 15)]),
+    ]
+
+
+async def run_session(args, compaction: bool, csv_path: str, records: List[dict], stats: dict):
+    model = StubLlm(model="stub", latency_ms=args.latency_ms, jitter_ms=0, ms_per_1k_tokens=args.ms_per_1k_tokens)
+    history: List[types.Content] = []
+    rows = []
+    for turn in range(args.turns):
+        exchange = build_turn(turn, csv_path, records, stats)
+        started = time.perf_counter()
+        contents = history + exchange[:1]
+        if compaction:
+            contents = compact_contents(contents, args.threshold, args.keep_turns) or contents
+        async for _ in model.generate_content_async(LlmRequest(model="stub", contents=contents)):
+            pass
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        rows.append({"turn": turn + 1, "tokens": estimate_tokens(contents), "latency_ms": elapsed_ms})
+        history += exchange
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-turn latency over a long session")
+    parser.add_argument("--csv", default="data/my_viewing_history.csv")
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--records", type=int, default=50, help="Records passed to each tool call")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=2)
+    parser.add_argument("--threshold", type=int, default=config.COMPACTION_TOKEN_THRESHOLD)
+    parser.add_argument("--keep-turns", type=int, default=config.COMPACTION_KEEP_TURNS)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv)
+    records = df.head(args.records).to_dict("records")
+    stats = calculate_personal_stats(records)
+
+    results = {}
+    for compaction in (False, True):
+        results[compaction] = asyncio.run(run_session(args, compaction, args.csv, records, stats))
+
+    print(f"{args.turns} turns, {args.records} records per tool call, threshold {args.threshold} tokens, "
+          f"keep {args.keep_turns} turns\n")
+    print(f"{'turn':>6}{'tokens (full)':>16}{'ms (full)':>12}{'tokens (compacted)':>21}{'ms (compacted)':>17}")
+    checkpoints = sorted({1, 5, 10, 25, 50, 75, args.turns} & set(range(1, args.turns + 1)))
+    for turn in checkpoints:
+        full, compact = results[False].iloc[turn - 1], results[True].iloc[turn - 1]
+        print(f"{turn:>6}{int(full.tokens):>16,}{full.latency_ms:>12.0f}{int(compact.tokens):>21,}{compact.latency_ms:>17.0f}")
+
+    last = results[True].tail(max(args.turns // 4, 1))
+    print(f"\nCompacted, last {len(last)} turns: latency p50 {last.latency_ms.median():.0f}ms, "
+          f"max {last.latency_ms.max():.0f}ms; full history final turn {results[False].latency_ms.iloc[-1]:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark: timeouts, retries and hedging against a fake model
+
+Fires many concurrent calls through ManagedLlm at a StubLlm that is
+sometimes slow and sometimes fails, once per call policy, and prints the
+success rate and latency percentiles of each.
+
+Usage:
+    python -m benchmarks.model_resilience --calls 500 --slow-rate 0.05 --failure-rate 0.05
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Dict, Any, List
+
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types
+
+from my_agent.models import AdmissionController, CallPolicy, ManagedLlm, ModelLimits, StubLlm
+from my_agent.models.resilience import CallStats, call_stats
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(int(p * len(values)), len(values) - 1)] if values else float("nan")
+
+
+async def run_policy(name: str, policy: CallPolicy, args) -> Dict[str, Any]:
+    model = "fake-model"
+    controller = AdmissionController(
+        {model: ModelLimits(max_concurrency=args.concurrency * 2, max_queue=args.calls, queue_timeout_s=600)}
+    )
+    llm = ManagedLlm(
+        model=model,
+        agent_name=name,
+        controller=controller,
+        policy=policy,
+        inner=StubLlm(
+            model=model,
+            latency_ms=args.latency_ms,
+            jitter_ms=args.latency_ms * 0.2,
+            slow_rate=args.slow_rate,
+            slow_latency_ms=args.slow_latency_ms,
+            failure_rate=args.failure_rate,
+        ),
+    )
+    request = LlmRequest(model=model, contents=[types.Content(role="user", parts=[types.Part(text="hi")])])
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, errors = [], 0
+
+    async def one_call():
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                async for _ in llm.generate_content_async(request):
+                    pass
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                errors += 1
+
+    call_stats[name] = CallStats()
+    started = time.perf_counter()
+    await asyncio.gather(*[one_call() for _ in range(args.calls)])
+    elapsed = time.perf_counter() - started
+    stats = call_stats[name]
+
+    return {
+        "policy": name,
+        "ok": f"{100 * len(latencies) / args.calls:.1f}%",
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "retries": stats.retries,
+        "hedges": stats.hedges,
+        "hedge_wins": stats.hedge_wins,
+        "timeouts": stats.timeouts,
+        "qps": args.calls / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark model call timeouts/retries/hedging")
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-latency-ms", type=float, default=3000)
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--timeout-s", type=float, default=1.0)
+    parser.add_argument("--hedge-after-ms", type=float, default=250)
+    args = parser.parse_args()
+    logging.getLogger("my_agent.models").setLevel(logging.ERROR)  # Retry warnings are expected here
+
+    policies = {
+        "baseline": CallPolicy(timeout_s=600, max_retries=0),
+        "retries": CallPolicy(timeout_s=600, max_retries=3, backoff_base_s=0.05),
+        "timeout+retries": CallPolicy(timeout_s=args.timeout_s, max_retries=3, backoff_base_s=0.05),
+        "timeout+retries+hedge": CallPolicy(
+            timeout_s=args.timeout_s, max_retries=3, backoff_base_s=0.05,
+            hedge_after_s=args.hedge_after_ms / 1000
+        ),
+    }
+
+    print(f"{args.calls} calls, concurrency {args.concurrency}, latency {args.latency_ms:.0f}ms, "
+          f"{args.slow_rate:.0%} slow ({args.slow_latency_ms:.0f}ms), {args.failure_rate:.0%} failing\n")
+    header = f"{'policy':<24}{'ok':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'retries':>9}{'hedges':>8}{'wins':>6}{'t/o':>5}{'qps':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, policy in policies.items():
+        r = asyncio.run(run_policy(name, policy, args))
+        print(f"{r['policy']:<24}{r['ok']:>8}{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}{r['p99_ms']:>9.0f}"
+              f"{r['retries']:>9}{r['hedges']:>8}{r['hedge_wins']:>6}{r['timeouts']:>5}{r['qps']:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: peak and retained memory of each agent tool
+
+Runs every pattern_finder and quiz tool on the sample viewing history (or a
+copy of it scaled up with --scale) under tracemalloc, with memoization off,
+and reports per tool the peak memory above the starting level, what stayed
+allocated afterwards, and the lines of this package whose allocations were
+live at the peak. Copy-heavy tools show up as a peak many times the size of
+the input records.
+
+Usage:
+    python -m benchmarks.tool_memory --scale 10 --repeat 3
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+from my_agent import config
+from my_agent.agents import pattern_finder_agent as pf
+from my_agent.agents import quiz_agent as quiz
+from my_agent.memory_profiling import ensure_tracing, memory_report, reset_memory_stats
+
+
+def scaled_records(csv_path: str, scale: int) -> list:
+    """The CSV's records repeated `scale` times, shifted a year back per copy."""
+    df = pd.read_csv(csv_path)
+    copies = []
+    for i in range(scale):
+        copy = df.copy()
+        copy["date"] = (pd.to_datetime(copy["date"]) - pd.DateOffset(years=i)).dt.strftime("%Y-%m-%d")
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True).to_dict("records")
+
+
+def run_tools(csv_path: str, records: list):
+    stats = pf.calculate_stats(records)
+    show = records[0]["show_name"]
+    dates = sorted(r["date"] for r in records)
+
+    pf.read_viewing_data(csv_path)
+    pf.get_personality(stats)
+    pf.analyze_evolution(records)
+    pf.analyze_evolution(records, granularity="rolling")
+    pf.get_date_viewing(records, dates[len(dates) // 2])
+    pf.get_viewing_between(records, dates[0], dates[-1])
+    pf.get_period_viewing(records, "last month")
+    pf.get_show_timeline(records, show)
+    pf.analyze_sessions(records)
+    pf.compare_with_population(stats)
+    quiz.get_random_viewing_date(records)
+    quiz.compare_guess_to_reality(show.lower(), show, sorted({r["show_name"] for r in records}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak/retained memory per agent tool")
+    parser.add_argument("--csv", default="data/my_viewing_history.csv")
+    parser.add_argument("--scale", type=int, default=1, help="Copies of the CSV's records passed to each tool")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--frames", type=int, default=config.MEMORY_PROFILE_FRAMES, help="tracemalloc traceback depth")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    config.MEMORY_PROFILING_ENABLED = True
+    config.MEMORY_PROFILE_FRAMES = args.frames
+    config.TOOL_MEMO_ENABLED = False  # Measure the computation, not cache hits
+
+    records = scaled_records(args.csv, args.scale)
+    input_mb = len(json.dumps(records, default=str)) / 2**20
+
+    ensure_tracing()
+    reset_memory_stats()
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        run_tools(args.csv, records)
+    elapsed = time.perf_counter() - started
+    report = memory_report(recent=0)
+    tracemalloc.stop()
+
+    print(f"{len(records):,} records (~{input_mb:.1f} MB as JSON), {args.repeat} run(s) in {elapsed:.1f}s "
+          f"under tracemalloc\n")
+    header = f"{'tool':<26}{'calls':>6}{'peak MB':>10}{'max MB':>9}{'x input':>9}{'retained KB':>13}  top site"
+    print(header)
+    print("-" * (len(header) + 30))
+    tools = sorted(report["tools"].items(), key=lambda item: -item[1]["peak_mb_max"])
+    for name, s in tools:
+        top = s["top_sites"][0] if s["top_sites"] else None
+        top_text = f"{top['site']} ({top['mb']:.2f} MB)" if top else "-"
+        print(f"{name:<26}{s['calls']:>6}{s['peak_mb_mean']:>10.2f}{s['peak_mb_max']:>9.2f}"
+              f"{s['peak_mb_max'] / input_mb:>9.1f}{s['retained_kb_mean']:>13.1f}  {top_text}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"records": len(records), "input_mb": round(input_mb, 3), **report}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
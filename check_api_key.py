@@ -18,6 +18,12 @@ try:
 except ImportError:
     print("ℹ️  python-dotenv not installed (optional)")
 
+# Offline backends don't need a key
+backend = os.getenv("MODEL_BACKEND", "gemini").lower()
+if backend in ("stub", "replay"):
+    print(f"✅ MODEL_BACKEND={backend}: running offline, no GOOGLE_API_KEY needed")
+    sys.exit(0)
+
 # Check for API key
 api_key = os.getenv("GOOGLE_API_KEY")
 
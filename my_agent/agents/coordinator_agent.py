@@ -6,6 +6,8 @@ KEY CONCEPTS:
 - Agent-to-agent communication
 """
 from google.adk.agents.llm_agent import Agent
+from my_agent.compaction import compact_history
+from my_agent.models import build_model
 from my_agent.agents.pattern_finder_agent import pattern_finder
 from my_agent.agents.storyteller_agent import storyteller
 from my_agent.agents.quiz_agent import quiz_agent
@@ -15,8 +17,9 @@ from my_agent.agents.social_agent import social_agent
 # Main Coordinator Agent - orchestrates all sub-agents
 # KEY CONCEPT: Multi-agent system with sequential coordination
 personal_curator = Agent(
-    model='gemini-2.5-flash-lite',
+    model=build_model('gemini-2.5-flash-lite', 'personal_curator'),
     name='personal_curator',
+    before_model_callback=compact_history,
     description='''Your personal entertainment companion who knows your 
     viewing history and creates a fun, insightful story about your year in watching.''',
     
@@ -2,21 +2,34 @@
 Pattern Finder Agent
 KEY CONCEPT: Specialized agent in multi-agent system with custom tools
 """
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from google.adk.agents.llm_agent import Agent
+from my_agent.compaction import compact_history
+from my_agent.memory_profiling import track_allocations
+from my_agent.tracing import annotate_tool_span
+from my_agent.models import build_model
 from google.adk.tools import FunctionTool
 from my_agent.tools.csv_tools import (
     read_viewing_history, 
     calculate_personal_stats,
-    get_viewing_by_date
+    get_viewing_by_date,
+    get_viewing_between as get_viewing_in_range
 )
 from my_agent.tools.personality_tools import (
     determine_viewing_personality,
     analyze_viewing_evolution
 )
+from my_agent.tools.date_tools import resolve_date_range
+from my_agent.tools.heatmap_tools import get_viewing_heatmap
+from my_agent.tools.population_tools import compare_to_population
+from my_agent.tools.rollup_tools import query_viewing_rollup
+from my_agent.tools.session_tools import get_session_stats
+from my_agent.tools.sql_tools import run_sql_query
+from my_agent.tools.show_tools import get_show_history
 
 
 # Wrap custom tools for ADK using FunctionTool
+@track_allocations
 def read_viewing_data(file_path: str) -> Dict[str, Any]:
     """
     Reads user's viewing history from CSV file.
@@ -30,6 +43,7 @@ def read_viewing_data(file_path: str) -> Dict[str, Any]:
     return read_viewing_history(file_path)
 
 
+@track_allocations
 def calculate_stats(data: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Calculates personalized viewing statistics.
@@ -43,6 +57,7 @@ def calculate_stats(data: List[Dict[str, Any]]) -> Dict[str, Any]:
     return calculate_personal_stats(data)
 
 
+@track_allocations
 def get_personality(stats: Dict[str, Any]) -> Dict[str, Any]:
     """
     Determines viewing personality type.
@@ -56,19 +71,27 @@ def get_personality(stats: Dict[str, Any]) -> Dict[str, Any]:
     return determine_viewing_personality(stats)
 
 
-def analyze_evolution(data: List[Dict[str, Any]]) -> Dict[str, Any]:
+@track_allocations
+def analyze_evolution(
+    data: List[Dict[str, Any]],
+    granularity: str = "quarter",
+    window_days: int = 30
+) -> Dict[str, Any]:
     """
     Analyzes how viewing habits evolved over time.
     
     Args:
         data: List of viewing records
+        granularity: "week", "month", "quarter" or "rolling"
+        window_days: Window length in days when granularity is "rolling"
         
     Returns:
-        Evolution analysis by time period
+        Evolution analysis by time period, with turning-point dates
     """
-    return analyze_viewing_evolution(data)
+    return analyze_viewing_evolution(data, granularity, window_days)
 
 
+@track_allocations
 def get_date_viewing(data: List[Dict[str, Any]], target_date: str) -> Dict[str, Any]:
     """
     Gets viewing information for a specific date (for quiz feature).
@@ -83,10 +106,161 @@ def get_date_viewing(data: List[Dict[str, Any]], target_date: str) -> Dict[str,
     return get_viewing_by_date(data, target_date)
 
 
+@track_allocations
+def get_viewing_between(data: List[Dict[str, Any]], start_date: str, end_date: str) -> Dict[str, Any]:
+    """
+    Gets viewing information for a whole date range in one call.
+    
+    Args:
+        data: List of viewing records
+        start_date: First date in YYYY-MM-DD format (inclusive)
+        end_date: Last date in YYYY-MM-DD format (inclusive)
+        
+    Returns:
+        Totals, top shows and a per-day breakdown for the range
+    """
+    return get_viewing_in_range(data, start_date, end_date)
+
+
+@track_allocations
+def get_period_viewing(data: List[Dict[str, Any]], expression: str) -> Dict[str, Any]:
+    """
+    Answers "what did I watch <when>?" for relative or holiday expressions.
+    
+    Args:
+        data: List of viewing records
+        expression: e.g. "last Friday", "Chinese New Year week", "last month"
+        
+    Returns:
+        The resolved date range plus what was watched in it
+    """
+    resolved = resolve_date_range(expression, data)
+    if not resolved.get("success"):
+        return resolved
+    viewing = get_viewing_in_range(data, resolved["start_date"], resolved["end_date"])
+    viewing["period"] = resolved["label"]
+    return viewing
+
+
+@track_allocations
+def get_show_timeline(file_path: str, show_name: str) -> Dict[str, Any]:
+    """
+    Gets the history of one show: when it was started and last watched,
+    episodes, minutes, longest daily streak and season progression.
+    
+    Args:
+        file_path: Path to the CSV file (or dataset:// reference)
+        show_name: Show to look up (typos and nicknames are fine)
+        
+    Returns:
+        Per-show viewing history
+    """
+    return get_show_history(file_path, show_name)
+
+
+@track_allocations
+def analyze_sessions(data: List[Dict[str, Any]], idle_minutes: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Rebuilds binge sessions from timestamps (works without session_id).
+    
+    Args:
+        data: List of viewing records
+        idle_minutes: Minutes of inactivity that end a session (optional, default from config)
+        
+    Returns:
+        Episodes per session, session lengths and longest marathon
+    """
+    return get_session_stats(data, idle_minutes)
+
+
+@track_allocations
+def compare_with_population(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compares the user's stats against all viewers (percentiles).
+    
+    Args:
+        stats: Dictionary with viewing statistics from calculate_stats
+        
+    Returns:
+        Percentile of each metric within the viewer population
+    """
+    return compare_to_population(stats)
+
+
+@track_allocations
+def slice_viewing(
+    file_path: str,
+    group_by: Optional[List[str]] = None,
+    months: Optional[List[str]] = None,
+    genres: Optional[List[str]] = None,
+    days_of_week: Optional[List[str]] = None,
+    hours: Optional[List[int]] = None,
+    shows: Optional[List[str]] = None,
+    limit: int = 20
+) -> Dict[str, Any]:
+    """
+    Answers ad-hoc "how much X did I watch when Y" questions from precomputed rollups.
+    
+    Args:
+        file_path: Path to the CSV file (or dataset:// reference)
+        group_by: Break down by any of "month", "genre", "day_of_week", "hour", "show"
+        months: "2024-07", month names ("July", "March 2023") or quarters ("Q3")
+        genres: Genres to include
+        days_of_week: Day names, "weekend" or "weekday"
+        hours: Starting hours (0-23), e.g. [21, 22, 23, 0, 1] for late nights
+        shows: Shows to include (typos are fine)
+        limit: Maximum number of groups, by minutes watched
+        
+    Returns:
+        Minutes, hours, views, completions and rewatches for the slice and per group
+    """
+    return query_viewing_rollup(
+        file_path, group_by=group_by, months=months, genres=genres,
+        days_of_week=days_of_week, hours=hours, shows=shows, limit=limit
+    )
+
+
+@track_allocations
+def get_time_heatmap(file_path: str) -> Dict[str, Any]:
+    """
+    Minutes watched per day of week x hour, with a rendered heatmap for the wrapped card.
+    
+    Args:
+        file_path: Path to the CSV file (or dataset:// reference)
+        
+    Returns:
+        7x24 grid, peak slot, night/morning/weekend shares, patterns
+        (Night Owl, Weekend Warrior, ...) and the heatmap image path
+    """
+    return get_viewing_heatmap(file_path)
+
+
+@track_allocations
+def query_viewing_sql(file_path: str, query: str, limit: int = 50) -> Dict[str, Any]:
+    """
+    Runs one read-only SQLite SELECT over the table `viewing`.
+    
+    Columns: date ('YYYY-MM-DD HH:MM:SS'), month ('YYYY-MM'), day_of_week
+    ('Saturday'), hour (0-23), show_name, season, episode, genre,
+    duration_minutes, completed (0/1), is_rewatch (0/1), session_id.
+    
+    Args:
+        file_path: Path to the CSV file (or dataset:// reference)
+        query: A single SELECT statement
+        limit: Maximum rows returned
+        
+    Returns:
+        Column names and result rows; the schema if the query failed
+    """
+    return run_sql_query(file_path, query, limit)
+
+
 # Pattern Finder Agent Definition
 pattern_finder = Agent(
-    model='gemini-2.5-flash-lite',
+    model=build_model('gemini-2.5-flash-lite', 'pattern_finder'),
     name='pattern_finder',
+    before_model_callback=compact_history,
+    after_tool_callback=annotate_tool_span,
     description='Discovers interesting patterns in personal viewing habits',
     
     instruction='''You are a pattern discovery specialist who finds cool insights 
@@ -106,8 +280,30 @@ pattern_finder = Agent(
     - read_viewing_data: Load viewing history
     - calculate_stats: Get statistical analysis
     - get_personality: Determine personality type
-    - analyze_evolution: Track changes over time
+    - analyze_evolution: Track changes over time (by week, month, quarter or
+      rolling window). Its turning_points give the exact dates the genre mix
+      shifted - pass them to the storyteller as the story's key moments
     - get_date_viewing: Get specific date info
+    - get_period_viewing: What was watched "last Friday", "over Chinese New
+      Year week", "last month"... (resolves the date for you, one call)
+    - get_viewing_between: What was watched between two YYYY-MM-DD dates
+    - get_show_timeline: "When did I start watching X?" - first/last watched,
+      episodes, longest streak and season progression for one show. Takes
+      the file path, not the loaded records
+    - analyze_sessions: Binge sessions, session lengths and the longest marathon
+    - compare_with_population: See how the user ranks against all viewers
+      (e.g. "you watched more than 87% of Astro viewers")
+    - get_time_heatmap: When in the week they watch (7 days x 24 hours) - the
+      evidence for "night owl" / "weekend warrior" claims, plus a heatmap
+      image for the wrapped card. Takes the file path
+    - slice_viewing: Ad-hoc totals for any mix of month/quarter, genre, day of
+      week, hour and show, e.g. "How much Drama on weekend nights in Q3?" or
+      "Which genre did I watch most each month?" (group_by). Takes the file
+      path, answers instantly - prefer it over loading and scanning the data
+    - query_viewing_sql: One read-only SQL SELECT over the `viewing` table for
+      anything the other tools can't answer directly (top-N, ratios, first
+      or last occurrences, multi-step aggregates). One query instead of a
+      chain of tool calls; takes the file path
     
     Always be enthusiastic about discoveries! Use emojis and friendly language.
     Frame insights positively and make them personally meaningful.
@@ -119,7 +315,15 @@ pattern_finder = Agent(
         FunctionTool(calculate_stats),
         FunctionTool(get_personality),
         FunctionTool(analyze_evolution),
-        FunctionTool(get_date_viewing)
+        FunctionTool(get_date_viewing),
+        FunctionTool(get_period_viewing),
+        FunctionTool(get_viewing_between),
+        FunctionTool(get_show_timeline),
+        FunctionTool(analyze_sessions),
+        FunctionTool(compare_with_population),
+        FunctionTool(get_time_heatmap),
+        FunctionTool(slice_viewing),
+        FunctionTool(query_viewing_sql)
     ],
 )
 
@@ -2,14 +2,21 @@
 Quiz Agent
 KEY CONCEPT: Interactive agent for Q&A with session management
 """
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from google.adk.agents.llm_agent import Agent
+from my_agent.compaction import compact_history
+from my_agent.memory_profiling import track_allocations
+from my_agent.tracing import annotate_tool_span
+from my_agent.models import build_model
 from google.adk.tools import FunctionTool
 from my_agent.tools.csv_tools import get_viewing_by_date
+from my_agent.tools.facts_tools import get_user_facts
+from my_agent.tools.matching_tools import get_show_index, normalize_show_name
 import random
 from datetime import datetime, timedelta
 
 
+@track_allocations
 def get_random_viewing_date(data: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Picks a random date from viewing history for quiz questions.
@@ -46,7 +53,8 @@ def get_random_viewing_date(data: List[Dict[str, Any]]) -> Dict[str, Any]:
             "success": True,
             "date": date_str,
             "date_formatted": random_date.strftime('%B %d, %Y'),
-            "viewing_info": viewing_info
+            "viewing_info": viewing_info,
+            "catalog": sorted(df['show_name'].dropna().unique().tolist()) if 'show_name' in df.columns else []
         }
     except Exception as e:
         return {
@@ -55,23 +63,55 @@ def get_random_viewing_date(data: List[Dict[str, Any]]) -> Dict[str, Any]:
         }
 
 
-def compare_guess_to_reality(user_guess: str, actual_show: str)-> Dict[str, Any]:
+@track_allocations
+def get_fun_facts(file_path: str, limit: int = 5) -> Dict[str, Any]:
+    """
+    Gets the user's most notable precomputed viewing facts, each with a quiz question.
+    
+    Args:
+        file_path: Path to the CSV file (or dataset:// reference)
+        limit: Number of facts to return, most notable first
+        
+    Returns:
+        Ranked facts with headline, value and a quiz seed (question,
+        answer, answer_type and multiple-choice options)
+    """
+    return get_user_facts(file_path, limit=limit)
+
+
+@track_allocations
+def compare_guess_to_reality(
+    user_guess: str,
+    actual_show: str,
+    catalog: Optional[List[str]] = None
+) -> Dict[str, Any]:
     """
     Compares user's guess to actual viewing data.
     
+    Typos, acronyms and aliases ("Stranger Thngs", "B99") are graded locally
+    with the show-name index, so no extra model turn is needed.
+    
     Args:
         user_guess: What the user guessed
         actual_show: What they actually watched
+        catalog: All show names in the user's history (optional, lets a
+            guess that is closer to a different show count as wrong)
         
     Returns:
-        Comparison result with fun feedback
+        Comparison result with fun feedback and similarity score
     """
-    # Normalize strings for comparison
-    guess_normalized = user_guess.lower().strip()
-    actual_normalized = actual_show.lower().strip()
+    index = get_show_index(catalog or [actual_show])
+    match = index.grade(user_guess, actual_show)
+    
+    # Plain containment still counts ("I think it was Friends")
+    guess_normalized = normalize_show_name(user_guess)
+    actual_normalized = normalize_show_name(actual_show)
+    contains_answer = len(guess_normalized) >= 3 and (
+        f" {actual_normalized} " in f" {guess_normalized} "
+    )
     
     # Check if correct
-    is_correct = guess_normalized in actual_normalized or actual_normalized in guess_normalized
+    is_correct = match["is_correct"] or contains_answer
     
     # Generate feedback
     if is_correct:
@@ -93,14 +133,17 @@ def compare_guess_to_reality(user_guess: str, actual_show: str)-> Dict[str, Any]
         "is_correct": is_correct,
         "feedback": random.choice(feedback),
         "user_guess": user_guess,
-        "actual_show": actual_show
+        "actual_show": actual_show,
+        "similarity": 1.0 if contains_answer else match["similarity"]
     }
 
 
 # Quiz Agent Definition
 quiz_agent = Agent(
-    model='gemini-2.5-flash-lite',
+    model=build_model('gemini-2.5-flash-lite', 'quiz_agent'),
     name='quiz_agent',
+    before_model_callback=compact_history,
+    after_tool_callback=annotate_tool_span,
     description='Creates fun interactive quiz about user viewing habits',
     
     instruction='''You are an engaging quiz master who creates playful, 
@@ -133,13 +176,22 @@ quiz_agent = Agent(
     That was the start of your prestige TV era!"
     
     Tools available:
+    - get_fun_facts: Ranked fun facts (busiest day, longest binge, latest
+      night, comfort show, genre swing...) each with a ready-made question,
+      answer and choices. One cheap call - start here when you have the
+      file path, and use the quiz seeds as your questions
     - get_random_viewing_date: Get a random date for questions
-    - compare_guess_to_reality: Check if user's guess is correct
+    - compare_guess_to_reality: Check if user's guess is correct (handles
+      typos and nicknames; pass the list of shows as catalog when you have it)
     
     Always be encouraging, fun, and make the user feel good about 
     their viewing habits!
     ''',
     
-    tools=[FunctionTool(get_random_viewing_date), FunctionTool(compare_guess_to_reality)],
+    tools=[
+        FunctionTool(get_fun_facts),
+        FunctionTool(get_random_viewing_date),
+        FunctionTool(compare_guess_to_reality)
+    ],
 )
 
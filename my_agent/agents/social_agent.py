@@ -2,13 +2,60 @@
 Social Share Agent
 KEY CONCEPT: Agent for generating shareable social content
 """
+from typing import Any, Dict, Optional
 from google.adk.agents.llm_agent import Agent
+from google.adk.tools import FunctionTool
+from my_agent.compaction import compact_history
+from my_agent.memory_profiling import track_allocations
+from my_agent.tracing import annotate_tool_span
+from my_agent.models import build_model
+from my_agent.tools.card_tools import create_share_card
+from my_agent.tools.facts_tools import get_user_facts
+
+
+@track_allocations
+def get_shareable_facts(file_path: str, limit: int = 5) -> Dict[str, Any]:
+    """
+    Gets the user's most notable precomputed viewing facts for posts.
+    
+    Args:
+        file_path: Path to the CSV file (or dataset:// reference)
+        limit: Number of facts to return, most notable first
+        
+    Returns:
+        Ranked facts with a headline, value and notability score
+    """
+    return get_user_facts(file_path, limit=limit)
+
+
+@track_allocations
+def make_share_card(
+    file_path: str,
+    post_text: str,
+    user_id: Optional[str] = None,
+    template: str = "midnight"
+) -> Dict[str, Any]:
+    """
+    Renders a post as a shareable image card.
+    
+    Args:
+        file_path: Path to the CSV file (or dataset:// reference)
+        post_text: The post to put on the card
+        user_id: User the card is for (optional for single-user histories)
+        template: Card theme: "midnight", "sunset" or "paper"
+        
+    Returns:
+        Card image URLs; the card adds the personality emoji and top stats
+    """
+    return create_share_card(file_path, post_text, user_id=user_id, template=template)
 
 
 # Social Share Agent Definition
 social_agent = Agent(
-    model='gemini-2.5-flash-lite',
+    model=build_model('gemini-2.5-flash-lite', 'social_agent'),
     name='social_agent',
+    before_model_callback=compact_history,
+    after_tool_callback=annotate_tool_span,
     description='Generates shareable social media content from viewing insights',
     
     instruction='''You are a social media expert who creates viral-ready, 
@@ -54,8 +101,19 @@ social_agent = Agent(
     - One for starting conversations
     - One with strong visuals/emojis
     
+    If you have the viewing history file path, call get_shareable_facts
+    first: it returns the user's most notable facts (busiest day, longest
+    binge, latest night, comfort show, genre swing...) ranked by how
+    remarkable they are. Build posts around the top ones.
+    
+    Then call make_share_card with your best post: it renders the post as
+    an image card (with the personality emoji and top stats) and returns
+    its URL. Share the card URL along with the posts.
+    
     Always include relevant hashtags and keep it authentic and relatable!
     ''',
+    
+    tools=[FunctionTool(get_shareable_facts), FunctionTool(make_share_card)],
 )
 
 
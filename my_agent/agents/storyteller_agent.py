@@ -3,12 +3,15 @@ Storyteller Agent
 KEY CONCEPT: Specialized agent for narrative generation using Gemini Pro
 """
 from google.adk.agents.llm_agent import Agent
+from my_agent.compaction import compact_history
+from my_agent.models import build_model
 
 
 # Storyteller Agent Definition
 storyteller = Agent(
-    model='gemini-2.5-pro',  # Using Pro for better creative storytelling
+    model=build_model('gemini-2.5-pro', 'storyteller'),  # Using Pro for better creative storytelling
     name='storyteller',
+    before_model_callback=compact_history,
     description='Creates personalized narrative about viewing year',
     
     instruction='''You are a creative writer who transforms viewing data into 
@@ -3,16 +3,32 @@ FastAPI Server for MyYear.AI
 KEY CONCEPT: Agent deployment via REST API
 Enables cloud deployment to Cloud Run or similar platforms
 """
-from fastapi import FastAPI, HTTPException, UploadFile, File
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 import asyncio
+import math
 import os
+import re
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.adk.runners import InMemoryRunner
 from google.adk.sessions import InMemorySessionService
 from google.genai import types
 from my_agent.agents.coordinator_agent import personal_curator
+from my_agent import config, dataset_store
+from my_agent.compaction import get_compaction_stats
+from my_agent.ingest import CsvStreamIngestor, UploadTooLargeError, UploadValidationError
+from my_agent.tools import card_tools
+from my_agent.tools.facts_tools import materialize_facts
+from my_agent.tools.heatmap_tools import IMAGE_FORMATS, PNG_AVAILABLE, get_heatmap_image
+from my_agent.tools.rollup_tools import materialize_rollup
+from my_agent.tools.show_tools import ShowHistoryIndex, register_show_history
+from my_agent.tools.memo import memo_scope, memo_stats, set_memo_scope
+from my_agent.models import AdmissionRejected, ModelCallError, admission_controller, call_stats
+from my_agent.profiling import ProfilingMiddleware, tag_profile
+from my_agent.memory_profiling import MemoryProfilingMiddleware, memory_report, reset_memory_stats
+from my_agent.tracing import TracingMiddleware, annotate_span, setup_tracing
 from pathlib import Path
 # Load environment variables from .env file if it exists
 try:
@@ -29,6 +45,14 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Opt-in CPU profiling of individual requests (X-Profile header or PROFILE_SAMPLE_RATE)
+app.add_middleware(ProfilingMiddleware)
+# Allocation profiling per request and per tool (MEMORY_PROFILING_ENABLED)
+app.add_middleware(MemoryProfilingMiddleware)
+# Root span per request; agents, model calls and tools nest under it (TRACING_EXPORTER)
+setup_tracing()
+app.add_middleware(TracingMiddleware)
+
 
 # Session service for stateful conversations
 session_service = InMemorySessionService()
@@ -44,6 +68,7 @@ class ChatRequest(BaseModel):
     message: str
     session_id: Optional[str] = "default"
     user_id: Optional[str] = "user_001"
+    dataset_id: Optional[str] = None  # From /upload; defaults to the bundled CSV
 
 
 class ChatResponse(BaseModel):
@@ -53,6 +78,63 @@ class ChatResponse(BaseModel):
 
 class WrappedRequest(BaseModel):
     user_id: Optional[str] = "user_001"
+    dataset_id: Optional[str] = None  # From /upload; defaults to the bundled CSV
+
+
+class CardRequest(BaseModel):
+    text: str
+    user_id: Optional[str] = None  # Needed for multi-user datasets
+    dataset_id: Optional[str] = None  # From /upload; defaults to the bundled CSV
+    template: str = card_tools.DEFAULT_THEME
+    format: str = "svg"
+
+
+class CampaignCardsRequest(BaseModel):
+    dataset_id: Optional[str] = None  # From /upload; defaults to the bundled CSV
+    user_ids: Optional[List[str]] = None  # Defaults to every user in the dataset
+    caption: str = card_tools.DEFAULT_CAPTION
+    template: str = card_tools.DEFAULT_THEME
+    format: str = "svg"
+
+
+def resolve_data_path(dataset_id: Optional[str]) -> str:
+    """Path the agents should load: an uploaded dataset or the bundled CSV."""
+    if not dataset_id:
+        return CSV_PATH
+    if dataset_store.open_dataset(dataset_id) is None:
+        raise HTTPException(status_code=404, detail=f"Dataset not found: {dataset_id}")
+    dataset_store.touch_dataset(dataset_id)
+    return dataset_store.dataset_uri(dataset_id)
+
+
+# Models each endpoint needs, checked up front so saturated requests are shed early
+CHAT_MODELS = ["gemini-2.5-flash-lite"]
+WRAPPED_MODELS = ["gemini-2.5-flash-lite", "gemini-2.5-pro"]
+
+
+def admission_error(rejection: AdmissionRejected) -> HTTPException:
+    """429 (queue full) or 503 (queue deadline) with a Retry-After hint."""
+    return HTTPException(
+        status_code=rejection.status_code,
+        detail=f"Model {rejection.model} is busy ({rejection.reason}), please retry later",
+        headers={"Retry-After": str(math.ceil(rejection.retry_after_s))}
+    )
+
+
+def shed_if_saturated(models):
+    """Rejects the request before any work if a model's queue is already full."""
+    rejection = admission_controller.check_capacity(models)
+    if rejection is not None:
+        raise admission_error(rejection)
+
+
+# Token-level streaming: the model's partial output is forwarded as it arrives
+STREAMING_RUN_CONFIG = RunConfig(streaming_mode=StreamingMode.SSE)
+
+
+def sse_event(text: str) -> str:
+    """Frames text as one SSE event (one data: line per line of text)."""
+    return "".join(f"data: {line}\n" for line in text.split("\n")) + "\n"
 
 
 # Health check endpoint
@@ -61,17 +143,223 @@ async def health_check():
     """Health check endpoint for Cloud Run"""
     return {"status": "healthy", "service": "MyYear.AI"}
 
+# Model admission stats
+@app.get("/stats/admission")
+async def admission_stats():
+    """Per-model concurrency, queue depth, shed counts and queue wait times"""
+    return {"backend": config.MODEL_BACKEND, "models": admission_controller.stats()}
+
+# Model call resilience stats
+@app.get("/stats/model_calls")
+async def model_call_stats():
+    """Per-agent model call latency, retries, hedges and timeouts"""
+    return {"agents": {name: stats.to_dict() for name, stats in call_stats.items()}}
+
+# Tool memoization stats
+@app.get("/stats/tool_cache")
+async def tool_cache_stats():
+    """Hit rates of memoized tools (calculate_stats, get_personality, ...)"""
+    return memo_stats()
+
+@app.get("/stats/cards")
+async def share_card_stats():
+    """Share card cache hit rate and render throughput"""
+    return card_tools.card_stats()
+
+# History compaction stats
+@app.get("/stats/compaction")
+async def compaction_stats():
+    """How often long histories were compacted, and the resulting request sizes"""
+    return {"enabled": config.COMPACTION_ENABLED, **get_compaction_stats()}
+
+@app.get("/debug/memory")
+async def debug_memory(recent: int = 20):
+    """Peak/retained allocation and top allocation sites per tool and per endpoint"""
+    return memory_report(recent)
+
+@app.delete("/debug/memory")
+async def reset_debug_memory():
+    """Clears the collected allocation profiles"""
+    reset_memory_stats()
+    return {"status": "reset"}
+
+# Shared dataset directory
+@app.get("/datasets")
+async def list_datasets():
+    """Datasets resident in the shared Arrow store (mapped by all workers)"""
+    return {
+        "arrow_available": dataset_store.ARROW_AVAILABLE,
+        "store_dir": config.DATASET_STORE_DIR,
+        "datasets": dataset_store.resident_datasets()
+    }
+
+# Weekly viewing heatmap image for the wrapped card
+@app.get("/heatmap")
+async def viewing_heatmap(dataset_id: Optional[str] = None, format: str = "svg"):
+    """
+    Day-of-week x hour viewing heatmap as SVG (or PNG with cairosvg).
+    
+    Rendered once per dataset and served from the store afterwards.
+    """
+    if format not in IMAGE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(IMAGE_FORMATS)}")
+    if format == "png" and not PNG_AVAILABLE:
+        raise HTTPException(status_code=501, detail="PNG heatmaps require cairosvg")
+    data_path = resolve_data_path(dataset_id)
+    try:
+        path = await asyncio.to_thread(get_heatmap_image, data_path, format)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Viewing data file not found at {data_path}")
+    return FileResponse(
+        path,
+        media_type="image/svg+xml" if format == "svg" else "image/png",
+        headers={"Cache-Control": "public, max-age=86400"}
+    )
+
+def check_card_options(template: str, format: str):
+    if template not in card_tools.THEMES:
+        raise HTTPException(status_code=400, detail=f"template must be one of {sorted(card_tools.THEMES)}")
+    if format not in card_tools.IMAGE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(card_tools.IMAGE_FORMATS)}")
+    if format == "png" and not card_tools.PNG_AVAILABLE:
+        raise HTTPException(status_code=501, detail="PNG cards require cairosvg")
+
+
+CARD_FILE = re.compile(r"^[0-9a-f]{24}\.(svg|png)$")
+
+# Shareable image cards (post text + personality emoji + top stats)
+@app.post("/cards")
+async def render_share_card(request: CardRequest):
+    """
+    Renders one social post as an image card.
+    
+    Rendered in the card worker pool; identical cards come from the cache.
+    """
+    check_card_options(request.template, request.format)
+    data_path = resolve_data_path(request.dataset_id)
+    try:
+        _, content = await asyncio.to_thread(
+            card_tools.share_card_content, data_path, request.text, request.user_id
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Viewing data file not found at {data_path}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    card = (await asyncio.to_thread(
+        card_tools.render_cards, [content], request.template, request.format
+    ))[0]
+    return FileResponse(
+        card["path"],
+        media_type="image/svg+xml" if request.format == "svg" else "image/png",
+        headers={"Cache-Control": "public, max-age=31536000, immutable", "X-Card-Id": card["card_id"]}
+    )
+
+@app.post("/cards/batch")
+async def render_campaign_cards(request: CampaignCardsRequest):
+    """
+    Renders a card for every user (or the given users) of a dataset.
+    
+    Returns each user's card ID; fetch the images from /cards/{card_id}.{format}.
+    """
+    check_card_options(request.template, request.format)
+    data_path = resolve_data_path(request.dataset_id)
+    try:
+        return await asyncio.to_thread(
+            card_tools.render_campaign_cards, data_path, request.user_ids,
+            request.caption, request.template, request.format
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Viewing data file not found at {data_path}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/cards/{card_file}")
+async def get_share_card(card_file: str):
+    """A rendered card by file name ({card_id}.svg or {card_id}.png)"""
+    if not CARD_FILE.match(card_file):
+        raise HTTPException(status_code=400, detail="Expected {card_id}.svg or {card_id}.png")
+    path = os.path.join(config.CARD_CACHE_DIR, card_file)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"Card not found: {card_file}")
+    return FileResponse(
+        path,
+        media_type="image/svg+xml" if card_file.endswith(".svg") else "image/png",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
+
+# Streaming CSV upload endpoint
+@app.post("/upload")
+async def upload_viewing_history(request: Request):
+    """
+    Upload a MyAstro viewing history export (raw CSV request body).
+    
+    The body is streamed through an incremental CSV parser straight into
+    the shared columnar store; pass the returned dataset_id to /wrapped or
+    /chat/stream.
+    """
+    if not dataset_store.ARROW_AVAILABLE:
+        raise HTTPException(status_code=501, detail="Uploads require pyarrow")
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > config.MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Uploads are limited to {config.MAX_UPLOAD_BYTES} bytes")
+    
+    # Make room first: expired and least recently used uploads leave the store
+    await asyncio.to_thread(dataset_store.prune_uploads, keep=1)
+    # The per-show index is extended with each parsed batch instead of rebuilt later
+    shows = ShowHistoryIndex()
+    ingestor = CsvStreamIngestor(on_batch=lambda batch: shows.update(batch.to_pandas()))
+    ingestion = asyncio.create_task(asyncio.to_thread(ingestor.run))
+    try:
+        async for chunk in request.stream():
+            if not chunk:
+                continue
+            if ingestor.can_feed_without_blocking:
+                ingestor.feed(chunk)
+            else:
+                # Parser is behind: wait off the event loop (backpressure)
+                await asyncio.to_thread(ingestor.feed, chunk)
+            if ingestion.done():
+                break
+        if not ingestion.done():
+            await asyncio.to_thread(ingestor.finish)
+        result = await ingestion
+        register_show_history(result["dataset_id"], shows)
+        # Build the fun facts table and rollup cube now, so the agents start with lookups
+        data_path = dataset_store.dataset_uri(result["dataset_id"])
+        try:
+            facts = await asyncio.to_thread(materialize_facts, data_path)
+            result["facts_ready"] = bool(facts["users"])
+        except Exception:
+            result["facts_ready"] = False  # Built on first lookup instead
+        try:
+            await asyncio.to_thread(materialize_rollup, data_path)
+            result["rollup_ready"] = True
+        except Exception:
+            result["rollup_ready"] = False
+        return result
+    except UploadTooLargeError as e:
+        await asyncio.gather(ingestion, return_exceptions=True)  # Parser stops on abort
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        ingestor.abort()
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
 # Generate wrapped endpoint
 @app.post("/wrapped")
 async def generate_wrapped(request: WrappedRequest):
     """
     Generate personalized viewing wrapped.
     
-    Uses the viewing history CSV file from the data directory.
+    Uses an uploaded dataset, or the viewing history CSV file from the data directory.
     """
     try:
+        shed_if_saturated(WRAPPED_MODELS)
+        data_path = resolve_data_path(request.dataset_id)
+        
         # Check if CSV file exists
-        if not os.path.exists(CSV_PATH):
+        if data_path == CSV_PATH and not os.path.exists(CSV_PATH):
             raise HTTPException(
                 status_code=404,
                 detail=f"Viewing data file not found at {CSV_PATH}"
@@ -79,7 +367,7 @@ async def generate_wrapped(request: WrappedRequest):
         
         # Generate wrapped
         prompt = f"""
-        Create my personalized viewing wrapped from: {CSV_PATH}
+        Create my personalized viewing wrapped from: {data_path}
         
         Include:
         1. Viewing patterns and personality
@@ -91,6 +379,8 @@ async def generate_wrapped(request: WrappedRequest):
         """
         
         session_id = f"wrapped_{request.user_id}"
+        tag_profile(user_id=request.user_id, session_id=session_id)
+        annotate_span(user_id=request.user_id, session_id=session_id)
         
         # Create session if it doesn't exist (same pattern as interactive.py)
         session = await runner.session_service.get_session(
@@ -107,15 +397,16 @@ async def generate_wrapped(request: WrappedRequest):
         
         # Collect full response using runner (same pattern as interactive.py)
         full_response = ""
-        async for event in runner.run_async(
-            user_id=request.user_id,
-            session_id=session_id,
-            new_message=types.UserContent(parts=[types.Part(text=prompt)])
-        ):
-            if event.content and event.content.parts:
-                for part in event.content.parts:
-                    if part.text:
-                        full_response += part.text
+        with memo_scope(session_id):
+            async for event in runner.run_async(
+                user_id=request.user_id,
+                session_id=session_id,
+                new_message=types.UserContent(parts=[types.Part(text=prompt)])
+            ):
+                if event.content and event.content.parts:
+                    for part in event.content.parts:
+                        if part.text:
+                            full_response += part.text
         
         return {
             "success": True,
@@ -125,6 +416,10 @@ async def generate_wrapped(request: WrappedRequest):
     
     except HTTPException:
         raise
+    except AdmissionRejected as e:
+        raise admission_error(e)
+    except ModelCallError as e:
+        raise HTTPException(status_code=504 if e.timed_out else 502, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Wrapped generation failed: {str(e)}")
 
@@ -134,11 +429,20 @@ async def chat_stream(request: ChatRequest):
     """
     Streaming chat endpoint for real-time responses.
     
-    Returns Server-Sent Events (SSE) stream.
+    Returns Server-Sent Events (SSE) stream. Model output is streamed
+    token by token; multi-line text spans several data: lines of one event.
     """
+    shed_if_saturated(CHAT_MODELS)
+    data_path = resolve_data_path(request.dataset_id)
+    tag_profile(user_id=request.user_id, session_id=request.session_id)
+    annotate_span(user_id=request.user_id, session_id=request.session_id)
+    
     async def generate():
         try:
             full_session_id = f"chat_{request.user_id}_{request.session_id}"
+            # Repeat tool calls within this chat session hit its memo cache
+            # (the stream runs in its own task, so this doesn't leak)
+            set_memo_scope(full_session_id)
             
             # Create session if it doesn't exist (same pattern as interactive.py)
             session = await runner.session_service.get_session(
@@ -157,7 +461,7 @@ async def chat_stream(request: ChatRequest):
             # If this is a new session, initialize with CSV path context
             if is_new_session:
                 message_with_context = f"""
-                CRITICAL: Use this exact file path immediately: {CSV_PATH}
+                CRITICAL: Use this exact file path immediately: {data_path}
 
                 DO NOT ask the user to confirm the path. DO NOT ask for the file path. 
                 The path is correct and ready to use. Load the data immediately using the read_viewing_data tool with this path.
@@ -173,53 +477,64 @@ async def chat_stream(request: ChatRequest):
             event_count = 0
             has_yielded = False
             function_calls_detected = False
+            # Text already streamed as partial chunks, per agent, so the final
+            # aggregated event doesn't repeat it
+            streamed_text = {}
             
             async for event in runner.run_async(
                 user_id=request.user_id,
                 session_id=full_session_id,
-                new_message=types.UserContent(parts=[types.Part(text=message_with_context)])
+                new_message=types.UserContent(parts=[types.Part(text=message_with_context)]),
+                run_config=STREAMING_RUN_CONFIG
             ):
                 event_count += 1
                 
                 # Yield status update on first event
                 if event_count == 1:
-                    yield f"data: [STATUS] Processing request...\n\n"
+                    yield sse_event("[STATUS] Processing request...")
                 
-                # Check for function calls
-                if event.content and event.content.parts:
+                if not (event.content and event.content.parts):
+                    continue
+                
+                if event.partial:
+                    # Token-level chunk: forward it as soon as it arrives
                     for part in event.content.parts:
-                        # Check for function calls
-                        if hasattr(part, 'function_call'):
-                            function_calls_detected = True
-                            func_name = getattr(part.function_call, 'name', 'unknown')
-                            yield f"data: [STATUS] Calling function: {func_name}\n\n"
-                        
-                        # Check for text (both partial and complete)
-                        if hasattr(part, 'text') and part.text:
-                            yield f"data: {part.text}\n\n"
+                        if part.text:
+                            streamed_text[event.author] = streamed_text.get(event.author, "") + part.text
+                            yield sse_event(part.text)
                             has_yielded = True
+                    continue
                 
-                # Also check for direct text attribute on event
-                if hasattr(event, 'text') and event.text:
-                    yield f"data: {event.text}\n\n"
-                    has_yielded = True
-                
-                # Check for partial events (streaming text)
-                if hasattr(event, 'partial') and not event.partial:
-                    # This is a complete event, might have final response
-                    pass
+                for part in event.content.parts:
+                    # Check for function calls
+                    if part.function_call:
+                        function_calls_detected = True
+                        yield sse_event(f"[STATUS] Calling function: {part.function_call.name}")
+                    
+                    if part.text:
+                        # Final aggregate: only send what wasn't streamed already
+                        streamed = streamed_text.pop(event.author, "")
+                        remainder = part.text[len(streamed):] if part.text.startswith(streamed) else part.text
+                        if remainder:
+                            yield sse_event(remainder)
+                            has_yielded = True
             
             # If function calls were detected but no text response, the agent might be waiting
             if function_calls_detected and not has_yielded:
-                yield f"data: [STATUS] Function calls completed ({event_count} events processed). The agent may be generating a response...\n\n"
-                yield f"data: [INFO] If no response appears, the agent may need explicit instructions to respond after function calls.\n\n"
+                yield sse_event(f"[STATUS] Function calls completed ({event_count} events processed). The agent may be generating a response...")
+                yield sse_event("[INFO] If no response appears, the agent may need explicit instructions to respond after function calls.")
             elif not has_yielded:
-                yield f"data: [ERROR] No text response received after {event_count} events.\n\n"
+                yield sse_event(f"[ERROR] No text response received after {event_count} events.")
             
-            yield "data: [DONE]\n\n"
+            yield sse_event("[DONE]")
         
+        except AdmissionRejected as e:
+            # Headers are already sent, so report the shed request in-stream
+            yield sse_event(f"[ERROR] {e.status_code} Model {e.model} is busy ({e.reason}), please retry later")
+        except ModelCallError as e:
+            yield sse_event(f"[ERROR] {str(e)}")
         except Exception as e:
-            yield f"data: Error: {str(e)}\n\n"
+            yield sse_event(f"Error: {str(e)}")
     
     return StreamingResponse(
         generate(),
@@ -238,7 +553,18 @@ async def root():
         "endpoints": {
             "/health": "Health check",
             "/wrapped": "Generate personalized wrapped (uses data/my_viewing_history.csv)",
-            "/chat/stream": "Streaming chat (SSE, uses data/my_viewing_history.csv)"
+            "/chat/stream": "Streaming chat (SSE, uses data/my_viewing_history.csv)",
+            "/datasets": "Datasets shared across workers",
+            "/stats/admission": "Model queue depths, shed requests and queue wait times",
+            "/stats/model_calls": "Per-agent model latency, retries, hedges and timeouts",
+            "/stats/tool_cache": "Memoized tool hit rates",
+            "/debug/memory": "Allocation profile per tool and endpoint (MEMORY_PROFILING_ENABLED)",
+            "/upload": "Upload a viewing history CSV (streamed into the columnar store)",
+            "/heatmap": "Day-of-week x hour viewing heatmap image (SVG, or PNG with cairosvg)",
+            "/cards": "Render a social post as a shareable image card",
+            "/cards/batch": "Render cards for every user of a dataset (campaigns)",
+            "/stats/cards": "Share card cache hit rate and render throughput",
+            "/stats/compaction": "Long-history compactions and request sizes after them"
         },
         "key_concepts": [
             "Multi-agent system",
@@ -0,0 +1,205 @@
+"""
+Conversation Compaction for MyYear.AI
+KEY CONCEPT: Bounded model requests in long sessions
+
+Every turn of an interactive session used to resend the whole history,
+including large tool payloads (the full viewing data passed between tools),
+so each turn got slower and more expensive than the last. Once a request
+crosses COMPACTION_TOKEN_THRESHOLD, the stale turns are replaced with a short
+local digest (questions, answer excerpts, tools used) while the most recent
+turns stay verbatim. The latest read_viewing_data call/result is pinned so
+the agent can still pass the data to its tools.
+
+This runs as a before_model_callback on every agent and only rewrites the
+outgoing request; the session history itself is untouched.
+"""
+import json
+import logging
+from typing import Dict, Any, List, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from my_agent import config
+from my_agent.tracing import annotate_span
+
+logger = logging.getLogger(__name__)
+
+# Stale turns summarized in the digest (older ones are only counted)
+DIGEST_MAX_TURNS = 20
+DIGEST_QUESTION_CHARS = 200
+DIGEST_ANSWER_CHARS = 300
+# The opening message usually carries the CSV path and the task, so more of it is kept
+DIGEST_OPENING_CHARS = 1000
+
+# Tool whose latest result is kept verbatim (other tools receive its data)
+PINNED_TOOL = "read_viewing_data"
+
+compaction_stats = {"checks": 0, "compactions": 0, "turns_compacted": 0, "tokens_after": 0}
+
+
+def _part_chars(part: types.Part) -> int:
+    if part.text:
+        return len(part.text)
+    if part.function_call:
+        return len(json.dumps(part.function_call.args, default=str)) + len(part.function_call.name or "")
+    if part.function_response:
+        return len(json.dumps(part.function_response.response, default=str))
+    return 0
+
+
+def estimate_tokens(contents: List[types.Content]) -> int:
+    """Rough token count (~4 characters per token) of a request's contents."""
+    return sum(_part_chars(p) for c in contents for p in c.parts or []) // 4
+
+
+def exceeds_tokens(contents: List[types.Content], limit: int) -> bool:
+    """
+    Whether contents are over the token limit.
+
+    Walks from the newest content and stops as soon as the limit is passed,
+    so the check costs about the same however long the history is.
+    """
+    budget = limit * 4
+    for content in reversed(contents):
+        for part in content.parts or []:
+            budget -= _part_chars(part)
+            if budget < 0:
+                return True
+    return False
+
+
+def _is_turn_start(content: types.Content) -> bool:
+    parts = content.parts or []
+    return (
+        content.role == "user"
+        and any(p.text for p in parts)
+        and not any(p.function_response for p in parts)
+    )
+
+
+def split_turns(contents: List[types.Content]) -> List[List[types.Content]]:
+    """Groups contents into turns, each starting with a user message."""
+    turns: List[List[types.Content]] = []
+    for content in contents:
+        if not turns or _is_turn_start(content):
+            turns.append([])
+        turns[-1].append(content)
+    return turns
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit].rstrip() + "..."
+
+
+def _turn_digest(turn: List[types.Content], question_chars: int) -> str:
+    question = " ".join(p.text for p in turn[0].parts or [] if p.text)
+    answers = [p.text for c in turn[1:] if c.role == "model" for p in c.parts or [] if p.text]
+    tools = sorted({p.function_call.name for c in turn for p in c.parts or [] if p.function_call})
+
+    line = f"- User: {_shorten(question, question_chars)}"
+    if answers:
+        line += f"\n  Assistant: {_shorten(answers[-1], DIGEST_ANSWER_CHARS)}"
+    if tools:
+        line += f"\n  (tools used: {', '.join(tools)})"
+    return line
+
+
+def build_digest(stale: List[List[types.Content]]) -> types.Content:
+    """One user message summarizing the stale turns."""
+    lines = ["[Summary of the earlier conversation; older turns were compacted]"]
+    lines.append(_turn_digest(stale[0], DIGEST_OPENING_CHARS))
+    recent = stale[1:][-DIGEST_MAX_TURNS:]
+    omitted = len(stale) - 1 - len(recent)
+    if omitted:
+        lines.append(f"- ({omitted} more turns omitted)")
+    lines.extend(_turn_digest(turn, DIGEST_QUESTION_CHARS) for turn in recent)
+    return types.Content(role="user", parts=[types.Part(text="\n".join(lines))])
+
+
+def _pinned_tool_exchange(stale: List[List[types.Content]]) -> List[types.Content]:
+    """The latest call/result pair of PINNED_TOOL in the stale turns, if any."""
+    contents = [c for turn in stale for c in turn]
+    for i in range(len(contents) - 1, -1, -1):
+        calls = [p for p in contents[i].parts or [] if p.function_call and p.function_call.name == PINNED_TOOL]
+        if not calls:
+            continue
+        call_ids = {p.function_call.id for p in calls}
+        for response in contents[i + 1:]:
+            results = [
+                p for p in response.parts or []
+                if p.function_response and p.function_response.name == PINNED_TOOL
+                and p.function_response.id in call_ids
+            ]
+            if results:
+                return [
+                    types.Content(role=contents[i].role, parts=calls),
+                    types.Content(role=response.role, parts=results),
+                ]
+        return []
+    return []
+
+
+def compact_contents(
+    contents: List[types.Content],
+    token_threshold: int,
+    keep_turns: int,
+) -> Optional[List[types.Content]]:
+    """
+    Compacts a request's contents if they're over the token threshold.
+
+    Args:
+        contents: Request contents (not modified)
+        token_threshold: Estimated tokens above which to compact
+        keep_turns: Most recent turns to keep verbatim (reduced if still too big)
+
+    Returns:
+        New contents list, or None if no compaction was needed
+    """
+    if not exceeds_tokens(contents, token_threshold):
+        return None
+
+    turns = split_turns(contents)
+    keep = min(keep_turns, len(turns) - 1)
+    compacted = None
+    while keep >= 1:
+        stale, recent = turns[:-keep], turns[-keep:]
+        compacted = [build_digest(stale), *_pinned_tool_exchange(stale)]
+        compacted += [c for turn in recent for c in turn]
+        if not exceeds_tokens(compacted, token_threshold):
+            break
+        keep -= 1
+    return compacted
+
+
+def compact_history(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+    """
+    before_model_callback: compacts long conversation history.
+
+    Returns None so the (possibly rewritten) request goes to the model.
+    """
+    if not config.COMPACTION_ENABLED:
+        return None
+    compaction_stats["checks"] += 1
+
+    contents = llm_request.contents or []
+    compacted = compact_contents(contents, config.COMPACTION_TOKEN_THRESHOLD, config.COMPACTION_KEEP_TURNS)
+    if compacted is not None:
+        after = estimate_tokens(compacted)
+        # The digest itself counts as one turn of the compacted request
+        dropped = len(split_turns(contents)) - len(split_turns(compacted)) + 1
+        compaction_stats["compactions"] += 1
+        compaction_stats["turns_compacted"] += dropped
+        compaction_stats["tokens_after"] += after
+        logger.debug("%s: compacted %d turns, request now ~%d tokens", callback_context.agent_name, dropped, after)
+        annotate_span(**{"compaction.turns_dropped": dropped, "compaction.tokens_after": after})
+        llm_request.contents = compacted
+    return None
+
+
+def get_compaction_stats() -> Dict[str, Any]:
+    """Compaction counters of this process."""
+    return dict(compaction_stats)
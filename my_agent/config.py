@@ -2,6 +2,116 @@
 Configuration for MyYear.AI
 """
 import os
+import tempfile
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "")
 
+# Data directory shipped with the repo
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+
+# Serialized population quantile sketches (see tools/population_tools.py)
+POPULATION_BENCHMARKS_PATH = os.getenv(
+    "POPULATION_BENCHMARKS_PATH",
+    os.path.join(DATA_DIR, "population_benchmarks.json")
+)
+
+# Idle gap (minutes) that ends a viewing session when session_id is missing
+SESSION_IDLE_MINUTES = float(os.getenv("SESSION_IDLE_MINUTES", "30"))
+
+# Shared Arrow dataset store, memory-mapped by every API worker (see dataset_store.py)
+DATASET_STORE_DIR = os.getenv(
+    "DATASET_STORE_DIR",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "myyear_datasets")
+)
+
+# Datasets each worker keeps memory-mapped, least recently used dropped first
+DATASET_CACHE_SIZE = int(os.getenv("DATASET_CACHE_SIZE", "8"))
+
+# Uploads (see ingest.py): largest accepted body, and how many uploaded datasets
+# stay in the store - the least recently used go first, and any unused for
+# UPLOAD_TTL_SECONDS are removed with their derived files
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+MAX_UPLOADED_DATASETS = int(os.getenv("MAX_UPLOADED_DATASETS", "50"))
+UPLOAD_TTL_SECONDS = float(os.getenv("UPLOAD_TTL_SECONDS", str(24 * 3600)))
+
+# Model backend: "gemini" (default), "stub" (local fake with injected latency),
+# "record" (gemini, saving responses to MODEL_CASSETTE_PATH) or "replay" (offline from the cassette)
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "gemini").lower()
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "200"))
+STUB_JITTER_MS = float(os.getenv("STUB_JITTER_MS", "50"))
+# Fraction of stub calls that are slow (STUB_SLOW_LATENCY_MS) or fail with a 503
+STUB_SLOW_RATE = float(os.getenv("STUB_SLOW_RATE", "0"))
+STUB_SLOW_LATENCY_MS = float(os.getenv("STUB_SLOW_LATENCY_MS", "5000"))
+STUB_FAILURE_RATE = float(os.getenv("STUB_FAILURE_RATE", "0"))
+# Extra stub latency per 1k prompt tokens (simulates prefill cost of long histories)
+STUB_MS_PER_1K_TOKENS = float(os.getenv("STUB_MS_PER_1K_TOKENS", "0"))
+
+# Record/replay cassette (see models/record_replay.py)
+MODEL_CASSETTE_PATH = os.getenv("MODEL_CASSETTE_PATH", os.path.join(DATA_DIR, "cassettes", "model_calls.jsonl"))
+# Replay delay per model call in ms, or "recorded" to reproduce the recorded latency
+MODEL_REPLAY_LATENCY_MS = os.getenv("MODEL_REPLAY_LATENCY_MS", "0")
+# Only replay exact request matches (no fallback on request shape)
+MODEL_REPLAY_STRICT = os.getenv("MODEL_REPLAY_STRICT", "false").lower() in ("1", "true", "yes")
+
+# Conversation compaction (see compaction.py): estimated request tokens above
+# which stale turns are summarized, and how many recent turns stay verbatim
+COMPACTION_ENABLED = os.getenv("COMPACTION_ENABLED", "true").lower() in ("1", "true", "yes")
+COMPACTION_TOKEN_THRESHOLD = int(os.getenv("COMPACTION_TOKEN_THRESHOLD", "24000"))
+COMPACTION_KEEP_TURNS = int(os.getenv("COMPACTION_KEEP_TURNS", "4"))
+
+# Memoization of deterministic tools (see tools/memo.py): "session" keeps one
+# cache per chat session, "process" shares one cache across sessions
+TOOL_MEMO_ENABLED = os.getenv("TOOL_MEMO_ENABLED", "true").lower() in ("1", "true", "yes")
+TOOL_MEMO_SCOPE = os.getenv("TOOL_MEMO_SCOPE", "session").lower()
+TOOL_MEMO_MAX_ENTRIES = int(os.getenv("TOOL_MEMO_MAX_ENTRIES", "256"))
+TOOL_MEMO_MAX_SESSIONS = int(os.getenv("TOOL_MEMO_MAX_SESSIONS", "128"))
+
+# Request-scoped CPU profiling (see profiling.py): fraction of API requests
+# sampled, whether an "X-Profile: 1" header forces a profile (off by default:
+# any client could send it), the sampling interval and where profiles are written
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_ALLOW_HEADER = os.getenv("PROFILE_ALLOW_HEADER", "false").lower() in ("1", "true", "yes")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "myyear_profiles"))
+
+# Allocation profiling (see memory_profiling.py): tracemalloc per tool call and
+# per request, served at /debug/memory. Slows Python down; debugging only
+MEMORY_PROFILING_ENABLED = os.getenv("MEMORY_PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+MEMORY_PROFILE_FRAMES = int(os.getenv("MEMORY_PROFILE_FRAMES", "15"))
+MEMORY_PROFILE_TOP_SITES = int(os.getenv("MEMORY_PROFILE_TOP_SITES", "5"))
+
+# Tracing (see tracing.py): "none", "file" (JSON lines at TRACE_FILE), "console"
+# or "otlp" (needs opentelemetry-exporter-otlp; endpoint from OTEL_EXPORTER_OTLP_ENDPOINT)
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(tempfile.gettempdir(), "myyear_traces.jsonl"))
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "myyear-api")
+# Keep prompts and tool payloads (the viewing history) in span attributes
+TRACE_CAPTURE_CONTENT = os.getenv("TRACE_CAPTURE_CONTENT", "false").lower() in ("1", "true", "yes")
+
+# Local quiz mode (see quiz_engine.py): questions per quiz, and the optional
+# model-written flavor text - question phrasing and a one-liner after each
+# answer, requested in the background and shown only if ready (comments older
+# than WAIT_MS are dropped). Phrasing of the next PREFETCH_DEPTH questions is
+# requested while the player answers
+QUIZ_QUESTIONS = int(os.getenv("QUIZ_QUESTIONS", "5"))
+QUIZ_COMMENTARY = os.getenv("QUIZ_COMMENTARY", "false").lower() in ("1", "true", "yes")
+QUIZ_COMMENTARY_MODEL = os.getenv("QUIZ_COMMENTARY_MODEL", "gemini-2.5-flash-lite")
+QUIZ_COMMENTARY_WAIT_MS = float(os.getenv("QUIZ_COMMENTARY_WAIT_MS", "1500"))
+QUIZ_PREFETCH_DEPTH = int(os.getenv("QUIZ_PREFETCH_DEPTH", "1"))
+
+# Read-only SQL tool (see tools/sql_tools.py): row cap per query, time budget,
+# prepared statements cached per connection, the largest string/blob a query may
+# build, and the characters of each returned value sent back to the model
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", "200"))
+SQL_TIMEOUT_MS = float(os.getenv("SQL_TIMEOUT_MS", "2000"))
+SQL_STATEMENT_CACHE_SIZE = int(os.getenv("SQL_STATEMENT_CACHE_SIZE", "256"))
+SQL_MAX_VALUE_BYTES = int(os.getenv("SQL_MAX_VALUE_BYTES", str(1_000_000)))
+SQL_MAX_CELL_CHARS = int(os.getenv("SQL_MAX_CELL_CHARS", "1000"))
+
+# Shareable cards (see tools/card_tools.py): render worker processes (0 renders
+# in the calling thread), the content-addressed card cache, and an optional font
+# file embedded in every SVG card so it looks the same on every client
+CARD_WORKERS = int(os.getenv("CARD_WORKERS", str(min(4, os.cpu_count() or 1))))
+CARD_CACHE_DIR = os.getenv("CARD_CACHE_DIR", os.path.join(tempfile.gettempdir(), "myyear_cards"))
+CARD_FONT_PATH = os.getenv("CARD_FONT_PATH", "")
+CARD_FONT_FAMILY = os.getenv("CARD_FONT_FAMILY", "Inter")
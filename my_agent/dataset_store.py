@@ -0,0 +1,365 @@
+"""
+Shared Dataset Store for MyYear.AI
+KEY CONCEPT: Memory-mapped Arrow IPC files shared across worker processes
+
+Running the API with several uvicorn workers used to mean every worker parsed
+and held its own copy of each viewing history. Parsed datasets are now
+published once as Arrow IPC files (in /dev/shm when available) that every
+worker memory-maps zero-copy, plus a small JSON directory of which datasets
+are resident. The second worker to touch a dataset pays no parse cost.
+
+pyarrow is optional: without it everything falls back to reading the CSV.
+"""
+import glob
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from my_agent import config
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None  # pyarrow not installed, datasets are parsed per process
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Not available on Windows, registry updates are unlocked
+
+
+ARROW_AVAILABLE = pa is not None
+
+REGISTRY_FILE = "registry.json"
+
+DATASET_URI_PREFIX = "dataset://"
+
+# Memory-mapped tables opened by this process, by dataset ID (least recently
+# used first)
+_mapped_tables: "OrderedDict[str, pa.Table]" = OrderedDict()
+
+
+def _forget(dataset_id: str):
+    _mapped_tables.pop(dataset_id, None)
+
+
+def store_dir() -> str:
+    """Directory holding the shared Arrow files (created on demand)."""
+    path = config.DATASET_STORE_DIR
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def dataset_path(dataset_id: str) -> str:
+    """Location of a dataset's Arrow file in the store."""
+    return os.path.join(store_dir(), f"{dataset_id}.arrow")
+
+
+def csv_dataset_id(file_path: str) -> str:
+    """
+    Dataset ID for a CSV file.
+
+    Includes the file's size and modification time so an edited file is
+    published as a new dataset instead of serving stale data.
+    """
+    stat = os.stat(file_path)
+    key = f"{os.path.abspath(file_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return "csv-" + hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+
+@contextmanager
+def _registry_lock() -> Iterator[None]:
+    lock_path = os.path.join(store_dir(), f"{REGISTRY_FILE}.lock")
+    with open(lock_path, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_registry() -> Dict[str, Any]:
+    try:
+        with open(os.path.join(store_dir(), REGISTRY_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_registry(registry: Dict[str, Any]):
+    path = os.path.join(store_dir(), REGISTRY_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(registry, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def register_dataset(dataset_id: str, info: Dict[str, Any]):
+    """Adds a dataset to the shared directory."""
+    with _registry_lock():
+        registry = _read_registry()
+        registry[dataset_id] = info
+        _write_registry(registry)
+
+
+def normalize_viewing_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Coerces viewing columns to the types csv_tools expects."""
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'])
+    for column in ('completed', 'is_rewatch'):
+        if column in df.columns and df[column].dtype == object:
+            df[column] = df[column].astype(str).str.lower().isin(['true', '1', 'yes'])
+    return df
+
+
+def publish_table(dataset_id: str, table: "pa.Table", source: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Writes an Arrow table to the shared store and registers it.
+
+    The file is written under a temporary name and renamed into place, so
+    other workers never map a half-written file.
+    """
+    path = dataset_path(dataset_id)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+    info = {
+        "path": path,
+        "rows": table.num_rows,
+        "bytes": os.path.getsize(path),
+        "source": source,
+        "published_at": time.time(),
+        "published_by_pid": os.getpid(),
+    }
+    register_dataset(dataset_id, info)
+    _forget(dataset_id)
+    return info
+
+
+def publish_dataset(dataset_id: str, df: pd.DataFrame, source: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Publishes a DataFrame to the shared store (no-op without pyarrow)."""
+    if not ARROW_AVAILABLE:
+        return None
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    return publish_table(dataset_id, table, source)
+
+
+def open_dataset(dataset_id: str) -> Optional["pa.Table"]:
+    """
+    Memory-maps a published dataset.
+
+    The returned table's buffers point straight into the shared file, so
+    every worker that opens it shares the same physical pages.
+    """
+    if not ARROW_AVAILABLE:
+        return None
+    path = dataset_path(dataset_id)
+    table = _mapped_tables.get(dataset_id)
+    if not os.path.exists(path):
+        # Evicted (possibly by another worker): stop serving the old mapping
+        _forget(dataset_id)
+        return None
+    if table is not None:
+        _mapped_tables.move_to_end(dataset_id)
+        return table
+
+    source = pa.memory_map(path, "r")
+    table = pa.ipc.open_file(source).read_all()
+    _mapped_tables[dataset_id] = table
+    while len(_mapped_tables) > config.DATASET_CACHE_SIZE:
+        _forget(next(iter(_mapped_tables)))
+    return table
+
+
+def touch_dataset(dataset_id: str):
+    """Marks a dataset as just used (its file's mtime orders eviction)."""
+    try:
+        os.utime(dataset_path(dataset_id))
+    except FileNotFoundError:
+        pass
+
+
+def load_dataset_frame(dataset_id: str) -> Optional[pd.DataFrame]:
+    """
+    Opens a published dataset as a DataFrame, or None if not resident.
+
+    Each call converts the shared mapping into a fresh frame, so callers may
+    modify it and nothing outlives the request but the mapped pages.
+    """
+    table = open_dataset(dataset_id)
+    return table.to_pandas() if table is not None else None
+
+
+def dataset_uri(dataset_id: str) -> str:
+    """Path-like reference to a stored dataset, accepted wherever a CSV path is."""
+    return f"{DATASET_URI_PREFIX}{dataset_id}"
+
+
+def load_viewing_frame(file_path: str) -> pd.DataFrame:
+    """
+    Loads a viewing history, parsing each CSV at most once across workers.
+
+    Args:
+        file_path: Path to the CSV file, or dataset://<id> for an uploaded dataset
+
+    Returns:
+        DataFrame with typed columns
+    """
+    if file_path.startswith(DATASET_URI_PREFIX):
+        df = load_dataset_frame(file_path[len(DATASET_URI_PREFIX):])
+        if df is None:
+            raise FileNotFoundError(f"Dataset not found: {file_path}")
+        return df
+
+    if not ARROW_AVAILABLE:
+        return normalize_viewing_frame(pd.read_csv(file_path))
+
+    dataset_id = csv_dataset_id(file_path)
+    df = load_dataset_frame(dataset_id)
+    if df is None:
+        df = normalize_viewing_frame(pd.read_csv(file_path))
+        publish_dataset(dataset_id, df, source=os.path.abspath(file_path))
+    return df
+
+
+def dataset_id_for(file_path: str) -> str:
+    """Dataset ID of a CSV path or dataset://<id> reference."""
+    if file_path.startswith(DATASET_URI_PREFIX):
+        return file_path[len(DATASET_URI_PREFIX):]
+    return csv_dataset_id(file_path)
+
+
+SIDECAR_EXTENSIONS = ("json", "npz", "sqlite", "svg", "png")
+
+
+def sidecar_path(dataset_id: str, name: str, extension: str = "json") -> str:
+    """Location of a file derived from a dataset (e.g. its facts table)."""
+    return os.path.join(store_dir(), f"{dataset_id}.{name}.{extension}")
+
+
+def write_sidecar(dataset_id: str, name: str, payload: Dict[str, Any]):
+    """Stores derived data next to the dataset (atomically, like the Arrow file)."""
+    path = sidecar_path(dataset_id, name)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f, default=str)
+    os.replace(tmp_path, path)
+
+
+def read_sidecar(dataset_id: str, name: str) -> Optional[Dict[str, Any]]:
+    """Derived data stored with a dataset, or None if it hasn't been built."""
+    try:
+        with open(sidecar_path(dataset_id, name)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def write_bytes_sidecar(dataset_id: str, name: str, extension: str, payload: bytes) -> str:
+    """Stores a rendered file (e.g. an image) next to the dataset and returns its path."""
+    path = sidecar_path(dataset_id, name, extension)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+    return path
+
+
+def write_array_sidecar(dataset_id: str, name: str, arrays: Dict[str, np.ndarray]):
+    """Stores derived numpy arrays next to the dataset (uncompressed .npz, atomically)."""
+    path = sidecar_path(dataset_id, name, "npz")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+def read_array_sidecar(dataset_id: str, name: str) -> Optional[Dict[str, np.ndarray]]:
+    """Derived arrays stored with a dataset, or None if they haven't been built."""
+    try:
+        with np.load(sidecar_path(dataset_id, name, "npz"), allow_pickle=False) as archive:
+            return {key: archive[key] for key in archive.files}
+    except (FileNotFoundError, ValueError, OSError):
+        return None
+
+
+def resident_datasets() -> List[Dict[str, Any]]:
+    """Lists datasets currently published in the shared store."""
+    registry = _read_registry()
+    return [
+        {"dataset_id": dataset_id, **info, "mapped_in_this_process": dataset_id in _mapped_tables}
+        for dataset_id, info in registry.items()
+        if os.path.exists(info.get("path", ""))
+    ]
+
+
+def prune_uploads(
+    max_datasets: Optional[int] = None,
+    ttl_seconds: Optional[float] = None,
+    keep: int = 0
+) -> List[str]:
+    """
+    Evicts uploaded datasets unused for ttl_seconds, then the least recently
+    used ones beyond max_datasets (bundled CSVs are never evicted).
+
+    Args:
+        max_datasets: Uploads to keep (default MAX_UPLOADED_DATASETS)
+        ttl_seconds: Idle time before an upload expires (default UPLOAD_TTL_SECONDS)
+        keep: Extra room to leave, e.g. 1 before ingesting a new upload
+
+    Returns:
+        IDs of the evicted datasets
+    """
+    max_datasets = config.MAX_UPLOADED_DATASETS if max_datasets is None else max_datasets
+    ttl_seconds = config.UPLOAD_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+    now = time.time()
+    uploads = []
+    for dataset_id, info in _read_registry().items():
+        if info.get("source") != "upload":
+            continue
+        try:
+            last_used = os.path.getmtime(info.get("path", ""))
+        except OSError:
+            last_used = 0.0  # File already gone, drop the registry entry
+        uploads.append((last_used, dataset_id))
+    uploads.sort(reverse=True)
+
+    allowed = max(0, max_datasets - keep)
+    evicted = [
+        dataset_id for i, (last_used, dataset_id) in enumerate(uploads)
+        if i >= allowed or now - last_used > ttl_seconds
+    ]
+    for dataset_id in evicted:
+        evict_dataset(dataset_id)
+    return evicted
+
+
+def evict_dataset(dataset_id: str) -> bool:
+    """Removes a dataset from the shared store."""
+    _forget(dataset_id)
+    with _registry_lock():
+        registry = _read_registry()
+        info = registry.pop(dataset_id, None)
+        _write_registry(registry)
+    for extension in SIDECAR_EXTENSIONS:
+        for sidecar in glob.glob(os.path.join(store_dir(), f"{glob.escape(dataset_id)}.*.{extension}")):
+            os.remove(sidecar)
+    path = dataset_path(dataset_id)
+    if os.path.exists(path):
+        # Workers that already mapped the file keep their pages until they drop it
+        os.remove(path)
+        return True
+    return info is not None
@@ -0,0 +1,239 @@
+"""
+Streaming CSV Ingestion for MyYear.AI
+KEY CONCEPT: Upload straight into the columnar store without buffering
+
+The request body is handed to pyarrow's incremental CSV reader chunk by
+chunk (through a bounded queue) on a worker thread. Each parsed record
+batch is validated, summarized and appended to an Arrow IPC file in the
+shared dataset store, so memory use stays at a few blocks regardless of the
+upload size.
+"""
+import io
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Any, Optional
+
+from my_agent import config, dataset_store
+from my_agent.tools.csv_tools import EXPECTED_COLUMNS, REQUIRED_COLUMNS
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.ipc
+except ImportError:
+    pa = None  # Uploads need pyarrow
+
+
+# Arrow types for the columns csv_tools knows about
+COLUMN_TYPES = {
+    "date": pa.timestamp("s"),
+    "show_name": pa.string(),
+    "season": pa.int64(),
+    "episode": pa.int64(),
+    "genre": pa.string(),
+    "duration_minutes": pa.float64(),
+    "completed": pa.bool_(),
+    "is_rewatch": pa.bool_(),
+    "session_id": pa.string(),
+    "day_of_week": pa.string(),
+    "hour": pa.int64(),
+} if pa is not None else {}
+
+# Parser block size and how many request chunks may wait for the parser
+BLOCK_SIZE = 1 << 20
+MAX_PENDING_CHUNKS = 64
+
+
+class UploadValidationError(ValueError):
+    """Raised when an uploaded CSV doesn't have the columns csv_tools expects."""
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload goes past MAX_UPLOAD_BYTES."""
+
+
+class _ChunkReader(io.RawIOBase):
+    """File-like view over a queue of byte chunks (None marks the end)."""
+
+    def __init__(self, chunks: "queue.Queue[Optional[bytes]]", aborted: threading.Event):
+        self._chunks = chunks
+        self._aborted = aborted
+        self._buffer = b""
+        self.eof = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        while not self._buffer and not self.eof:
+            if self._aborted.is_set():
+                raise RuntimeError("Upload aborted")
+            try:
+                chunk = self._chunks.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if chunk is None:
+                self.eof = True
+            else:
+                self._buffer = chunk
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+class CsvStreamIngestor:
+    """
+    Incrementally parses an uploaded CSV into the shared dataset store.
+
+    Usage: run() on a worker thread to do the parsing while the request
+    handler calls feed() for every body chunk and finish() at the end.
+    feed() blocks once MAX_PENDING_CHUNKS are waiting, which pushes back on
+    the client instead of buffering the upload.
+    """
+
+    def __init__(
+        self,
+        dataset_id: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        on_batch: Optional[Callable[["pa.RecordBatch"], None]] = None
+    ):
+        if pa is None:
+            raise RuntimeError("pyarrow is required for uploads")
+        self.dataset_id = dataset_id or f"upload-{uuid.uuid4().hex[:12]}"
+        # Called with every parsed batch, so indexes grow with the upload
+        self.on_batch = on_batch
+        self.max_bytes = config.MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+        self.chunks: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=MAX_PENDING_CHUNKS)
+        self.bytes_received = 0
+        self._aborted = threading.Event()
+        self._source = _ChunkReader(self.chunks, self._aborted)
+
+    def feed(self, chunk: bytes):
+        """
+        Queues a body chunk (blocks when the parser falls behind).
+
+        Raises:
+            UploadTooLargeError: If the upload goes past max_bytes (the
+                parser is stopped and the partial file discarded)
+        """
+        self.bytes_received += len(chunk)
+        if self.bytes_received > self.max_bytes:
+            self.abort()
+            raise UploadTooLargeError(f"Upload is larger than {self.max_bytes} bytes")
+        self.chunks.put(chunk)
+
+    @property
+    def can_feed_without_blocking(self) -> bool:
+        return not self.chunks.full()
+
+    def finish(self):
+        self.chunks.put(None)
+
+    def abort(self):
+        """Stops the parser (e.g. client disconnected); the partial file is discarded."""
+        self._aborted.set()
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Parses the stream and writes it to the store.
+
+        Returns:
+            Dataset ID plus summary stats of the ingested data
+
+        Raises:
+            UploadValidationError: If required columns are missing or rows
+                don't parse as the expected types
+        """
+        try:
+            return self._ingest()
+        except pa.ArrowInvalid as e:
+            raise UploadValidationError(f"Invalid CSV: {e}") from e
+        finally:
+            self._drain()
+
+    def _ingest(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        reader = pa_csv.open_csv(
+            io.BufferedReader(self._source, buffer_size=BLOCK_SIZE),
+            read_options=pa_csv.ReadOptions(block_size=BLOCK_SIZE),
+            convert_options=pa_csv.ConvertOptions(
+                column_types=COLUMN_TYPES,
+                true_values=["True", "true", "1", "yes"],
+                false_values=["False", "false", "0", "no"],
+            ),
+        )
+
+        columns = reader.schema.names
+        missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+        if missing:
+            raise UploadValidationError(f"Missing required columns: {', '.join(missing)}")
+
+        path = dataset_store.dataset_path(self.dataset_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        rows = 0
+        total_minutes = 0.0
+        first_date = last_date = None
+        shows = set()
+
+        try:
+            with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, reader.schema) as writer:
+                for batch in reader:
+                    rows += batch.num_rows
+                    total_minutes += pc.sum(batch.column("duration_minutes")).as_py() or 0
+                    shows.update(pc.unique(batch.column("show_name")).to_pylist())
+                    date_range = pc.min_max(batch.column("date")).as_py()
+                    if date_range["min"] is not None:
+                        first_date = min(filter(None, [first_date, date_range["min"]]))
+                        last_date = max(filter(None, [last_date, date_range["max"]]))
+                    writer.write_batch(batch)
+                    if self.on_batch is not None:
+                        self.on_batch(batch)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        info = {
+            "path": path,
+            "rows": rows,
+            "bytes": os.path.getsize(path),
+            "source": "upload",
+            "published_at": time.time(),
+            "published_by_pid": os.getpid(),
+        }
+        dataset_store.register_dataset(self.dataset_id, info)
+
+        elapsed = time.perf_counter() - started
+        shows.discard(None)
+        return {
+            "success": True,
+            "dataset_id": self.dataset_id,
+            "total_rows": rows,
+            "columns": columns,
+            "missing_optional_columns": [c for c in EXPECTED_COLUMNS if c not in columns],
+            "date_range": {
+                "start": str(first_date) if first_date else None,
+                "end": str(last_date) if last_date else None
+            },
+            "total_hours": round(total_minutes / 60, 2),
+            "unique_shows": len(shows),
+            "ingest": {
+                "bytes": self.bytes_received,
+                "seconds": round(elapsed, 4),
+                "throughput_mb_s": round(self.bytes_received / 1e6 / elapsed, 2) if elapsed > 0 else None
+            }
+        }
+
+    def _drain(self):
+        """Consumes the rest of the stream so the feeding side never blocks."""
+        while not self._source.eof and not self._aborted.is_set():
+            try:
+                if self.chunks.get(timeout=0.5) is None:
+                    break
+            except queue.Empty:
+                continue
@@ -4,6 +4,7 @@ KEY CONCEPTS:
 - Session persistence for multi-turn conversations
 - Memory across interactions
 - Interactive Q&A with quiz agent
+- Locally graded quiz mode
 """
 import asyncio
 import os
@@ -19,7 +20,10 @@ except ImportError:
 
 from google.adk.runners import InMemoryRunner
 from google.genai import types
+from my_agent import config
 from my_agent.agents.coordinator_agent import personal_curator
+from my_agent.quiz_engine import FINISHED, QuestionPrefetcher, QuizCommentator, QuizEngine
+from my_agent.tools.memo import set_memo_scope
 
 
 # KEY CONCEPT: Runner for executing agents
@@ -41,6 +45,7 @@ async def interactive_chat(csv_path: str, user_id: str = "user_001"):
         user_id: User identifier for session
     """
     session_id = f"interactive_{user_id}"
+    set_memo_scope(session_id)  # Repeat tool calls in this chat are memoized
     
     # Initialize with data
     init_prompt = f"""
@@ -139,85 +144,93 @@ async def quiz_mode(csv_path: str, user_id: str = "user_001"):
     """
     Dedicated quiz mode for testing memory.
     
+    KEY CONCEPT: Local quiz engine
+    - Questions come from the dataset, answers are graded locally
+    - The model only adds an optional one-liner after each answer
+    
     Args:
         csv_path: Path to viewing history CSV
         user_id: User identifier
     """
-    session_id = f"quiz_{user_id}"
-    
     print("🎯 MyYear.AI - Quiz Mode")
     print("=" * 70)
     print()
     
-    init_prompt = f"""
-    I want to play a quiz game about my viewing history from: {csv_path}
-    
-    Create a fun quiz! Ask me 3-5 questions about:
-    - What I watched on specific dates
-    - My viewing patterns
-    - My personality traits
-    
-    Make it fun and interactive! 🎮
-    """
-    
+    prefetcher = None
+    comment_task = None
+    awaiting_answer = False
+
+    def show_comment(task: asyncio.Task):
+        # Comments arrive in the background, possibly while the next prompt is up
+        if task.cancelled() or task.exception() is not None or not task.result():
+            return
+        if awaiting_answer:
+            print(f"\n   💬 {task.result()}\nYour answer: ", end="", flush=True)
+        else:
+            print(f"   💬 {task.result()}")
+
     try:
-        # Create session if it doesn't exist
-        session = await runner.session_service.get_session(
-            app_name=runner.app_name,
-            user_id=user_id,
-            session_id=session_id
-        )
-        if not session:
-            session = await runner.session_service.create_session(
-                app_name=runner.app_name,
-                user_id=user_id,
-                session_id=session_id
-            )
+        engine = QuizEngine.from_dataset(csv_path, user_id=user_id)
+        if engine.state == FINISHED:
+            print("❌ Not enough viewing data for a quiz.")
+            return
+        commentator = QuizCommentator() if config.QUIZ_COMMENTARY else None
+        # Model phrasing of upcoming questions is requested while the player types
+        prefetcher = QuestionPrefetcher(engine, commentator) if commentator is not None else None
+        if prefetcher is not None:
+            prefetcher.prefetch()
         
-        # Send initial quiz message
-        async for event in runner.run_async(
-            user_id=user_id,
-            session_id=session_id,
-            new_message=types.UserContent(parts=[types.Part(text=init_prompt)])
-        ):
-            if event.content and event.content.parts:
-                for part in event.content.parts:
-                    if part.text:
-                        print(part.text, end='', flush=True)
-        print("\n")
-        
-        # Continue with answers
-        print("-" * 70)
-        print("Answer the questions above, or type 'skip' to skip")
+        print(f"🎮 {len(engine.questions)} questions about your year in watching!")
+        print("Answer with a name, or the number of a choice. Type 'skip' to skip, 'quit' to stop.")
         print("-" * 70)
         print()
         
-        while True:
-            user_answer = input("Your answer: ").strip()
+        while engine.state != FINISHED:
+            question = engine.current
+            text = await prefetcher.question_text() if prefetcher is not None else question.question
+            print(f"❓ Q{engine.position + 1}: {text}")
+            for i, choice in enumerate(question.choices, 1):
+                print(f"   {i}. {choice}")
             
-            if not user_answer:
-                continue
+            # Read input off the event loop so background work keeps running
+            user_answer = ""
+            awaiting_answer = True
+            while not user_answer:
+                user_answer = (await asyncio.to_thread(input, "Your answer: ")).strip()
+            awaiting_answer = False
             
             if user_answer.lower() in ['quit', 'exit', 'done']:
                 break
             
-            print("🤖 Curator: ", end='', flush=True)
+            if user_answer.lower() == 'skip':
+                result = engine.skip()
+            else:
+                result = engine.answer(user_answer)
             
-            async for event in runner.run_async(
-                user_id=user_id,
-                session_id=session_id,
-                new_message=types.UserContent(parts=[types.Part(text=user_answer)])
-            ):
-                if event.content and event.content.parts:
-                    for part in event.content.parts:
-                        if part.text:
-                            print(part.text, end='', flush=True)
-            print("\n")
+            print(f"🤖 Curator: {result['feedback']} The answer: {result['answer']}")
+            print(f"   Score: {result['score']}/{result['number']}")
+            print()
+            if commentator is not None and not result.get("skipped"):
+                # Never blocks the next question; printed whenever it arrives
+                comment_task = asyncio.create_task(commentator.comment_within(result))
+                comment_task.add_done_callback(show_comment)
+        
+        if comment_task is not None and engine.state == FINISHED:
+            await asyncio.wait({comment_task})  # Nothing left to ask: let the last one land
+        summary = engine.summary()
+        print("-" * 70)
+        print(f"🏁 Final score: {summary['score']}/{summary['answered']}. {summary['verdict']}")
+        print()
             
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, EOFError):
         print("\n\n👋 Quiz ended!")
     except Exception as e:
         print(f"❌ Error: {e}")
+    finally:
+        if prefetcher is not None:
+            prefetcher.cancel()
+        if comment_task is not None:
+            comment_task.cancel()
 
 
 def main():
@@ -0,0 +1,287 @@
+"""
+Allocation Profiling per Tool Call and per Request
+KEY CONCEPT: Find the copy-heavy paths behind memory spikes
+
+The tools build several throwaway DataFrames per call (pd.DataFrame(data),
+extra day_of_week/hour columns, per-period filtered copies). With
+MEMORY_PROFILING_ENABLED, tracemalloc records for every tool call and every
+API request:
+- peak_bytes: highest traced memory above the level at the start
+- retained_bytes: memory still held at the end (caches, leaks)
+- top_sites: where the memory live at the peak was allocated, attributed to
+  the innermost line of this package (so a pandas copy shows up as the tool
+  line that triggered it)
+
+Results are kept in memory and served at GET /debug/memory; see also
+benchmarks/tool_memory.py. tracemalloc slows Python down several times, so
+this is for debugging and benchmarks only. Peaks are process-wide: calls
+running at the same time inflate each other's numbers.
+"""
+import collections
+import contextvars
+import functools
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass, field, asdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from my_agent import config
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Only allocations made (directly or through libraries) from our own code
+_TRACE_FILTERS = (tracemalloc.Filter(True, _PACKAGE_DIR + "*", all_frames=True),)
+RECENT_RECORDS = 200
+
+
+@dataclass
+class AllocationRecord:
+    kind: str  # "tool" or "endpoint"
+    name: str
+    peak_bytes: int
+    retained_bytes: int
+    duration_ms: float
+    top_sites: List[Tuple[str, int]] = field(default_factory=list)
+    tags: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class AllocationStats:
+    calls: int = 0
+    peak_total: int = 0
+    peak_max: int = 0
+    retained_total: int = 0
+    # Largest amount each site held at a call's peak
+    sites: "collections.Counter[str]" = field(default_factory=collections.Counter)
+
+    def add(self, record: AllocationRecord):
+        self.calls += 1
+        self.peak_total += record.peak_bytes
+        self.peak_max = max(self.peak_max, record.peak_bytes)
+        self.retained_total += record.retained_bytes
+        for site, size in record.top_sites:
+            self.sites[site] = max(self.sites[site], size)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "peak_mb_mean": round(self.peak_total / self.calls / 2**20, 3),
+            "peak_mb_max": round(self.peak_max / 2**20, 3),
+            "retained_kb_mean": round(self.retained_total / self.calls / 1024, 1),
+            "top_sites": [
+                {"site": site, "mb": round(size / 2**20, 3)}
+                for site, size in self.sites.most_common(config.MEMORY_PROFILE_TOP_SITES)
+            ],
+        }
+
+
+_lock = threading.Lock()
+_stats: Dict[str, Dict[str, AllocationStats]] = {
+    "tool": collections.defaultdict(AllocationStats),
+    "endpoint": collections.defaultdict(AllocationStats),
+}
+_recent: "collections.deque[AllocationRecord]" = collections.deque(maxlen=RECENT_RECORDS)
+# Tool records of the request being handled, merged into its endpoint record
+_request_records: contextvars.ContextVar[Optional[List[AllocationRecord]]] = contextvars.ContextVar(
+    "request_allocation_records", default=None
+)
+
+
+def ensure_tracing():
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(config.MEMORY_PROFILE_FRAMES)
+
+
+class _Scope:
+    """
+    Peak tracking for one measured call.
+
+    tracemalloc has a single process-wide peak; every reset first folds the
+    current peak into all open scopes so nested and concurrent scopes stay correct.
+    """
+    _open: "set[_Scope]" = set()
+
+    def __init__(self):
+        with _lock:
+            self._fold_peak()
+            self.start = self.peak = tracemalloc.get_traced_memory()[0]
+            self.started = time.perf_counter()
+            _Scope._open.add(self)
+            tracemalloc.reset_peak()
+
+    @staticmethod
+    def _fold_peak():
+        peak = tracemalloc.get_traced_memory()[1]
+        for scope in _Scope._open:
+            scope.peak = max(scope.peak, peak)
+
+    def close(self) -> Tuple[int, int, float]:
+        """Returns (peak bytes, retained bytes, duration ms) relative to the start."""
+        with _lock:
+            self._fold_peak()
+            _Scope._open.discard(self)
+            current = tracemalloc.get_traced_memory()[0]
+        return self.peak - self.start, current - self.start, (time.perf_counter() - self.started) * 1000
+
+
+class _PeakSnapshotter:
+    """
+    Profile hook that snapshots the heap whenever one of our functions
+    returns with more memory traced than seen so far in the call, i.e. while
+    its temporary DataFrames are still alive.
+    """
+
+    def __init__(self, start: int):
+        self.best = start
+        self.start = start
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+
+    def __call__(self, frame, event, arg):
+        if event != "return":
+            return
+        filename = frame.f_code.co_filename
+        if not filename.startswith(_PACKAGE_DIR) or filename == __file__:
+            return
+        current = tracemalloc.get_traced_memory()[0]
+        if current > self.best + max(64 * 1024, (self.best - self.start) // 20):
+            self.best = current
+            self.snapshot = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+
+
+def _site(traceback: tracemalloc.Traceback) -> Optional[str]:
+    """Innermost frame of this package, or None for the profiler's own allocations."""
+    chosen = traceback[-1]
+    for frame in reversed(traceback):
+        if frame.filename.startswith(_PACKAGE_DIR):
+            chosen = frame
+            break
+    if chosen.filename == __file__:
+        return None
+    filename = chosen.filename
+    if filename.startswith(_ROOT_DIR):
+        filename = os.path.relpath(filename, _ROOT_DIR)
+    return f"{filename}:{chosen.lineno}"
+
+
+def _top_sites(peak: Optional[tracemalloc.Snapshot], baseline: tracemalloc.Snapshot) -> List[Tuple[str, int]]:
+    if peak is None:
+        return []
+    sites: "collections.Counter[str]" = collections.Counter()
+    for diff in peak.compare_to(baseline, "traceback"):
+        site = _site(diff.traceback) if diff.size_diff > 0 else None
+        if site is not None:
+            sites[site] += diff.size_diff
+    return sites.most_common(config.MEMORY_PROFILE_TOP_SITES)
+
+
+def _record(record: AllocationRecord):
+    with _lock:
+        _stats[record.kind][record.name].add(record)
+        _recent.append(record)
+
+
+def track_allocations(func: Callable) -> Callable:
+    """
+    Records peak/retained memory and top allocation sites of each call of a
+    tool when MEMORY_PROFILING_ENABLED (otherwise a plain call).
+    """
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not config.MEMORY_PROFILING_ENABLED:
+            return func(*args, **kwargs)
+
+        ensure_tracing()
+        baseline = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+        scope = _Scope()
+        snapshotter = _PeakSnapshotter(scope.start)
+        previous_hook = sys.getprofile()
+        sys.setprofile(snapshotter)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sys.setprofile(previous_hook)
+            peak, retained, duration_ms = scope.close()
+            record = AllocationRecord(
+                "tool", name, peak, retained, round(duration_ms, 2), _top_sites(snapshotter.snapshot, baseline)
+            )
+            _record(record)
+            request_records = _request_records.get()
+            if request_records is not None:
+                request_records.append(record)
+
+    return wrapper
+
+
+class MemoryProfilingMiddleware:
+    """
+    ASGI middleware recording one AllocationRecord per request (until the
+    last body chunk, so streamed responses are covered). Its top sites are
+    merged from the tool calls made while handling it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not config.MEMORY_PROFILING_ENABLED or scope["path"].startswith("/debug/"):
+            await self.app(scope, receive, send)
+            return
+
+        ensure_tracing()
+        measured = _Scope()
+        tool_records: List[AllocationRecord] = []
+        token = _request_records.set(tool_records)
+        finished = False
+
+        def finish():
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            peak, retained, duration_ms = measured.close()
+            sites: "collections.Counter[str]" = collections.Counter()
+            for tool_record in tool_records:
+                for site, size in tool_record.top_sites:
+                    sites[site] = max(sites[site], size)
+            _record(AllocationRecord(
+                "endpoint", scope["path"], peak, retained, round(duration_ms, 2),
+                sites.most_common(config.MEMORY_PROFILE_TOP_SITES),
+                {"method": scope.get("method"), "tool_calls": [r.name for r in tool_records]},
+            ))
+
+        async def send_wrapper(message):
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finish()
+            _request_records.reset(token)
+
+
+def memory_report(recent: int = 20) -> Dict[str, Any]:
+    """Per-tool and per-endpoint allocation summaries plus the latest records."""
+    with _lock:
+        current = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        return {
+            "enabled": config.MEMORY_PROFILING_ENABLED,
+            "tracing": tracemalloc.is_tracing(),
+            "traced_mb": round(current / 2**20, 2),
+            "tools": {name: s.summary() for name, s in sorted(_stats["tool"].items())},
+            "endpoints": {name: s.summary() for name, s in sorted(_stats["endpoint"].items())},
+            "recent": [asdict(r) for r in list(_recent)[-recent:]] if recent else [],
+        }
+
+
+def reset_memory_stats():
+    with _lock:
+        for stats in _stats.values():
+            stats.clear()
+        _recent.clear()
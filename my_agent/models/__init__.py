@@ -0,0 +1,72 @@
+"""
+Model construction for MyYear.AI agents
+
+Every agent gets its model from build_model(), which picks the backend
+(MODEL_BACKEND) and wraps it with per-model admission control and the
+agent's timeout/retry/hedging policy.
+"""
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.registry import LLMRegistry
+
+from my_agent import config
+from my_agent.models.admission import AdmissionController, AdmissionRejected, ModelLimits, admission_controller
+from my_agent.models.managed import ManagedLlm
+from my_agent.models.record_replay import Cassette, CassetteMiss, RecordReplayLlm, get_cassette
+from my_agent.models.resilience import CallPolicy, ModelCallError, call_stats
+from my_agent.models.stub import StubLlm, StubModelError
+
+
+def build_backend(model_name: str) -> BaseLlm:
+    """The unwrapped model for the configured backend."""
+    if config.MODEL_BACKEND == "stub":
+        return StubLlm(
+            model=model_name,
+            latency_ms=config.STUB_LATENCY_MS,
+            jitter_ms=config.STUB_JITTER_MS,
+            slow_rate=config.STUB_SLOW_RATE,
+            slow_latency_ms=config.STUB_SLOW_LATENCY_MS,
+            failure_rate=config.STUB_FAILURE_RATE,
+            ms_per_1k_tokens=config.STUB_MS_PER_1K_TOKENS,
+        )
+    if config.MODEL_BACKEND in ("record", "replay"):
+        latency = config.MODEL_REPLAY_LATENCY_MS
+        return RecordReplayLlm(
+            model=model_name,
+            mode=config.MODEL_BACKEND,
+            inner=LLMRegistry.new_llm(model_name),
+            cassette=get_cassette(config.MODEL_CASSETTE_PATH),
+            latency_ms=None if latency == "recorded" else float(latency),
+            strict=config.MODEL_REPLAY_STRICT,
+        )
+    return LLMRegistry.new_llm(model_name)
+
+
+def build_model(model_name: str, agent_name: str) -> ManagedLlm:
+    """
+    Model instance for an agent.
+
+    Args:
+        model_name: e.g. 'gemini-2.5-flash-lite'; admission limits are per model name
+        agent_name: Agent using it (for logs)
+    """
+    return ManagedLlm(model=model_name, inner=build_backend(model_name), agent_name=agent_name)
+
+
+__all__ = [
+    "AdmissionController",
+    "AdmissionRejected",
+    "CallPolicy",
+    "Cassette",
+    "CassetteMiss",
+    "ModelCallError",
+    "ManagedLlm",
+    "ModelLimits",
+    "RecordReplayLlm",
+    "StubLlm",
+    "StubModelError",
+    "admission_controller",
+    "build_backend",
+    "build_model",
+    "get_cassette",
+    "call_stats",
+]
@@ -0,0 +1,187 @@
+"""
+Per-Model Admission Control
+KEY CONCEPT: Bounded concurrency + bounded queues with deadlines
+
+Each model gets its own gate: at most max_concurrency calls in flight, at
+most max_queue callers waiting, and no caller waits longer than
+queue_timeout_s. When quota is tight the slow gemini-2.5-pro queue fills up
+and sheds load on its own instead of dragging flash-lite calls down with it.
+"""
+import asyncio
+import collections
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Deque, Dict, Any, Optional
+
+
+@dataclass
+class ModelLimits:
+    max_concurrency: int = 8
+    max_queue: int = 32
+    queue_timeout_s: float = 10.0
+
+
+# Defaults per model; override with MODEL_LIMITS='{"gemini-2.5-pro": {"max_concurrency": 2}}'
+DEFAULT_MODEL_LIMITS = {
+    "gemini-2.5-flash-lite": ModelLimits(max_concurrency=16, max_queue=64, queue_timeout_s=10.0),
+    "gemini-2.5-pro": ModelLimits(max_concurrency=4, max_queue=16, queue_timeout_s=30.0),
+}
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a model call is shed instead of queued.
+
+    status_code is 429 when the queue is full (client should back off) and
+    503 when the caller waited past the queue deadline.
+    """
+
+    def __init__(self, model: str, reason: str, status_code: int, retry_after_s: float):
+        super().__init__(f"{model}: {reason}")
+        self.model = model
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after_s = retry_after_s
+
+
+class ModelGate:
+    """Concurrency limiter with a bounded FIFO queue for one model."""
+
+    def __init__(self, model: str, limits: ModelLimits):
+        self.model = model
+        self.limits = limits
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = collections.deque()
+        self._wait_times: Deque[float] = collections.deque(maxlen=1024)
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_deadline = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    def has_capacity(self) -> bool:
+        """True if a new caller would be admitted or queued right now."""
+        return self.in_flight < self.limits.max_concurrency or self.queued < self.limits.max_queue
+
+    async def acquire(self) -> float:
+        """
+        Waits for a slot.
+
+        Returns:
+            Seconds spent queued
+
+        Raises:
+            AdmissionRejected: Queue full (429) or queue deadline passed (503)
+        """
+        started = time.perf_counter()
+        if self.in_flight < self.limits.max_concurrency and not self.queued:
+            self.in_flight += 1
+            return self._admit(started)
+
+        if self.queued >= self.limits.max_queue:
+            self.rejected_queue_full += 1
+            raise AdmissionRejected(self.model, "queue full", 429, self.limits.queue_timeout_s)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.limits.queue_timeout_s)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # A slot was handed over just as we gave up; pass it on
+                self.release()
+            else:
+                waiter.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected_deadline += 1
+                raise AdmissionRejected(self.model, "queue deadline exceeded", 503, self.limits.queue_timeout_s)
+            raise
+        return self._admit(started)
+
+    def try_acquire(self) -> bool:
+        """Takes a free slot without queueing (used for optional work like hedges)."""
+        if self.in_flight < self.limits.max_concurrency and not self.queued:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+        return False
+
+    def _admit(self, started: float) -> float:
+        waited = time.perf_counter() - started
+        self._wait_times.append(waited)
+        self.admitted += 1
+        return waited
+
+    def release(self):
+        """Frees a slot, handing it straight to the next live waiter."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._wait_times)
+
+        def percentile(p: float) -> Optional[float]:
+            if not waits:
+                return None
+            return round(waits[min(int(p * len(waits)), len(waits) - 1)] * 1000, 2)
+
+        return {
+            "max_concurrency": self.limits.max_concurrency,
+            "max_queue": self.limits.max_queue,
+            "queue_timeout_s": self.limits.queue_timeout_s,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_deadline": self.rejected_deadline,
+            "queue_wait_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "max": percentile(1.0)},
+        }
+
+
+class AdmissionController:
+    """Registry of per-model gates."""
+
+    def __init__(self, limits: Optional[Dict[str, ModelLimits]] = None,
+                 default_limits: Optional[ModelLimits] = None):
+        self.limits = dict(DEFAULT_MODEL_LIMITS if limits is None else limits)
+        self.default_limits = default_limits or ModelLimits()
+        self._gates: Dict[str, ModelGate] = {}
+
+    def gate(self, model: str) -> ModelGate:
+        gate = self._gates.get(model)
+        if gate is None:
+            gate = self._gates[model] = ModelGate(model, self.limits.get(model, self.default_limits))
+        return gate
+
+    def check_capacity(self, models) -> Optional[AdmissionRejected]:
+        """Returns a rejection if any of the models is saturated (for early shedding)."""
+        for model in models:
+            gate = self.gate(model)
+            if not gate.has_capacity():
+                return AdmissionRejected(model, "queue full", 429, gate.limits.queue_timeout_s)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {model: gate.stats() for model, gate in self._gates.items()}
+
+
+def limits_from_env() -> Dict[str, ModelLimits]:
+    """Default limits merged with overrides from the MODEL_LIMITS env var (JSON)."""
+    limits = dict(DEFAULT_MODEL_LIMITS)
+    overrides = json.loads(os.getenv("MODEL_LIMITS", "{}") or "{}")
+    for model, values in overrides.items():
+        base = limits.get(model, ModelLimits())
+        limits[model] = ModelLimits(**{**base.__dict__, **values})
+    return limits
+
+
+# Process-wide controller shared by every agent
+admission_controller = AdmissionController(limits_from_env())
@@ -0,0 +1,99 @@
+"""
+Managed Model Wrapper
+KEY CONCEPT: One choke point in front of every model call
+
+ManagedLlm wraps the real model (Gemini or the stub) and makes every call
+pass through the per-model admission gate, then applies the calling agent's
+timeout / retry / hedging policy. Agents see an ordinary BaseLlm, so nothing
+else in the ADK flow changes.
+"""
+import asyncio
+import logging
+import time
+from typing import AsyncGenerator, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models._capabilities import LlmCapabilities
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from pydantic import Field
+
+from my_agent.models.admission import AdmissionController, admission_controller
+from my_agent.models.resilience import (
+    CallPolicy, ModelCallError, backoff_delay, call_stats, hedged_stream, is_retryable, policy_for
+)
+from my_agent.tracing import add_span_event, annotate_span
+
+logger = logging.getLogger(__name__)
+
+
+class ManagedLlm(BaseLlm):
+    """Admission-controlled, tail-tolerant proxy for another model."""
+
+    inner: BaseLlm
+    agent_name: Optional[str] = None
+    controller: AdmissionController = Field(default=admission_controller, exclude=True)
+    policy: Optional[CallPolicy] = Field(default=None, exclude=True)  # None = per-agent config
+
+    @property
+    def capabilities(self) -> LlmCapabilities:
+        return self.inner.capabilities
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        gate = self.controller.gate(self.model)
+        policy = self.policy or policy_for(self.agent_name)
+        stats = call_stats[self.agent_name or self.model]
+        stats.calls += 1
+        started = time.perf_counter()
+        retry = 0
+        queue_wait = 0.0
+
+        while True:
+            waited = await gate.acquire()
+            queue_wait += waited
+            annotate_span(**{
+                "model.agent": self.agent_name,
+                "model.attempts": retry + 1,
+                "model.queue_wait_ms": round(queue_wait * 1000, 1),
+            })
+            if waited > 0.5:
+                logger.info("%s waited %.2fs for a %s slot", self.agent_name, waited, self.model)
+
+            yielded = False
+            try:
+                async for response in hedged_stream(
+                    start=lambda: self.inner.generate_content_async(llm_request, stream=stream),
+                    release=gate.release,
+                    try_acquire_hedge=gate.try_acquire,
+                    policy=policy,
+                    stats=stats,
+                ):
+                    yielded = True
+                    yield response
+                stats.record_latency(time.perf_counter() - started)
+                return
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    stats.timeouts += 1
+                if yielded or not is_retryable(e):
+                    stats.failures += 1
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise ModelCallError(self.model, self.agent_name, retry + 1, e) from e
+                    raise
+                if retry >= policy.max_retries:
+                    stats.failures += 1
+                    raise ModelCallError(self.model, self.agent_name, retry + 1, e) from e
+
+                delay = backoff_delay(retry, policy)
+                logger.warning("%s call for %s failed (%s), retrying in %.2fs",
+                               self.model, self.agent_name, e, delay)
+                stats.retries += 1
+                add_span_event("model_retry", error=repr(e), delay_ms=round(delay * 1000, 1))
+                retry += 1
+                await asyncio.sleep(delay)
+
+    def connect(self, llm_request: LlmRequest):
+        # Live sessions are long-lived and bypass the request gate
+        return self.inner.connect(llm_request)
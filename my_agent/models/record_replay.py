@@ -0,0 +1,199 @@
+"""
+Record/Replay Model Backend
+KEY CONCEPT: Deterministic offline model calls for load tests and benchmarks
+
+MODEL_BACKEND=record runs the real model and appends every request/response
+pair (function calls included) to a JSONL cassette. MODEL_BACKEND=replay
+serves those responses with no network and no API key, so the full
+coordinator -> pattern_finder -> storyteller flow (with the real tools) can
+be driven at high QPS.
+
+Requests are matched on a hash of their normalized content. When the exact
+request wasn't recorded (different user text, random quiz dates) replay
+falls back to the request's "shape": same agent instruction, same tools and
+the same sequence of roles / function calls, ignoring text and tool output.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import AsyncGenerator, Dict, Any, List, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models._capabilities import LlmCapabilities
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from pydantic import Field
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode when no recording matches a request."""
+
+
+def _normalized_part(part) -> Dict[str, Any]:
+    if part.function_call:
+        # IDs are generated per run, so they're never part of the key
+        return {"function_call": {"name": part.function_call.name, "args": part.function_call.args}}
+    if part.function_response:
+        return {"function_response": {
+            "name": part.function_response.name, "response": part.function_response.response
+        }}
+    if part.text is not None:
+        return {"text": part.text.strip()}
+    return {"other": sorted(k for k, v in part.model_dump(exclude_none=True).items())}
+
+
+def _part_kind(part) -> str:
+    if part.function_call:
+        return f"call:{part.function_call.name}"
+    if part.function_response:
+        return f"response:{part.function_response.name}"
+    return "text" if part.text is not None else "other"
+
+
+def _digest(value: Any) -> str:
+    encoded = json.dumps(value, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def request_keys(llm_request: LlmRequest) -> Dict[str, str]:
+    """Exact and shape keys for a request."""
+    config = llm_request.config
+    instruction = config.system_instruction if config else None
+    tools = sorted(llm_request.tools_dict) if llm_request.tools_dict else []
+    contents = llm_request.contents or []
+
+    base = {"model": llm_request.model, "instruction": str(instruction), "tools": tools}
+    exact = {
+        **base,
+        "contents": [
+            {"role": c.role, "parts": [_normalized_part(p) for p in c.parts or []]} for c in contents
+        ],
+    }
+    shape = {
+        **base,
+        "contents": [[c.role, [_part_kind(p) for p in c.parts or []]] for c in contents],
+    }
+    return {"key": _digest(exact), "shape_key": _digest(shape)}
+
+
+def _strip_call_ids(response: Dict[str, Any]) -> Dict[str, Any]:
+    for part in (response.get("content") or {}).get("parts") or []:
+        for field in ("function_call", "function_response"):
+            if field in part:
+                part[field].pop("id", None)
+    return response
+
+
+class Cassette:
+    """
+    Append-only JSONL store of recorded model interactions.
+
+    Each line holds the request keys, the recorded latency and the list of
+    responses. The latest recording wins when a key was recorded twice.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._by_key: Dict[str, Dict[str, Any]] = {}
+        self._by_shape: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    self._index(json.loads(line))
+
+    def _index(self, entry: Dict[str, Any]):
+        self._by_key[entry["key"]] = entry
+        self._by_shape[entry["shape_key"]] = entry
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def record(self, keys: Dict[str, str], model: str, latency_ms: float, responses: List[Dict[str, Any]]):
+        entry = {**keys, "model": model, "latency_ms": round(latency_ms, 1), "responses": responses}
+        line = json.dumps(entry, default=str) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(line)
+            self._index(entry)
+
+    def lookup(self, keys: Dict[str, str], strict: bool = False) -> Optional[Dict[str, Any]]:
+        entry = self._by_key.get(keys["key"])
+        if entry is None and not strict:
+            entry = self._by_shape.get(keys["shape_key"])
+        return entry
+
+
+_cassettes: Dict[str, Cassette] = {}
+
+
+def get_cassette(path: str) -> Cassette:
+    """Shared cassette per file, so every agent appends to the same one."""
+    cassette = _cassettes.get(path)
+    if cassette is None:
+        cassette = _cassettes[path] = Cassette(path)
+    return cassette
+
+
+class RecordReplayLlm(BaseLlm):
+    """
+    Records another model's responses, or replays them offline.
+
+    Args (fields):
+        mode: "record" or "replay"
+        inner: Real model (called only when recording; also reports capabilities)
+        latency_ms: Replay delay per call; None replays the recorded latency
+        strict: Replay only exact matches (no shape fallback)
+    """
+
+    mode: str = "replay"
+    inner: BaseLlm
+    cassette: Cassette = Field(exclude=True)
+    latency_ms: Optional[float] = 0.0
+    strict: bool = False
+
+    @property
+    def capabilities(self) -> LlmCapabilities:
+        return self.inner.capabilities
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        keys = request_keys(llm_request)
+        if self.mode == "record":
+            async for response in self._record(llm_request, stream, keys):
+                yield response
+            return
+
+        entry = self.cassette.lookup(keys, strict=self.strict)
+        if entry is None:
+            raise CassetteMiss(
+                f"No recording for this {self.model} request in {self.cassette.path} "
+                f"(record it with MODEL_BACKEND=record)"
+            )
+        delay_ms = entry.get("latency_ms", 0) if self.latency_ms is None else self.latency_ms
+        responses = [r for r in entry["responses"] if stream or not r.get("partial")]
+        for response in responses:
+            # Spread the delay over the chunks so streaming still looks like streaming
+            await asyncio.sleep(delay_ms / 1000 / len(responses))
+            yield LlmResponse.model_validate(response)
+
+    async def _record(self, llm_request: LlmRequest, stream: bool, keys: Dict[str, str]) -> AsyncGenerator:
+        started = time.perf_counter()
+        recorded = []
+        async for response in self.inner.generate_content_async(llm_request, stream=stream):
+            recorded.append(_strip_call_ids(response.model_dump(mode="json", exclude_none=True)))
+            yield response
+        self.cassette.record(keys, self.model, (time.perf_counter() - started) * 1000, recorded)
+
+    def connect(self, llm_request: LlmRequest):
+        return self.inner.connect(llm_request)
@@ -0,0 +1,257 @@
+"""
+Timeouts, Retries and Hedged Requests for Model Calls
+KEY CONCEPT: Tail-tolerant model calls, tuned per agent
+
+One slow Gemini response used to set the p99 of a whole multi-agent turn and
+one transient error aborted it. Each call now has a deadline, transient
+failures are retried with full-jitter exponential backoff, and (optionally)
+a duplicate "hedge" request is sent if the first hasn't started answering
+after hedge_after_s; whichever answers first wins and the other is cancelled.
+
+Retries and hedges only happen before the first chunk has reached the
+caller, so a streamed answer is never duplicated.
+"""
+import asyncio
+import collections
+import json
+import math
+import os
+import random
+from dataclasses import dataclass
+from typing import AsyncGenerator, Callable, Dict, Any, List, Optional
+
+import httpx
+
+from my_agent.models.admission import AdmissionRejected
+from my_agent.tracing import add_span_event
+
+
+@dataclass
+class CallPolicy:
+    timeout_s: float = 60.0
+    max_retries: int = 2
+    backoff_base_s: float = 0.5
+    backoff_max_s: float = 8.0
+    hedge_after_s: float = 0.0  # 0 disables hedging
+
+
+# Per-agent defaults; override with MODEL_CALL_POLICIES='{"storyteller": {"timeout_s": 90}}'
+# ("default" applies to agents without their own entry)
+DEFAULT_CALL_POLICY = CallPolicy()
+DEFAULT_AGENT_POLICIES = {
+    "personal_curator": CallPolicy(timeout_s=45.0, hedge_after_s=8.0),
+    "pattern_finder": CallPolicy(timeout_s=45.0, hedge_after_s=8.0),
+    "quiz_agent": CallPolicy(timeout_s=30.0, hedge_after_s=5.0),
+    "social_agent": CallPolicy(timeout_s=45.0),
+    # Pro calls are long and expensive: generous deadline, no duplicates
+    "storyteller": CallPolicy(timeout_s=120.0, max_retries=1),
+}
+
+# HTTP status codes worth retrying (rate limited / server side)
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class ModelCallError(Exception):
+    """Raised when a model call still fails after its retries."""
+
+    def __init__(self, model: str, agent_name: Optional[str], attempts: int, cause: BaseException):
+        reason = "timed out" if isinstance(cause, asyncio.TimeoutError) else f"failed ({cause})"
+        super().__init__(f"{model} call for {agent_name or 'agent'} {reason} after {attempts} attempt(s)")
+        self.model = model
+        self.agent_name = agent_name
+        self.attempts = attempts
+        self.timed_out = isinstance(cause, asyncio.TimeoutError)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Transient failures: timeouts, connection problems, 429/5xx responses."""
+    if isinstance(error, AdmissionRejected):
+        return False  # Shedding is deliberate, retrying would defeat it
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError, httpx.TransportError)):
+        return True
+    return getattr(error, "code", None) in RETRYABLE_STATUS_CODES
+
+
+def backoff_delay(retry: int, policy: CallPolicy) -> float:
+    """Full-jitter exponential backoff for the given retry (0-based)."""
+    return random.uniform(0, min(policy.backoff_max_s, policy.backoff_base_s * (2 ** retry)))
+
+
+def policies_from_env() -> Dict[str, CallPolicy]:
+    """Default per-agent policies merged with MODEL_CALL_POLICIES overrides (JSON)."""
+    policies = {"default": DEFAULT_CALL_POLICY, **DEFAULT_AGENT_POLICIES}
+    overrides = json.loads(os.getenv("MODEL_CALL_POLICIES", "{}") or "{}")
+    for agent_name, values in overrides.items():
+        base = policies.get(agent_name, policies["default"])
+        policies[agent_name] = CallPolicy(**{**base.__dict__, **values})
+    return policies
+
+
+call_policies = policies_from_env()
+
+
+def policy_for(agent_name: Optional[str]) -> CallPolicy:
+    return call_policies.get(agent_name or "", call_policies["default"])
+
+
+class CallStats:
+    """Per-agent counters for retries, hedges and timeouts."""
+
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+        self.failures = 0
+        self._latencies: "collections.deque[float]" = collections.deque(maxlen=1024)
+
+    def record_latency(self, seconds: float):
+        self._latencies.append(seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(int(p * len(latencies)), len(latencies) - 1)] * 1000, 2)
+
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "latency_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "p99": percentile(0.99)},
+        }
+
+
+call_stats: Dict[str, CallStats] = collections.defaultdict(CallStats)
+
+
+class _Attempt:
+    """
+    One in-flight request, pumped into a queue by its own task.
+
+    first_ready resolves when the first chunk (or the error) arrives, so
+    racing attempts can be compared without consuming their output. on_finish
+    runs exactly once when the task ends, even if it was cancelled before it
+    started.
+    """
+
+    _END = object()
+
+    def __init__(self, stream: AsyncGenerator, on_finish: Callable[[], None]):
+        self.chunks: asyncio.Queue = asyncio.Queue()
+        self.first_ready = asyncio.get_running_loop().create_future()
+        self._on_finish: Optional[Callable[[], None]] = on_finish
+        self.task = asyncio.create_task(self._pump(stream))
+        self.task.add_done_callback(self._finished)
+
+    def _finished(self, _task: asyncio.Task):
+        on_finish, self._on_finish = self._on_finish, None
+        if on_finish is not None:
+            on_finish()
+
+    async def _pump(self, stream: AsyncGenerator):
+        try:
+            async for chunk in stream:
+                self.chunks.put_nowait(chunk)
+                if not self.first_ready.done():
+                    self.first_ready.set_result(None)
+            self.chunks.put_nowait(self._END)
+            if not self.first_ready.done():
+                self.first_ready.set_result(None)
+        except Exception as e:
+            self.chunks.put_nowait(e)
+            if not self.first_ready.done():
+                self.first_ready.set_exception(e)
+
+    @property
+    def failed(self) -> bool:
+        return self.first_ready.done() and self.first_ready.exception() is not None
+
+    def cancel(self):
+        self.task.cancel()
+        if not self.first_ready.done():
+            self.first_ready.cancel()
+
+    async def chunks_until(self, deadline: float) -> AsyncGenerator:
+        loop = asyncio.get_running_loop()
+        while True:
+            chunk = await asyncio.wait_for(self.chunks.get(), timeout=max(deadline - loop.time(), 0))
+            if chunk is self._END:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+
+async def hedged_stream(
+    start: Callable[[], AsyncGenerator],
+    release: Callable[[], None],
+    try_acquire_hedge: Callable[[], bool],
+    policy: CallPolicy,
+    stats: CallStats,
+) -> AsyncGenerator:
+    """
+    Runs one model call (the caller already holds a slot for it), hedging if
+    it is slow to start, and streams the winner's chunks.
+
+    Args:
+        start: Starts a fresh request stream
+        release: Gives back the slot an attempt held
+        try_acquire_hedge: Takes a slot for a hedge without queueing (False = don't hedge)
+        policy: Timeout and hedge settings
+        stats: Counters to update
+
+    Raises:
+        asyncio.TimeoutError: If no answer completes within policy.timeout_s
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + policy.timeout_s
+    hedge_at = loop.time() + policy.hedge_after_s if policy.hedge_after_s > 0 else math.inf
+    attempts: List[_Attempt] = [_Attempt(start(), release)]
+    winner: Optional[_Attempt] = None
+
+    try:
+        while winner is None:
+            pending = [a.first_ready for a in attempts if not a.first_ready.done()]
+            ready = [a for a in attempts if a.first_ready.done() and not a.failed]
+            if ready:
+                winner = ready[0]
+                break
+            if not pending:
+                # Every attempt failed: surface the primary's error
+                attempts[0].first_ready.result()
+
+            wake_at = min(deadline, hedge_at)
+            await asyncio.wait(pending, timeout=max(wake_at - loop.time(), 0),
+                               return_when=asyncio.FIRST_COMPLETED)
+
+            now = loop.time()
+            answered = any(a.first_ready.done() and not a.failed for a in attempts)
+            if now >= deadline and not answered:
+                raise asyncio.TimeoutError()
+            if now >= hedge_at:
+                hedge_at = math.inf  # At most one hedge per attempt
+                # Don't hedge (and cancel it straight away) if an answer just arrived
+                if not answered and try_acquire_hedge():
+                    stats.hedges += 1
+                    add_span_event("model_hedge")
+                    attempts.append(_Attempt(start(), release))
+
+        if winner is not attempts[0]:
+            stats.hedge_wins += 1
+            add_span_event("model_hedge_won")
+        for attempt in attempts:
+            if attempt is not winner:
+                attempt.cancel()
+
+        async for chunk in winner.chunks_until(deadline):
+            yield chunk
+    finally:
+        for attempt in attempts:
+            attempt.cancel()
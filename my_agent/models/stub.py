@@ -0,0 +1,99 @@
+"""
+Local Stub Model
+KEY CONCEPT: Exercise the agent stack offline with injected latency
+
+Stands in for Gemini (MODEL_BACKEND=stub) so admission control, load tests
+and the API can be exercised without an API key or quota. Every call sleeps
+for latency_ms +/- jitter_ms and then answers with a short canned reply.
+A fraction of calls can be made slow (slow_rate) or fail with a 503
+(failure_rate) to exercise timeouts, retries and hedging, and
+ms_per_1k_tokens adds prompt-size dependent latency like a real model's
+prefill.
+"""
+import asyncio
+import random
+from typing import AsyncGenerator
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models._capabilities import LlmCapabilities
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from my_agent.compaction import estimate_tokens
+
+
+class StubModelError(Exception):
+    """Simulated transient server error (looks like a 503 from the API)."""
+
+    code = 503
+
+
+class StubLlm(BaseLlm):
+    """Fake model that answers every request after an injected delay."""
+
+    latency_ms: float = 200.0
+    jitter_ms: float = 50.0
+    slow_rate: float = 0.0
+    slow_latency_ms: float = 5000.0
+    failure_rate: float = 0.0
+    ms_per_1k_tokens: float = 0.0
+
+    @property
+    def capabilities(self) -> LlmCapabilities:
+        return LlmCapabilities(output_schema_and_tools=True)
+
+    def _delay(self, llm_request: LlmRequest) -> float:
+        if self.slow_rate and random.random() < self.slow_rate:
+            return self.slow_latency_ms / 1000
+        prefill_ms = 0.0
+        if self.ms_per_1k_tokens:
+            prefill_ms = estimate_tokens(llm_request.contents or []) / 1000 * self.ms_per_1k_tokens
+        return max(0.0, self.latency_ms + prefill_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+
+    @staticmethod
+    def _last_user_text(llm_request: LlmRequest) -> str:
+        for content in reversed(llm_request.contents or []):
+            if content.role == "user":
+                for part in content.parts or []:
+                    if part.text:
+                        return part.text.strip()
+        return ""
+
+    def _reply(self, llm_request: LlmRequest) -> str:
+        question = " ".join(self._last_user_text(llm_request).split())[:80]
+        return f"[stub:{self.model}] Here's what I found about: {question}"
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        delay = self._delay(llm_request)
+        text = self._reply(llm_request)
+        if self.failure_rate and random.random() < self.failure_rate:
+            await asyncio.sleep(delay * 0.25)
+            raise StubModelError(f"{self.model}: simulated 503 UNAVAILABLE")
+
+        if stream:
+            # First token after most of the latency, the rest trickles in
+            words = text.split(" ")
+            await asyncio.sleep(delay * 0.6)
+            step = delay * 0.4 / max(len(words), 1)
+            for i, word in enumerate(words):
+                chunk = word if i == 0 else f" {word}"
+                yield LlmResponse(
+                    content=types.Content(role="model", parts=[types.Part(text=chunk)]),
+                    partial=True,
+                )
+                await asyncio.sleep(step)
+        else:
+            await asyncio.sleep(delay)
+
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[types.Part(text=text)]),
+            partial=False,
+            turn_complete=True,
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=sum(len((c.parts or [])) for c in llm_request.contents or []),
+                candidates_token_count=len(text.split()),
+            ),
+        )
@@ -0,0 +1,229 @@
+"""
+Request-Scoped CPU Profiling for the API
+KEY CONCEPT: Opt-in sampling profiler with flamegraph output
+
+When a /wrapped call is slow, a profile shows whether the time went to
+pandas in the tools, JSON serialization of tool results, or waiting on the
+model (the event loop sitting idle in select()).
+
+A request is profiled when it carries the X-Profile header (if
+PROFILE_ALLOW_HEADER) or is picked by PROFILE_SAMPLE_RATE. While at least one
+profiled request is in flight, a single background thread samples every
+thread's stack every PROFILE_INTERVAL_MS; nothing runs when no request is
+being profiled. Each profile is written to PROFILE_DIR in collapsed-stack
+format (flamegraph.pl / speedscope / inferno) with a JSON sidecar holding
+the endpoint, user and session tags.
+
+Samples are taken process-wide, so requests running concurrently with a
+profiled one show up in its profile too (the sidecar records how many were
+in flight); profile under light load for clean attribution.
+"""
+import collections
+import contextvars
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, Any, Optional
+
+from my_agent import config
+
+PROFILE_HEADER = b"x-profile"
+
+# Leaf functions that mean "this thread is waiting, not computing"
+_IDLE_FUNCTIONS = {"select", "poll", "epoll", "wait", "_wait_for_tstate_lock", "get", "sleep", "accept"}
+# An event loop implemented in C (uvloop) leaves its Python entry point as the leaf while idle
+_LOOP_ENTRY_POINTS = {"run", "Runner.run", "BaseEventLoop.run_until_complete", "BaseEventLoop.run_forever"}
+_IDLE_LABEL = "[idle: waiting on I/O (model calls, network)]"
+
+_current_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar(
+    "request_profile", default=None
+)
+
+
+_STDLIB_DIR = os.path.dirname(os.__file__) + os.sep
+
+
+def _qualname(code) -> str:
+    return getattr(code, "co_qualname", code.co_name)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename
+    marker = "site-packages" + os.sep
+    if marker in path:
+        path = path.split(marker, 1)[1]
+    elif path.startswith(_STDLIB_DIR):
+        path = path[len(_STDLIB_DIR):]
+    elif os.path.isabs(path):
+        path = os.path.relpath(path)
+    return f"{_qualname(code)} ({path})".replace(";", ":")
+
+
+def _collapse(frame) -> list:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+class RequestProfile:
+    """Samples collected for one request."""
+
+    def __init__(self, endpoint: str, loop_thread: int):
+        self.profile_id = uuid.uuid4().hex[:8]
+        self.tags: Dict[str, Any] = {"endpoint": endpoint}
+        self.loop_thread = loop_thread
+        self.counts: "collections.Counter[str]" = collections.Counter()
+        self.samples = 0
+        self.max_concurrent = 1
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+
+    @property
+    def path(self) -> str:
+        endpoint = self.tags["endpoint"].strip("/").replace("/", "_") or "root"
+        user = str(self.tags.get("user_id", "anon")).replace(os.sep, "_")
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started_at))
+        return os.path.join(config.PROFILE_DIR, f"{stamp}_{endpoint}_{user}_{self.profile_id}")
+
+    def write(self) -> str:
+        """Writes <path>.collapsed and <path>.json; returns the .collapsed path."""
+        os.makedirs(config.PROFILE_DIR, exist_ok=True)
+        base = self.path
+        with open(f"{base}.collapsed", "w") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+        metadata = {
+            **self.tags,
+            "profile_id": self.profile_id,
+            "started_at": self.started_at,
+            "duration_s": round(time.perf_counter() - self.started, 4),
+            "samples": self.samples,
+            "interval_ms": config.PROFILE_INTERVAL_MS,
+            "max_concurrent_requests": self.max_concurrent,
+        }
+        with open(f"{base}.json", "w") as f:
+            json.dump(metadata, f, indent=2, default=str)
+        return f"{base}.collapsed"
+
+
+class _Sampler:
+    """One sampling thread shared by every in-flight profile."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active: Dict[str, RequestProfile] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, profile: RequestProfile):
+        with self._lock:
+            self._active[profile.profile_id] = profile
+            for other in self._active.values():
+                other.max_concurrent = max(other.max_concurrent, len(self._active))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self, profile: RequestProfile):
+        with self._lock:
+            self._active.pop(profile.profile_id, None)
+
+    def _run(self):
+        interval = config.PROFILE_INTERVAL_MS / 1000
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                profiles = list(self._active.values())
+                if not profiles:
+                    self._thread = None
+                    return
+            names = {t.ident: t.name for t in threading.enumerate()}
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = _collapse(frame)
+                is_loop = any(thread_id == p.loop_thread for p in profiles)
+                idle = frame.f_code.co_name in _IDLE_FUNCTIONS or (
+                    is_loop and _qualname(frame.f_code) in _LOOP_ENTRY_POINTS
+                )
+                if idle and not is_loop:
+                    continue  # Parked worker threads are noise
+                if idle:
+                    stack = stack + [_IDLE_LABEL]
+                stacks.append(";".join([names.get(thread_id, str(thread_id))] + stack))
+            for profile in profiles:
+                profile.samples += 1
+                profile.counts.update(stacks)
+            time.sleep(interval)
+
+
+_sampler = _Sampler()
+
+
+def tag_profile(**tags):
+    """Adds tags (user_id, session_id, ...) to the current request's profile, if any."""
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.tags.update({k: v for k, v in tags.items() if v is not None})
+
+
+def _should_profile(headers) -> bool:
+    if config.PROFILE_ALLOW_HEADER:
+        for name, value in headers:
+            if name.lower() == PROFILE_HEADER:
+                return value.strip().lower() not in (b"", b"0", b"false", b"no")
+    return config.PROFILE_SAMPLE_RATE > 0 and random.random() < config.PROFILE_SAMPLE_RATE
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles selected requests end to end.
+
+    The profile stops after the last body chunk is sent, so streamed
+    responses (/chat/stream) are covered completely. The response carries
+    an X-Profile-Id header naming the written files.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _should_profile(scope.get("headers", [])):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["path"], threading.get_ident())
+        profile.tags["method"] = scope.get("method")
+        token = _current_profile.set(profile)
+        _sampler.start(profile)
+        finished = False
+
+        def finish():
+            nonlocal finished
+            if not finished:
+                finished = True
+                _sampler.stop(profile)
+                profile.write()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", os.path.basename(profile.path).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finish()
+            _current_profile.reset(token)
@@ -0,0 +1,351 @@
+"""
+Local Quiz Engine for MyYear.AI
+KEY CONCEPT: Deterministic quiz state machine, model only for flavor text
+
+Quiz mode used to send every answer through personal_curator, which
+re-reasoned over the whole conversation to grade it and pick the next
+question - a model round-trip per answer. QuizEngine builds the questions
+from the dataset up front (the facts table's quiz seeds plus "what did you
+watch on ..." date questions), grades answers locally with
+compare_guess_to_reality and keeps score, so answering takes milliseconds.
+A model is asked only optionally and in the background, for question
+phrasing and a playful one-liner per answer; the quiz never waits on it.
+"""
+import asyncio
+import random
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types
+
+from my_agent import config
+from my_agent.agents.quiz_agent import compare_guess_to_reality
+from my_agent.dataset_store import load_viewing_frame
+from my_agent.models import build_model
+from my_agent.tools.facts_tools import get_user_facts
+
+ASKING = "asking"
+FINISHED = "finished"
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+@dataclass
+class QuizQuestion:
+    """One question with everything needed to grade it locally."""
+
+    question: str
+    answer: Any
+    answer_type: str  # "show", "genre", "day_of_week" or "number"
+    choices: List[str] = field(default_factory=list)
+    accepted: List[str] = field(default_factory=list)  # Other correct answers (e.g. every show that day)
+    catalog: List[str] = field(default_factory=list)  # Names a guess could plausibly mean
+    source: str = "fact"
+
+
+def _date_questions(df, rng: random.Random, count: int, ranked_shows: List[str]) -> List[QuizQuestion]:
+    """'What did you watch on <date>?' for random days; any show from that day counts."""
+    if len(df) == 0 or count <= 0:
+        return []
+    days = df["date"].dt.floor("D")
+    unique_days = sorted(days.unique())
+    picked = rng.sample(unique_days, min(count, len(unique_days)))
+    questions = []
+    for day in sorted(picked):
+        day_rows = df[days == day]
+        shows = day_rows.groupby("show_name")["duration_minutes"].sum().sort_values(ascending=False)
+        main_show = str(shows.index[0])
+        label = f"{day:%B} {day.day}"
+        questions.append(QuizQuestion(
+            question=f"What did you watch on {label}?",
+            answer=main_show,
+            answer_type="show",
+            choices=sorted([main_show] + [s for s in ranked_shows if s not in shows.index][:3]),
+            accepted=[str(s) for s in shows.index],
+            catalog=ranked_shows,
+            source="date",
+        ))
+    return questions
+
+
+def build_questions(
+    file_path: str,
+    count: Optional[int] = None,
+    seed: Optional[int] = None,
+    user_id: Optional[str] = None
+) -> List[QuizQuestion]:
+    """
+    Questions for one quiz, alternating facts-table seeds and date questions.
+
+    Args:
+        file_path: Path to the CSV file, or dataset://<id> for an uploaded dataset
+        count: Number of questions (QUIZ_QUESTIONS by default)
+        seed: Random seed, for a reproducible quiz
+        user_id: User to quiz (optional for single-user histories)
+    """
+    count = config.QUIZ_QUESTIONS if count is None else count
+    rng = random.Random(seed)
+
+    df = load_viewing_frame(file_path)
+    if "user_id" in df.columns:
+        if user_id is not None:
+            df = df[df["user_id"].astype(str) == user_id]
+    else:
+        user_id = None  # Single-user history: the facts table has one unnamed user
+    ranked_shows = [str(s) for s in df.groupby("show_name")["duration_minutes"].sum().sort_values(ascending=False).index]
+
+    facts = get_user_facts(file_path, limit=count, user_id=user_id)
+    fact_questions = [
+        QuizQuestion(
+            question=fact["quiz"]["question"],
+            answer=fact["quiz"]["answer"],
+            answer_type=fact["quiz"]["answer_type"],
+            choices=fact["quiz"].get("choices", []),
+            catalog=ranked_shows if fact["quiz"]["answer_type"] == "show" else fact["quiz"].get("choices", []),
+            source=fact["fact_id"],
+        )
+        for fact in facts.get("facts", [])
+    ]
+    date_questions = _date_questions(df, rng, count, ranked_shows)
+
+    questions = []
+    while len(questions) < count and (fact_questions or date_questions):
+        for pool in (fact_questions, date_questions):
+            if pool and len(questions) < count:
+                questions.append(pool.pop(0))
+    return questions
+
+
+def _resolve_choice(question: QuizQuestion, guess: str) -> str:
+    """Maps "2" or "b" to the second choice of a multiple-choice question."""
+    token = guess.strip().lower().rstrip(").")
+    if not question.choices or len(token) != 1 or question.answer_type == "number":
+        return guess
+    if token.isdigit() and 1 <= int(token) <= len(question.choices):
+        return question.choices[int(token) - 1]
+    if "a" <= token <= "z" and ord(token) - ord("a") < len(question.choices):
+        return question.choices[ord(token) - ord("a")]
+    return guess
+
+
+def grade_answer(question: QuizQuestion, guess: str) -> Dict[str, Any]:
+    """Grades a guess without a model call."""
+    guess = _resolve_choice(question, guess)
+
+    if question.answer_type == "number":
+        match = _NUMBER.search(guess)
+        actual = float(question.answer)
+        if match is None:
+            return {"is_correct": False, "close": False, "user_guess": guess,
+                    "feedback": "🔢 That one needed a number!"}
+        value = float(match.group())
+        is_correct = value == actual
+        close = not is_correct and abs(value - actual) <= max(1.0, 0.2 * abs(actual))
+        if is_correct:
+            feedback = "🎯 Exactly right!"
+        elif close:
+            feedback = "😮 So close!"
+        else:
+            feedback = f"🤔 Not quite - you {'over' if value > actual else 'under'}estimated!"
+        return {"is_correct": is_correct, "close": close, "user_guess": guess, "feedback": feedback}
+
+    best = None
+    for accepted in [str(question.answer)] + [a for a in question.accepted if a != question.answer]:
+        result = compare_guess_to_reality(guess, accepted, catalog=question.catalog or None)
+        if best is None or result["is_correct"] and not best["is_correct"]:
+            best = result
+        if result["is_correct"]:
+            break
+    return {
+        "is_correct": best["is_correct"],
+        "close": not best["is_correct"] and best["similarity"] >= 0.5,
+        "user_guess": guess,
+        "matched": best["actual_show"] if best["is_correct"] else None,
+        "feedback": best["feedback"],
+    }
+
+
+class QuizEngine:
+    """
+    Quiz state machine: asking -> (answer | skip) -> ... -> finished.
+
+    Holds the question list, the current position and the score; every
+    transition is local and synchronous.
+    """
+
+    def __init__(self, questions: List[QuizQuestion]):
+        self.questions = questions
+        self.position = 0
+        self.score = 0
+        self.results: List[Dict[str, Any]] = []
+
+    @classmethod
+    def from_dataset(cls, file_path: str, count: Optional[int] = None,
+                     seed: Optional[int] = None, user_id: Optional[str] = None) -> "QuizEngine":
+        return cls(build_questions(file_path, count, seed, user_id))
+
+    @property
+    def state(self) -> str:
+        return ASKING if self.position < len(self.questions) else FINISHED
+
+    @property
+    def current(self) -> Optional[QuizQuestion]:
+        return self.questions[self.position] if self.state == ASKING else None
+
+    def _advance(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        question = self.current
+        result.update({
+            "number": self.position + 1,
+            "question": question.question,
+            "answer": question.answer,
+            "score": self.score,
+            "remaining": len(self.questions) - self.position - 1,
+        })
+        self.results.append(result)
+        self.position += 1
+        return result
+
+    def answer(self, guess: str) -> Dict[str, Any]:
+        """Grades the current question and moves on."""
+        if self.state != ASKING:
+            raise RuntimeError("Quiz is already finished")
+        result = grade_answer(self.current, guess)
+        if result["is_correct"]:
+            self.score += 1
+        return self._advance(result)
+
+    def skip(self) -> Dict[str, Any]:
+        """Reveals the current answer without scoring it."""
+        if self.state != ASKING:
+            raise RuntimeError("Quiz is already finished")
+        return self._advance({"is_correct": False, "close": False, "skipped": True,
+                              "user_guess": None, "feedback": "⏭️ Skipped!"})
+
+    def summary(self) -> Dict[str, Any]:
+        answered = len(self.results)
+        ratio = self.score / answered if answered else 0.0
+        if ratio >= 0.8:
+            verdict = "🏆 You know your viewing year inside out!"
+        elif ratio >= 0.5:
+            verdict = "🎬 Solid memory - a few plot twists got past you!"
+        else:
+            verdict = "🍿 Your year had more surprises than you remembered!"
+        return {"score": self.score, "answered": answered, "total": len(self.questions), "verdict": verdict}
+
+
+COMMENTARY_INSTRUCTION = (
+    "You are a playful quiz host for a personal TV viewing quiz. Given a question, "
+    "the correct answer and the player's guess, reply with ONE short, warm, funny "
+    "sentence (under 25 words, one emoji max). Never say whether they were right; "
+    "that was already shown."
+)
+
+PHRASING_INSTRUCTION = (
+    "You are a playful quiz host for a personal TV viewing quiz. Rewrite the question "
+    "you are given as ONE fun, teasing question (under 30 words, one emoji max). Keep "
+    "every date, number and name in it exactly, and never hint at the answer."
+)
+
+
+class QuizCommentator:
+    """Optional model-written flavor text: question phrasing and one-liners after each answer."""
+
+    def __init__(self, model: Optional[BaseLlm] = None):
+        self.model = model or build_model(config.QUIZ_COMMENTARY_MODEL, "quiz_agent")
+
+    async def _generate(self, instruction: str, prompt: str) -> Optional[str]:
+        request = LlmRequest(
+            model=self.model.model,
+            contents=[types.Content(role="user", parts=[types.Part(text=prompt)])],
+            config=types.GenerateContentConfig(system_instruction=instruction, max_output_tokens=80),
+        )
+        text = ""
+        try:
+            async for response in self.model.generate_content_async(request):
+                if response.content and response.content.parts and not response.partial:
+                    text = "".join(part.text or "" for part in response.content.parts)
+        except Exception:
+            return None  # Flavor only: the quiz goes on with the plain text
+        return text.strip() or None
+
+    async def comment(self, result: Dict[str, Any]) -> Optional[str]:
+        """A one-line reaction to a graded answer (None if the model fails)."""
+        return await self._generate(COMMENTARY_INSTRUCTION, (
+            f"Question: {result['question']}\n"
+            f"Correct answer: {result['answer']}\n"
+            f"Player's guess: {result.get('user_guess') or '(skipped)'}\n"
+            f"Graded: {'correct' if result['is_correct'] else 'close' if result.get('close') else 'wrong'}"
+        ))
+
+    async def comment_within(self, result: Dict[str, Any], wait_s: Optional[float] = None) -> Optional[str]:
+        """comment(), abandoned (as stale) if it isn't ready within wait_s."""
+        wait_s = config.QUIZ_COMMENTARY_WAIT_MS / 1000 if wait_s is None else wait_s
+        try:
+            return await asyncio.wait_for(self.comment(result), wait_s)
+        except asyncio.TimeoutError:
+            return None
+
+    async def phrase(self, question: QuizQuestion) -> Optional[str]:
+        """The question reworded by the model (None if it fails or gives the answer away)."""
+        text = await self._generate(PHRASING_INSTRUCTION, question.question)
+        answers = [str(question.answer)] + question.accepted
+        if text is None or any(answer.lower() in text.lower() for answer in answers if question.answer_type != "number"):
+            return None
+        return text
+
+
+class QuestionPrefetcher:
+    """
+    Phrases upcoming questions in the background while the player answers.
+
+    Questions are known up front, so as soon as one is shown the model is
+    already asked to phrase the next QUIZ_PREFETCH_DEPTH ones. By the time
+    the player has typed an answer the next question is usually ready.
+    Unused tasks are cancelled when the quiz ends or the player quits.
+    """
+
+    def __init__(self, engine: QuizEngine, commentator: QuizCommentator, depth: Optional[int] = None):
+        self.engine = engine
+        self.commentator = commentator
+        self.depth = config.QUIZ_PREFETCH_DEPTH if depth is None else depth
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self.hits = 0  # Phrasing was ready when the question came up
+        self.misses = 0
+
+    def prefetch(self):
+        """Starts phrasing the current question and the next `depth` ones (if not already)."""
+        last = min(self.engine.position + self.depth, len(self.engine.questions) - 1)
+        for position in range(self.engine.position, last + 1):
+            if position not in self._tasks:
+                question = self.engine.questions[position]
+                self._tasks[position] = asyncio.create_task(self.commentator.phrase(question))
+
+    async def question_text(self, wait_s: float = 0) -> str:
+        """
+        Text of the current question: the prefetched phrasing if it's ready
+        (waiting up to wait_s for it, by default not at all), otherwise the
+        plain question.
+        """
+        question = self.engine.current
+        self.prefetch()
+        task = self._tasks.pop(self.engine.position)
+        if task.done():
+            self.hits += 1
+        else:
+            self.misses += 1
+            if wait_s > 0:
+                await asyncio.wait({task}, timeout=wait_s)
+        if not task.done():
+            task.cancel()
+            return question.question
+        phrased = task.result() if not task.cancelled() and task.exception() is None else None
+        return phrased or question.question
+
+    def cancel(self):
+        """Drops every speculative request (quit, or the quiz is over)."""
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
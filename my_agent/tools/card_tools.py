@@ -0,0 +1,597 @@
+"""
+Custom Tools for Shareable Cards
+KEY CONCEPT: Server-side card rendering in a worker pool with a content-addressed cache
+
+social_agent used to return text only, and every client drew its own card
+around it. Cards are now rendered on the server: the post text, the viewing
+personality's emoji and the user's top facts are laid out in one of a few
+SVG templates (rasterized to PNG when cairosvg is installed).
+
+Templates are compiled per theme and the optional card font is read and
+embedded once, at import. Worker processes fork from a server that already
+imported this module, so they start with both loaded. Every card is stored
+under a hash of its content, so a card that was rendered before - by any
+worker, for any request - is served from disk. Campaign batches render the
+cards for every user of a dataset, fanned out over the pool in chunks.
+"""
+import base64
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import string
+import sys
+import textwrap
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+from my_agent import config, dataset_store
+from my_agent.tools.facts_tools import materialize_facts
+from my_agent.tools.personality_tools import determine_viewing_personality
+from my_agent.tools.population_tools import per_user_metrics
+
+try:
+    import cairosvg
+except (ImportError, OSError):
+    cairosvg = None  # cairosvg (or libcairo) not installed, cards are SVG only
+
+PNG_AVAILABLE = cairosvg is not None
+
+# Part of every card's hash, so changing the layout never serves stale cards
+CARD_VERSION = 1
+IMAGE_FORMATS = ("svg", "png")
+CARD_SIZE = 1080
+STAT_TILES = 3
+
+# Campaign caption; fields: {headline}, {emoji}, {personality}, {tagline}, {user_id}
+DEFAULT_CAPTION = "{headline}"
+CAPTION_FIELDS = ("headline", "emoji", "personality", "tagline", "user_id")
+# Longest post or caption accepted (the card fits far less; see _TEXT_SIZES)
+MAX_TEXT_CHARS = 1000
+_CAPTION_FIELD = re.compile(r"\{(" + "|".join(CAPTION_FIELDS) + r")\}")
+
+THEMES = {
+    "midnight": {"bg_from": "#141728", "bg_to": "#3b2f6b", "tile": "#ffffff14",
+                 "text": "#ffffff", "muted": "#b8bcd8", "accent": "#ffb347"},
+    "sunset": {"bg_from": "#6a3d9a", "bg_to": "#f0626b", "tile": "#00000026",
+               "text": "#ffffff", "muted": "#ffe3d6", "accent": "#ffd166"},
+    "paper": {"bg_from": "#fdf6ec", "bg_to": "#f3e3cf", "tile": "#3b2f6b12",
+              "text": "#1f2340", "muted": "#6b6f8a", "accent": "#b24a8f"},
+}
+DEFAULT_THEME = "midnight"
+
+# Short labels and card-sized values for the facts in facts_tools
+_STAT_LABELS = {
+    "longest_binge": "longest binge",
+    "busiest_day": "biggest day",
+    "latest_night": "latest night",
+    "most_rewatched_show": "most rewatched",
+    "biggest_genre_swing": "new obsession",
+    "top_show": "top show",
+    "favorite_weekday": "favorite day",
+}
+_STAT_DETAIL_VALUES = {
+    "most_rewatched_show": "show",
+    "biggest_genre_swing": "to_genre",
+    "top_show": "show",
+    "favorite_weekday": "day_of_week",
+}
+_UNIT_SUFFIXES = {"episodes": " eps", "hours": "h"}
+
+_CARD_SVG = string.Template(
+    '<svg xmlns="http://www.w3.org/2000/svg" width="$size" height="$size" viewBox="0 0 $size $size" '
+    'font-family="$font_family">\n'
+    '<defs><linearGradient id="bg" x1="0" y1="0" x2="1" y2="1">'
+    '<stop offset="0" stop-color="$bg_from"/><stop offset="1" stop-color="$bg_to"/></linearGradient>'
+    '$font_face</defs>\n'
+    '<rect width="$size" height="$size" fill="url(#bg)"/>\n'
+    '<text x="80" y="215" font-size="120">$$emoji</text>\n'
+    '<text x="250" y="150" fill="$muted" font-size="28" letter-spacing="4">MY VIEWING PERSONALITY</text>\n'
+    '<text x="250" y="210" fill="$accent" font-size="54" font-weight="700">$$personality</text>\n'
+    '<text x="250" y="258" fill="$muted" font-size="30" font-style="italic">$$tagline</text>\n'
+    '$$post_lines\n'
+    '$$stat_tiles\n'
+    '<text x="80" y="1030" fill="$muted" font-size="26">#MyYearInWatching</text>\n'
+    '<text x="1000" y="1030" fill="$muted" font-size="26" font-weight="600" text-anchor="end">MyYear.AI</text>\n'
+    '</svg>'
+)
+_LINE_SVG = string.Template(
+    '<text x="80" y="$$y" fill="$text" font-size="$$font_size" font-weight="600">$$line</text>'
+)
+_TILE_SVG = string.Template(
+    '<rect x="$$x" y="760" width="290" height="200" rx="24" fill="$tile"/>'
+    '<text x="$$cx" y="860" fill="$text" font-size="$$font_size" font-weight="700" text-anchor="middle">$$value</text>'
+    '<text x="$$cx" y="915" fill="$muted" font-size="26" text-anchor="middle">$$label</text>'
+)
+
+# (font size, max lines) tried in order until the post fits
+_TEXT_SIZES = [(60, 4), (50, 5), (42, 6), (36, 7)]
+# Average glyph width as a fraction of the font size, for line wrapping
+_GLYPH_WIDTH = 0.52
+_TEXT_WIDTH = CARD_SIZE - 160
+
+
+def _load_font_face() -> Tuple[str, str]:
+    """@font-face rule embedding CARD_FONT_PATH (if set), and a hash of the font."""
+    if not config.CARD_FONT_PATH:
+        return "", ""
+    with open(config.CARD_FONT_PATH, "rb") as f:
+        font = f.read()
+    extension = os.path.splitext(config.CARD_FONT_PATH)[1].lstrip(".").lower()
+    face = (
+        f'<style>@font-face{{font-family:"{config.CARD_FONT_FAMILY}";'
+        f'src:url(data:font/{extension};base64,{base64.b64encode(font).decode()}) format("{extension}")}}</style>'
+    )
+    return face, hashlib.sha256(font).hexdigest()[:12]
+
+
+def _compile_templates() -> Dict[str, Dict[str, string.Template]]:
+    """Each theme's templates with colors, size and font already filled in."""
+    font_family = f"{config.CARD_FONT_FAMILY}, Helvetica, Arial, sans-serif"
+    compiled = {}
+    for name, colors in THEMES.items():
+        fixed = {**colors, "size": CARD_SIZE, "font_family": font_family, "font_face": _FONT_FACE}
+        compiled[name] = {
+            key: string.Template(template.substitute(fixed))
+            for key, template in (("card", _CARD_SVG), ("line", _LINE_SVG), ("tile", _TILE_SVG))
+        }
+    return compiled
+
+
+# Loaded once per process (and inherited by pool workers from the fork server)
+_FONT_FACE, _FONT_HASH = _load_font_face()
+_TEMPLATES = _compile_templates()
+
+
+def _stat_tile(fact: Dict[str, Any]) -> Dict[str, str]:
+    """Card-sized value and label for a fact from the facts table."""
+    fact_id = fact.get("fact_id", "")
+    detail_key = _STAT_DETAIL_VALUES.get(fact_id)
+    if detail_key and fact.get("details", {}).get(detail_key):
+        value = str(fact["details"][detail_key])
+    elif isinstance(fact.get("value"), (int, float)):
+        value = f"{fact['value']:g}{_UNIT_SUFFIXES.get(fact.get('unit'), '')}"
+    else:
+        value = str(fact.get("value", ""))
+    return {"value": value, "label": _STAT_LABELS.get(fact_id, fact.get("category", ""))}
+
+
+def build_card_content(
+    text: str,
+    personality: Dict[str, Any],
+    facts: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Everything drawn on a card (and hashed into its ID).
+
+    Args:
+        text: The social post
+        personality: Output of determine_viewing_personality ("personality" key)
+        facts: The user's facts, most notable first
+
+    Returns:
+        Card content with the post, personality and top stat tiles
+    """
+    return {
+        "text": " ".join(text.split()),
+        "emoji": personality.get("emoji", ""),
+        "personality": personality.get("type", ""),
+        "tagline": personality.get("tagline", ""),
+        "stats": [_stat_tile(fact) for fact in facts[:STAT_TILES]],
+    }
+
+
+def _wrap_post(text: str) -> Tuple[int, List[str]]:
+    """Largest font size the post fits at, and its lines (ellipsized if it never fits)."""
+    for font_size, max_lines in _TEXT_SIZES:
+        lines = textwrap.wrap(text, width=int(_TEXT_WIDTH / (font_size * _GLYPH_WIDTH)))
+        if len(lines) <= max_lines:
+            return font_size, lines
+    return font_size, lines[:max_lines - 1] + [lines[max_lines - 1].rstrip(".,;: ") + "…"]
+
+
+def _fit(value: str, limit: int) -> str:
+    return value if len(value) <= limit else value[:limit - 1].rstrip() + "…"
+
+
+def render_card_svg(content: Dict[str, Any], template: str = DEFAULT_THEME) -> str:
+    """A card as a standalone SVG document."""
+    templates = _TEMPLATES[template]
+    font_size, lines = _wrap_post(content["text"])
+    top = 560 - (len(lines) - 1) * font_size * 0.6  # Centered around y=540
+    post_lines = "\n".join(
+        templates["line"].substitute(y=round(top + i * font_size * 1.2), font_size=font_size, line=escape(line))
+        for i, line in enumerate(lines)
+    )
+    stat_tiles = "\n".join(
+        templates["tile"].substitute(
+            x=80 + i * 315, cx=225 + i * 315,
+            font_size=52 if len(stat["value"]) <= 8 else 38 if len(stat["value"]) <= 12 else 28,
+            value=escape(_fit(stat["value"], 18)), label=escape(stat["label"])
+        )
+        for i, stat in enumerate(content["stats"])
+    )
+    return templates["card"].substitute(
+        emoji=escape(content["emoji"]),
+        personality=escape(_fit(content["personality"], 26)),
+        tagline=escape(_fit(content["tagline"], 44)),
+        post_lines=post_lines,
+        stat_tiles=stat_tiles,
+    )
+
+
+def card_id_for(content: Dict[str, Any], template: str, image_format: str) -> str:
+    """Content hash naming a rendered card: same content, same file."""
+    key = json.dumps(
+        [CARD_VERSION, _FONT_HASH, template, image_format, content],
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(key.encode()).hexdigest()[:24]
+
+
+def card_path(card_id: str, image_format: str) -> str:
+    return os.path.join(config.CARD_CACHE_DIR, f"{card_id}.{image_format}")
+
+
+def _render_to_cache(job: Tuple[str, Dict[str, Any], str, str]) -> str:
+    """Renders one card into the cache (runs in the pool workers)."""
+    card_id, content, template, image_format = job
+    svg = render_card_svg(content, template)
+    payload = svg.encode() if image_format == "svg" else cairosvg.svg2png(bytestring=svg.encode())
+    path = card_path(card_id, image_format)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+    return path
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_stats = {"requested": 0, "cache_hits": 0, "rendered": 0, "render_seconds": 0.0}
+_stats_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            context = None
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                # Workers fork from a clean server process that has this module
+                # (templates, font) imported, instead of the threaded API process
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload(["my_agent.tools.card_tools"])
+            _pool = ProcessPoolExecutor(max_workers=config.CARD_WORKERS, mp_context=context)
+        return _pool
+
+
+def shutdown_card_pool():
+    """Stops the render workers (a new pool starts on the next render)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def _run_jobs(jobs: List[Tuple[str, Dict[str, Any], str, str]]):
+    if config.CARD_WORKERS <= 0:
+        for job in jobs:
+            _render_to_cache(job)
+        return
+    pool = _get_pool()
+    # A few chunks per worker: little IPC per card, and workers stay evenly loaded
+    chunksize = max(1, len(jobs) // (config.CARD_WORKERS * 4))
+    try:
+        for _ in pool.map(_render_to_cache, jobs, chunksize=chunksize):
+            pass
+    except BrokenProcessPool:
+        shutdown_card_pool()  # A worker died; start a fresh pool next time
+        raise
+
+
+def render_cards(
+    contents: List[Dict[str, Any]],
+    template: str = DEFAULT_THEME,
+    image_format: str = "svg"
+) -> List[Dict[str, Any]]:
+    """
+    Renders cards, skipping those already in the cache.
+
+    Args:
+        contents: Card contents (see build_card_content)
+        template: Theme name (see THEMES)
+        image_format: "svg" or "png"
+
+    Returns:
+        card_id, path and whether it was cached, in the order given
+    """
+    if template not in THEMES:
+        raise ValueError(f"Unknown card template: {template} (choose from {sorted(THEMES)})")
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unknown image format: {image_format}")
+    if image_format == "png" and not PNG_AVAILABLE:
+        raise RuntimeError("PNG cards need cairosvg (pip install cairosvg)")
+    os.makedirs(config.CARD_CACHE_DIR, exist_ok=True)
+
+    results, jobs = [], {}
+    for content in contents:
+        card_id = card_id_for(content, template, image_format)
+        path = card_path(card_id, image_format)
+        cached = os.path.exists(path)
+        if not cached:
+            jobs[card_id] = (card_id, content, template, image_format)
+        results.append({"card_id": card_id, "path": path, "cached": cached})
+
+    started = time.perf_counter()
+    if jobs:
+        _run_jobs(list(jobs.values()))
+    with _stats_lock:
+        _stats["requested"] += len(results)
+        _stats["cache_hits"] += len(results) - sum(not r["cached"] for r in results)
+        _stats["rendered"] += len(jobs)
+        _stats["render_seconds"] += time.perf_counter() - started
+    return results
+
+
+def card_stats() -> Dict[str, Any]:
+    """Cache hit rate and render throughput of this process."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["hit_rate"] = round(stats["cache_hits"] / stats["requested"], 3) if stats["requested"] else 0.0
+    stats["cards_per_second"] = (
+        round(stats["rendered"] / stats["render_seconds"], 1) if stats["render_seconds"] else 0.0
+    )
+    stats["render_seconds"] = round(stats["render_seconds"], 3)
+    stats["workers"] = config.CARD_WORKERS
+    stats["png_available"] = PNG_AVAILABLE
+    return stats
+
+
+def _user_personalities(df: pd.DataFrame, user_column: str = "user_id") -> Dict[str, Dict[str, Any]]:
+    """
+    Viewing personality of every user in a frame, from grouped stats.
+
+    Builds the inputs determine_viewing_personality reads from
+    calculate_personal_stats, for all users at once.
+    """
+    df = df.assign(**{user_column: df[user_column].astype(str) if user_column in df.columns else "user"})
+    metrics = per_user_metrics(df, user_column)
+    users = metrics.index
+    dates = pd.to_datetime(df["date"])
+    unique_shows = (
+        df.groupby(user_column)["show_name"].nunique().reindex(users, fill_value=0)
+        if "show_name" in df.columns else pd.Series(0, index=users)
+    )
+    avg_hour = dates.dt.hour.groupby(df[user_column]).mean().reindex(users)
+    top_days = _top_counts(pd.crosstab(df[user_column], dates.dt.day_name()).reindex(users), 3)
+    top_genres = (
+        _top_counts(pd.crosstab(df[user_column], df["genre"]).reindex(users), 5)
+        if "genre" in df.columns else [{} for _ in users]
+    )
+
+    # Skip the tool cache: each user's stats are only ever seen once
+    classify = getattr(determine_viewing_personality, "__wrapped__", determine_viewing_personality)
+    personalities = {}
+    for i, row in enumerate(metrics.itertuples()):
+        stats = {
+            "avg_episodes_per_session": float(row.avg_episodes_per_session),
+            "completion_rate": float(row.completion_rate),
+            "rewatch_count": int(row.rewatch_count),
+            "unique_shows": int(unique_shows.iat[i]),
+            "top_genres": top_genres[i],
+            "top_viewing_days": top_days[i],
+            "avg_viewing_hour": int(avg_hour.iat[i]),
+        }
+        personalities[row.Index] = classify(stats)["personality"]
+    return personalities
+
+
+def _top_counts(table: pd.DataFrame, n: int) -> List[Dict[str, int]]:
+    """Each row's n largest non-zero counts, like value_counts().head(n) per user."""
+    counts = table.to_numpy()
+    order = np.argsort(-counts, axis=1, kind="stable")[:, :n]
+    columns = [str(c) for c in table.columns]
+    return [
+        {columns[j]: int(row[j]) for j in top if row[j] > 0}
+        for row, top in zip(counts, order)
+    ]
+
+
+def _check_text(text: str):
+    if len(text) > MAX_TEXT_CHARS:
+        raise ValueError(f"Card text is limited to {MAX_TEXT_CHARS} characters")
+
+
+def fill_caption(caption: str, fields: Dict[str, str]) -> str:
+    """Substitutes the known {placeholders}; any other braces are kept as written."""
+    return _CAPTION_FIELD.sub(lambda match: fields[match.group(1)], caption)
+
+
+def _users_for_cards(
+    file_path: str,
+    user_ids: Optional[List[str]] = None
+) -> Dict[str, Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """Personality and ranked facts of each (requested) user of a dataset."""
+    facts = materialize_facts(file_path)["users"]
+    df = dataset_store.load_viewing_frame(file_path)
+    if user_ids is not None and "user_id" in df.columns:
+        df = df[df["user_id"].astype(str).isin({str(u) for u in user_ids})]
+    if len(df) == 0:
+        return {}
+    return {
+        user: (personality, facts.get(user, []))
+        for user, personality in _user_personalities(df).items()
+    }
+
+
+def campaign_card_contents(
+    file_path: str,
+    user_ids: Optional[List[str]] = None,
+    caption: str = DEFAULT_CAPTION
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Card content for users of a dataset, from its facts table.
+
+    Args:
+        file_path: Path to the CSV file, or dataset://<id> for an uploaded dataset
+        user_ids: Users to include (default: everyone)
+        caption: Post text, with {headline}, {emoji}, {personality}, {tagline}, {user_id}
+
+    Returns:
+        Card content per user
+
+    Raises:
+        ValueError: Caption longer than MAX_TEXT_CHARS
+    """
+    _check_text(caption)
+    contents = {}
+    for user, (personality, facts) in _users_for_cards(file_path, user_ids).items():
+        fields = {
+            "headline": facts[0]["headline"] if facts else "My year in watching",
+            "emoji": personality.get("emoji", ""),
+            "personality": personality.get("type", ""),
+            "tagline": personality.get("tagline", ""),
+            "user_id": user,
+        }
+        contents[user] = build_card_content(fill_caption(caption, fields), personality, facts)
+    return contents
+
+
+def share_card_content(
+    file_path: str,
+    post_text: str,
+    user_id: Optional[str] = None
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Card content for one user's post.
+
+    Raises:
+        ValueError: Unknown user, no user_id for a multi-user dataset, or a
+            post longer than MAX_TEXT_CHARS
+    """
+    _check_text(post_text)
+    users = _users_for_cards(file_path, [user_id] if user_id else None)
+    if not users:
+        raise ValueError(f"Unknown user: {user_id}" if user_id else "No viewing data found")
+    if user_id is None and len(users) > 1:
+        raise ValueError("user_id is required for multi-user datasets")
+    user, (personality, facts) = next(iter(users.items()))
+    return user, build_card_content(post_text, personality, facts)
+
+
+def render_campaign_cards(
+    file_path: str,
+    user_ids: Optional[List[str]] = None,
+    caption: str = DEFAULT_CAPTION,
+    template: str = DEFAULT_THEME,
+    image_format: str = "svg"
+) -> Dict[str, Any]:
+    """
+    Renders a card for every user of a dataset (a campaign send-out).
+
+    Args:
+        file_path: Path to the CSV file, or dataset://<id> for an uploaded dataset
+        user_ids: Users to include (default: everyone)
+        caption: Post text template (see campaign_card_contents)
+        template: Theme name (see THEMES)
+        image_format: "svg" or "png"
+
+    Returns:
+        Card ID per user, how many were rendered vs cached, and the throughput
+    """
+    started = time.perf_counter()
+    contents = campaign_card_contents(file_path, user_ids, caption)
+    prepared = time.perf_counter()
+    results = render_cards(list(contents.values()), template, image_format)
+    finished = time.perf_counter()
+    rendered = sum(not r["cached"] for r in results)
+    return {
+        "users": len(results),
+        "rendered": rendered,
+        "cached": len(results) - rendered,
+        "format": image_format,
+        "template": template,
+        "prepare_seconds": round(prepared - started, 3),
+        "render_seconds": round(finished - prepared, 3),
+        "cards_per_second": round(len(results) / (finished - started), 1) if results else 0.0,
+        "cards": {user: r["card_id"] for user, r in zip(contents, results)},
+    }
+
+
+def create_share_card(
+    file_path: str,
+    post_text: str,
+    user_id: Optional[str] = None,
+    template: str = DEFAULT_THEME
+) -> Dict[str, Any]:
+    """
+    Renders a shareable image card for a social post.
+
+    CUSTOM TOOL for social posts with a consistent look on every client.
+
+    Args:
+        file_path: Path to the CSV file, or dataset://<id> for an uploaded dataset
+        post_text: The post to put on the card
+        user_id: User the card is for (optional for single-user histories)
+        template: Card theme: "midnight", "sunset" or "paper"
+
+    Returns:
+        card_id and image URL; the card shows the post, the personality emoji
+        and the user's top stats
+    """
+    try:
+        user, content = share_card_content(file_path, post_text, user_id)
+        formats = ["svg", "png"] if PNG_AVAILABLE else ["svg"]
+        results = {fmt: render_cards([content], template, fmt)[0] for fmt in formats}
+        return {
+            "success": True,
+            "user_id": user,
+            "card_id": results["svg"]["card_id"],
+            "images": {fmt: f"/cards/{r['card_id']}.{fmt}" for fmt, r in results.items()},
+            "content": content,
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
+def main():
+    """
+    CLI for rendering a campaign's cards.
+
+    Usage:
+        python -m my_agent.tools.card_tools batch <file.csv> [svg|png] [template]
+    """
+    if len(sys.argv) < 3 or sys.argv[1] != "batch":
+        print(main.__doc__)
+        sys.exit(1)
+
+    file_path = sys.argv[2]
+    image_format = sys.argv[3] if len(sys.argv) > 3 else "svg"
+    template = sys.argv[4] if len(sys.argv) > 4 else DEFAULT_THEME
+    try:
+        summary = render_campaign_cards(file_path, template=template, image_format=image_format)
+    finally:
+        shutdown_card_pool()
+    print(
+        f"✅ {summary['users']} cards ({summary['rendered']} rendered, {summary['cached']} cached) "
+        f"in {summary['prepare_seconds'] + summary['render_seconds']:.2f}s "
+        f"({summary['prepare_seconds']:.2f}s content, {summary['render_seconds']:.2f}s rendering) - "
+        f"{summary['cards_per_second']} cards/s, written to {config.CARD_CACHE_DIR}"
+    )
+
+
+if __name__ == "__main__":
+    main()
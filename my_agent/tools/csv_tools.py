@@ -3,10 +3,23 @@ Custom Tools for CSV Processing
 KEY CONCEPT: Custom tools for data analysis
 """
 import pandas as pd
+from collections import OrderedDict
 from datetime import datetime
 from typing import Dict, Any, List
 import os
 
+from my_agent.dataset_store import load_viewing_frame
+from my_agent.tools.memo import dataset_fingerprint, memoize_tool
+from my_agent.tools.session_tools import reconstruct_sessions
+
+
+# Columns the tools need, and the full set a MyAstro export normally has
+REQUIRED_COLUMNS = ['date', 'show_name', 'duration_minutes']
+EXPECTED_COLUMNS = [
+    'date', 'show_name', 'season', 'episode', 'genre', 'duration_minutes',
+    'completed', 'is_rewatch', 'session_id', 'day_of_week', 'hour'
+]
+
 
 def read_viewing_history(file_path: str) -> Dict[str, Any]:
     """
@@ -21,12 +34,8 @@ def read_viewing_history(file_path: str) -> Dict[str, Any]:
         Dictionary with viewing data summary and raw data
     """
     try:
-        # Read CSV file
-        df = pd.read_csv(file_path)
-        
-        # Ensure date column is datetime
-        if 'date' in df.columns:
-            df['date'] = pd.to_datetime(df['date'])
+        # Read CSV file (shared across API workers once parsed)
+        df = load_viewing_frame(file_path)
         
         # Calculate basic metrics
         total_hours = df['duration_minutes'].sum() / 60 if 'duration_minutes' in df.columns else 0
@@ -71,6 +80,7 @@ def read_viewing_history(file_path: str) -> Dict[str, Any]:
         }
 
 
+@memoize_tool
 def calculate_personal_stats(data: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Calculates personalized viewing statistics.
@@ -113,10 +123,14 @@ def calculate_personal_stats(data: List[Dict[str, Any]]) -> Dict[str, Any]:
             completion_rate = df['completed'].mean()
         
         # Binge behavior (episodes per session)
+        # Rebuild sessions from timestamps when the export has no usable session_id
         avg_episodes_per_session = 0
-        if 'session_id' in df.columns:
+        if 'session_id' in df.columns and df['session_id'].notna().all():
             episodes_per_session = df.groupby('session_id').size()
             avg_episodes_per_session = float(episodes_per_session.mean())
+        elif 'date' in df.columns:
+            episodes_per_session = reconstruct_sessions(df).value_counts()
+            avg_episodes_per_session = float(episodes_per_session.mean())
         
         # Rewatch behavior
         rewatch_count = 0
@@ -148,6 +162,48 @@ def calculate_personal_stats(data: List[Dict[str, Any]]) -> Dict[str, Any]:
         }
 
 
+class ViewingDateIndex:
+    """
+    Viewing records sorted by date for range lookups.
+    
+    Range queries are two binary searches plus a slice, so asking about a
+    week or a month costs the same as asking about a single day.
+    """
+    
+    def __init__(self, df: pd.DataFrame):
+        df = df.copy()
+        df['date'] = pd.to_datetime(df['date'])
+        self.df = df.sort_values('date', kind='stable').reset_index(drop=True)
+        self.dates = self.df['date'].to_numpy()
+    
+    def between(self, start_date, end_date) -> pd.DataFrame:
+        """Records from start_date through end_date (whole days, inclusive)."""
+        start = pd.Timestamp(start_date).normalize().to_datetime64()
+        end = (pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)).to_datetime64()
+        lo = self.dates.searchsorted(start, side='left')
+        hi = self.dates.searchsorted(end, side='left')
+        return self.df.iloc[lo:hi]
+
+
+_date_indexes: "OrderedDict[str, ViewingDateIndex]" = OrderedDict()
+_DATE_INDEX_CACHE_SIZE = 16
+
+
+def get_date_index(data: List[Dict[str, Any]]) -> ViewingDateIndex:
+    """Returns the (cached) date index for a dataset."""
+    key = dataset_fingerprint(data)
+    index = _date_indexes.get(key)
+    if index is None:
+        index = ViewingDateIndex(pd.DataFrame(data))
+        _date_indexes[key] = index
+        if len(_date_indexes) > _DATE_INDEX_CACHE_SIZE:
+            _date_indexes.popitem(last=False)
+    else:
+        _date_indexes.move_to_end(key)
+    return index
+
+
+@memoize_tool
 def get_viewing_by_date(data: List[Dict[str, Any]], target_date: str) -> Dict[str, Any]:
     """
     Gets viewing information for a specific date.
@@ -161,12 +217,10 @@ def get_viewing_by_date(data: List[Dict[str, Any]], target_date: str) -> Dict[st
         Dictionary with viewing info for that date
     """
     try:
-        df = pd.DataFrame(data)
-        df['date'] = pd.to_datetime(df['date'])
         target = pd.to_datetime(target_date)
         
         # Filter by date
-        day_data = df[df['date'].dt.date == target.date()]
+        day_data = get_date_index(data).between(target, target)
         
         if len(day_data) == 0:
             return {
@@ -196,3 +250,65 @@ def get_viewing_by_date(data: List[Dict[str, Any]], target_date: str) -> Dict[st
         }
 
 
+@memoize_tool
+def get_viewing_between(data: List[Dict[str, Any]], start_date: str, end_date: str) -> Dict[str, Any]:
+    """
+    Gets viewing information for a date range in a single call.
+    
+    Args:
+        data: List of viewing records
+        start_date: First date (YYYY-MM-DD, inclusive)
+        end_date: Last date (YYYY-MM-DD, inclusive)
+        
+    Returns:
+        Dictionary with totals, top shows and a per-day breakdown
+    """
+    try:
+        range_data = get_date_index(data).between(start_date, end_date)
+        
+        if len(range_data) == 0:
+            return {
+                "success": True,
+                "has_viewing": False,
+                "start_date": start_date,
+                "end_date": end_date,
+                "message": f"No viewing activity between {start_date} and {end_date}"
+            }
+        
+        days = range_data['date'].dt.strftime('%Y-%m-%d')
+        minutes = range_data['duration_minutes'] if 'duration_minutes' in range_data.columns else pd.Series(0, index=range_data.index)
+        shows = range_data['show_name'] if 'show_name' in range_data.columns else pd.Series("Unknown", index=range_data.index)
+        
+        daily = pd.DataFrame({"day": days, "minutes": minutes, "show_name": shows}).groupby('day').agg(
+            episodes=('show_name', 'size'),
+            total_minutes=('minutes', 'sum'),
+            shows=('show_name', lambda s: sorted(s.unique().tolist()))
+        )
+        
+        return {
+            "success": True,
+            "has_viewing": True,
+            "start_date": start_date,
+            "end_date": end_date,
+            "days_with_viewing": int(len(daily)),
+            "episodes_watched": int(len(range_data)),
+            "total_minutes": int(minutes.sum()),
+            "top_shows": {k: int(v) for k, v in shows.value_counts().head(5).items()},
+            "top_genres": (
+                {k: int(v) for k, v in range_data['genre'].value_counts().head(3).items()}
+                if 'genre' in range_data.columns else {}
+            ),
+            "by_day": {
+                day: {
+                    "episodes": int(row.episodes),
+                    "total_minutes": int(row.total_minutes),
+                    "shows": row.shows
+                }
+                for day, row in daily.iterrows()
+            }
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
@@ -0,0 +1,281 @@
+"""
+Custom Tools for Relative Date Expressions
+KEY CONCEPT: Local resolver so the LLM doesn't do date arithmetic
+
+Turns "last Friday", "over Chinese New Year week" or "in March" into a
+concrete date range. Expressions are anchored on the dataset's timeline (its
+latest viewing date) rather than the wall clock, so "last month" means the
+last month of the user's history.
+"""
+import re
+import string
+from datetime import date, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+import pandas as pd
+
+
+# Movable holidays relevant to Astro viewers (Malaysia), by year
+MOVABLE_HOLIDAYS = {
+    "chinese new year": {
+        2022: "2022-02-01", 2023: "2023-01-22", 2024: "2024-02-10",
+        2025: "2025-01-29", 2026: "2026-02-17", 2027: "2027-02-06",
+    },
+    "hari raya": {
+        2022: "2022-05-02", 2023: "2023-04-22", 2024: "2024-04-10",
+        2025: "2025-03-31", 2026: "2026-03-20", 2027: "2027-03-10",
+    },
+    "deepavali": {
+        2022: "2022-10-24", 2023: "2023-11-12", 2024: "2024-10-31",
+        2025: "2025-10-20", 2026: "2026-11-08", 2027: "2027-10-28",
+    },
+}
+
+# Holidays on the same day every year (month, day)
+FIXED_HOLIDAYS = {
+    "new year": (1, 1),
+    "valentine": (2, 14),
+    "merdeka": (8, 31),
+    "malaysia day": (9, 16),
+    "halloween": (10, 31),
+    "christmas eve": (12, 24),
+    "christmas": (12, 25),
+    "new year's eve": (12, 31),
+}
+
+HOLIDAY_ALIASES = {
+    "cny": "chinese new year",
+    "lunar new year": "chinese new year",
+    "hari raya aidilfitri": "hari raya",
+    "aidilfitri": "hari raya",
+    "eid": "hari raya",
+    "diwali": "deepavali",
+    "valentine's day": "valentine",
+    "valentines": "valentine",
+    "xmas": "christmas",
+    "national day": "merdeka",
+    "new years eve": "new year's eve",
+    "nye": "new year's eve",
+    "new year's day": "new year",
+}
+
+_WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+_MONTHS = [
+    "january", "february", "march", "april", "may", "june", "july",
+    "august", "september", "october", "november", "december",
+]
+_MONTH_PATTERN = "|".join(m[:3] + f"(?:{m[3:]})?" for m in _MONTHS)
+
+DateRange = Tuple[date, date, str]
+
+
+def _month_index(token: str) -> int:
+    return [m[:3] for m in _MONTHS].index(token[:3].lower()) + 1
+
+
+def _month_range(year: int, month: int) -> Tuple[date, date]:
+    start = date(year, month, 1)
+    end = (date(year + month // 12, month % 12 + 1, 1)) - timedelta(days=1)
+    return start, end
+
+
+def _most_recent_year(anchor: date, month: int, day: int = 1) -> int:
+    """Year of the most recent (month, day) on or before the anchor."""
+    return anchor.year if (month, day) <= (anchor.month, anchor.day) else anchor.year - 1
+
+
+def _holiday_date(name: str, anchor: date, year: Optional[int]) -> Optional[date]:
+    if name in FIXED_HOLIDAYS:
+        month, day = FIXED_HOLIDAYS[name]
+        return date(year or _most_recent_year(anchor, month, day), month, day)
+
+    dates = {y: date.fromisoformat(d) for y, d in MOVABLE_HOLIDAYS.get(name, {}).items()}
+    if year is not None:
+        return dates.get(year)
+    past = [d for d in dates.values() if d <= anchor]
+    return max(past) if past else None
+
+
+def _resolve_holiday(text: str, anchor: date) -> Optional[DateRange]:
+    year_match = re.search(r"\b(19|20)\d{2}\b", text)
+    year = int(year_match.group()) if year_match else None
+
+    names = sorted(
+        list(FIXED_HOLIDAYS) + list(MOVABLE_HOLIDAYS) + list(HOLIDAY_ALIASES),
+        key=len, reverse=True
+    )
+    for name in names:
+        if re.search(rf"(?<![a-z]){re.escape(name)}(?![a-z])", text):
+            canonical = HOLIDAY_ALIASES.get(name, name)
+            day = _holiday_date(canonical, anchor, year)
+            if day is None:
+                return None
+            label = string.capwords(canonical)
+            if re.search(r"\bweek\b", text):
+                start = day - timedelta(days=day.weekday())
+                return start, start + timedelta(days=6), f"{label} week ({day.year})"
+            if re.search(r"\bweekend\b", text):
+                start = day + timedelta(days=(5 - day.weekday()) % 7)
+                return start, start + timedelta(days=1), f"{label} weekend ({day.year})"
+            if re.search(r"\b(period|season|holidays?)\b", text):
+                return day - timedelta(days=3), day + timedelta(days=3), f"{label} holidays ({day.year})"
+            return day, day, f"{label} ({day.year})"
+    return None
+
+
+def resolve_date_expression(expression: str, anchor: date) -> Optional[DateRange]:
+    """
+    Resolves a relative or holiday date expression into a date range.
+
+    Args:
+        expression: e.g. "last Friday", "Chinese New Year week", "March",
+            "last 2 weeks", "Q3", "2024-03-15", "March 1 to March 10"
+        anchor: The "today" the expression is relative to
+
+    Returns:
+        (start, end, label) with inclusive dates, or None if not understood
+    """
+    text = expression.lower().strip()
+    text = re.sub(r"^(on|in|during|over|for|from|at|around)\s+(the\s+)?", "", text)
+    text = re.sub(r"[?.!,]+$", "", text).strip()
+
+    # Explicit ranges: "<expr> to <expr>"
+    range_match = re.match(r"^(.+?)\s+(?:to|until|-|through)\s+(.+)$", text)
+    if range_match:
+        first = resolve_date_expression(range_match.group(1), anchor)
+        second = resolve_date_expression(range_match.group(2), anchor)
+        if first and second:
+            return first[0], second[1], f"{first[2]} to {second[2]}"
+
+    # ISO dates
+    iso_match = re.fullmatch(r"(\d{4})-(\d{2})-(\d{2})", text)
+    if iso_match:
+        day = date.fromisoformat(text)
+        return day, day, day.strftime('%B %d, %Y')
+
+    if text == "today":
+        return anchor, anchor, "today"
+    if text == "yesterday":
+        day = anchor - timedelta(days=1)
+        return day, day, "yesterday"
+    if text == "day before yesterday":
+        day = anchor - timedelta(days=2)
+        return day, day, "the day before yesterday"
+
+    # Weekdays: "friday", "this friday", "last friday"
+    weekday_match = re.fullmatch(rf"(last|this|past)?\s*({'|'.join(_WEEKDAYS)})", text)
+    if weekday_match:
+        target = _WEEKDAYS.index(weekday_match.group(2))
+        back = (anchor.weekday() - target) % 7
+        if weekday_match.group(1) == "last" and back == 0:
+            back = 7
+        day = anchor - timedelta(days=back)
+        return day, day, day.strftime('%A, %B %d, %Y')
+
+    # Calendar units: "this week", "last month", "last year", "last weekend"
+    unit_match = re.fullmatch(r"(this|last|previous|past)\s+(week|weekend|month|year)", text)
+    if unit_match:
+        which, unit = unit_match.groups()
+        offset = 0 if which == "this" else 1
+        if unit == "week":
+            start = anchor - timedelta(days=anchor.weekday() + 7 * offset)
+            return start, start + timedelta(days=6), f"week of {start.isoformat()}"
+        if unit == "weekend":
+            saturday = anchor - timedelta(days=(anchor.weekday() - 5) % 7)
+            if offset and saturday + timedelta(days=1) >= anchor:
+                saturday -= timedelta(days=7)
+            return saturday, saturday + timedelta(days=1), f"weekend of {saturday.isoformat()}"
+        if unit == "month":
+            month_index = anchor.year * 12 + anchor.month - 1 - offset
+            start, end = _month_range(month_index // 12, month_index % 12 + 1)
+            return start, end, start.strftime('%B %Y')
+        year = anchor.year - offset
+        return date(year, 1, 1), date(year, 12, 31), str(year)
+
+    # Rolling windows: "last 10 days", "past 2 weeks", "last 3 months"
+    rolling_match = re.fullmatch(r"(?:last|past|previous)\s+(\d+)\s+(day|week|month)s?", text)
+    if rolling_match:
+        count, unit = int(rolling_match.group(1)), rolling_match.group(2)
+        days = {"day": 1, "week": 7, "month": 30}[unit] * count
+        return anchor - timedelta(days=days - 1), anchor, f"last {count} {unit}s"
+
+    # Quarters: "q3", "q3 2024"
+    quarter_match = re.fullmatch(r"q([1-4])(?:\s+(\d{4}))?", text)
+    if quarter_match:
+        quarter = int(quarter_match.group(1))
+        first_month = 3 * quarter - 2
+        year = int(quarter_match.group(2)) if quarter_match.group(2) else _most_recent_year(anchor, first_month)
+        start, _ = _month_range(year, first_month)
+        _, end = _month_range(year, first_month + 2)
+        return start, end, f"Q{quarter} {year}"
+
+    # Specific days: "march 15", "15 march", "march 15th 2024"
+    day_match = (
+        re.fullmatch(rf"({_MONTH_PATTERN})\s+(\d{{1,2}})(?:st|nd|rd|th)?(?:\s+(\d{{4}}))?", text)
+        or re.fullmatch(rf"(\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?({_MONTH_PATTERN})(?:\s+(\d{{4}}))?", text)
+    )
+    if day_match:
+        first, second, year = day_match.groups()
+        month_token, day_number = (first, second) if first[0].isalpha() else (second, first)
+        month, day_number = _month_index(month_token), int(day_number)
+        year = int(year) if year else _most_recent_year(anchor, month, day_number)
+        day = date(year, month, day_number)
+        return day, day, day.strftime('%B %d, %Y')
+
+    # Whole months: "march", "march 2024", "last march"
+    month_match = re.fullmatch(rf"(?:last\s+)?({_MONTH_PATTERN})(?:\s+(\d{{4}}))?", text)
+    if month_match:
+        month = _month_index(month_match.group(1))
+        year = int(month_match.group(2)) if month_match.group(2) else _most_recent_year(anchor, month)
+        start, end = _month_range(year, month)
+        return start, end, start.strftime('%B %Y')
+
+    # Bare years
+    if re.fullmatch(r"\d{4}", text):
+        year = int(text)
+        return date(year, 1, 1), date(year, 12, 31), text
+
+    return _resolve_holiday(text, anchor)
+
+
+def dataset_anchor_date(data: List[Dict[str, Any]]) -> date:
+    """Latest viewing date in the dataset (the timeline's 'today')."""
+    return pd.to_datetime(pd.Series([record.get('date') for record in data])).max().date()
+
+
+def resolve_date_range(expression: str, data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Converts a relative or holiday date expression into a date range.
+
+    CUSTOM TOOL so the model doesn't have to do date arithmetic.
+
+    Args:
+        expression: e.g. "last Friday", "Chinese New Year week", "last month"
+        data: List of viewing records (the latest date anchors the expression)
+
+    Returns:
+        Dictionary with start_date and end_date (YYYY-MM-DD, inclusive)
+    """
+    try:
+        anchor = dataset_anchor_date(data)
+        resolved = resolve_date_expression(expression, anchor)
+        if resolved is None:
+            return {
+                "success": False,
+                "error": f"Could not understand date expression: {expression}",
+                "anchor_date": anchor.isoformat()
+            }
+        start, end, label = resolved
+        return {
+            "success": True,
+            "expression": expression,
+            "label": label,
+            "start_date": start.isoformat(),
+            "end_date": end.isoformat(),
+            "anchor_date": anchor.isoformat()
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
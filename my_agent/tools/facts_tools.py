@@ -0,0 +1,336 @@
+"""
+Custom Tools for Per-User Fun Facts
+KEY CONCEPT: A ranked facts table materialized once per dataset
+
+The quiz and social agents used to dig "fun facts" out of the data with
+several tool calls per run. extract_facts computes the notable facts for
+every user in one pass - busiest day, longest binge, latest night, most
+rewatched show, biggest genre swing and more - scores how remarkable each
+one is and attaches a ready-made quiz question. The table is stored next
+to the dataset in the shared store, so later runs (and other workers) pay
+a single file read.
+"""
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from my_agent import dataset_store
+from my_agent.tools.personality_tools import detect_genre_change_points
+from my_agent.tools.session_tools import reconstruct_sessions, session_table
+
+# Bump when fact definitions change so stored tables are rebuilt
+FACTS_VERSION = 2
+FACTS_SIDECAR = "facts"
+
+DAYS_OF_WEEK = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Viewing before this hour counts as the previous night
+NIGHT_ROLLOVER_HOUR = 6
+
+
+def _notability(ratio: float) -> float:
+    """Score in [0, 1) for how far a value stands out from its typical level."""
+    if not np.isfinite(ratio) or ratio <= 1:
+        return 0.0
+    return round(1 - 1 / ratio, 3)
+
+
+def _format_minutes(minutes: float) -> str:
+    hours, mins = divmod(int(round(minutes)), 60)
+    if hours == 0:
+        return f"{mins} min"
+    return f"{hours}h {mins:02d}m" if mins else f"{hours}h"
+
+
+def _format_night_hour(night_hour: float) -> str:
+    hour = int(night_hour) % 24
+    minute = int(round((night_hour % 1) * 60)) % 60
+    return f"{hour % 12 or 12}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+def _choices(answer: str, ranked: List[str], count: int = 4) -> List[str]:
+    """Answer plus the next most likely options, alphabetized so position gives nothing away."""
+    options = [answer] + [option for option in dict.fromkeys(ranked) if option != answer][:count - 1]
+    return sorted(options)
+
+
+def _fact(fact_id, category, headline, value, unit, score, details, quiz) -> Dict[str, Any]:
+    return {
+        "fact_id": fact_id,
+        "category": category,
+        "headline": headline,
+        "value": value,
+        "unit": unit,
+        "score": score,
+        "details": details,
+        "quiz": quiz,
+    }
+
+
+def _user_facts(user_df: pd.DataFrame, sessions: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Facts for one user's records (with the derived columns from extract_facts)."""
+    facts = []
+    show_minutes = user_df.groupby("show_name")["minutes"].sum().sort_values(ascending=False)
+    ranked_shows = [str(show) for show in show_minutes.index]
+    total_minutes = float(show_minutes.sum())
+
+    # Busiest day, and what was on
+    daily = user_df.groupby("day")["minutes"].sum()
+    if len(daily) and daily.max() > 0:
+        day = daily.idxmax()
+        minutes = float(daily.max())
+        day_rows = user_df[user_df["day"] == day]
+        day_show = str(day_rows.groupby("show_name")["minutes"].sum().idxmax())
+        label = day.strftime("%B %d, %Y")
+        facts.append(_fact(
+            "busiest_day", "binge",
+            f"Your biggest viewing day was {label}: {_format_minutes(minutes)}, mostly {day_show}",
+            round(minutes / 60, 2), "hours",
+            _notability(minutes / daily.mean()),
+            {"date": day.strftime("%Y-%m-%d"), "episodes": int(len(day_rows)), "main_show": day_show,
+             "typical_day_hours": round(float(daily.mean()) / 60, 2)},
+            {"question": f"What did you binge on {label}, your biggest viewing day of the year?",
+             "answer": day_show, "answer_type": "show", "choices": _choices(day_show, ranked_shows)},
+        ))
+
+    # Longest binge session
+    if len(sessions):
+        longest = sessions.loc[sessions["watched_minutes"].idxmax()]
+        minutes = float(longest["watched_minutes"])
+        episodes = int(longest["episodes"])
+        label = longest["start"].strftime("%B %d")
+        facts.append(_fact(
+            "longest_binge", "binge",
+            f"Your longest binge: {episodes} episodes back to back ({_format_minutes(minutes)}) on {label}",
+            episodes, "episodes",
+            _notability(minutes / max(float(sessions["watched_minutes"].median()), 1.0)),
+            {"start": longest["start"].isoformat(), "minutes": round(minutes, 1),
+             "shows": int(longest["shows"]), "median_session_minutes": round(float(sessions["watched_minutes"].median()), 1)},
+            {"question": f"How many episodes did you watch in one sitting on {label}, your longest binge?",
+             "answer": episodes, "answer_type": "number"},
+        ))
+
+    # Latest night (1 AM counts as later than 11 PM)
+    latest = user_df.loc[user_df["night_hour"].idxmax()]
+    night_hour = float(latest["night_hour"])
+    if night_hour >= 22:
+        show = str(latest["show_name"])
+        clock = _format_night_hour(night_hour)
+        night_of = (latest["date"] - pd.Timedelta(hours=NIGHT_ROLLOVER_HOUR)).strftime("%B %d")
+        facts.append(_fact(
+            "latest_night", "night_owl",
+            f"Latest night: still watching {show} at {clock} (the night of {night_of})",
+            clock, "time",
+            round(min((night_hour - 22) / (24 + NIGHT_ROLLOVER_HOUR - 22), 1.0), 3),
+            {"date": latest["date"].isoformat(), "show": show,
+             "late_night_share": round(float((user_df["night_hour"] >= 24).mean()), 3)},
+            {"question": f"What were you watching at {clock} on the night of {night_of}?",
+             "answer": show, "answer_type": "show", "choices": _choices(show, ranked_shows)},
+        ))
+
+    # Most rewatched show
+    if "is_rewatch" in user_df.columns:
+        rewatches = user_df[user_df["is_rewatch"].fillna(False).astype(bool)].groupby("show_name").size()
+        if len(rewatches):
+            show = str(rewatches.idxmax())
+            count = int(rewatches.max())
+            ranked_rewatches = [str(s) for s in rewatches.sort_values(ascending=False).index]
+            facts.append(_fact(
+                "most_rewatched_show", "comfort",
+                f"Your comfort show: {show}, rewatched {count} episode{'s' if count != 1 else ''}",
+                count, "episodes",
+                round(count / (count + 3), 3),
+                {"show": show, "total_rewatches": int(rewatches.sum())},
+                {"question": "Which show did you rewatch the most?",
+                 "answer": show, "answer_type": "show",
+                 "choices": _choices(show, ranked_rewatches + ranked_shows)},
+            ))
+
+    # Biggest genre swing between months
+    if "genre" in user_df.columns:
+        monthly = user_df.groupby([user_df["date"].dt.to_period("M"), "genre"]).size().unstack(fill_value=0)
+        swings = detect_genre_change_points(monthly, neighborhood=1, threshold=0.0)
+        if swings:
+            swing = max(swings, key=lambda s: s["shift_score"])
+            month = monthly.index[swing["index"]].strftime("%B")
+            genres = [str(g) for g in monthly.sum().sort_values(ascending=False).index]
+            facts.append(_fact(
+                "biggest_genre_swing", "evolution",
+                f"Plot twist in {month}: you switched from {swing['from_genre']} to {swing['to_genre']}",
+                swing["shift_score"], "shift",
+                swing["shift_score"],
+                {"month": str(monthly.index[swing["index"]]), "from_genre": swing["from_genre"],
+                 "to_genre": swing["to_genre"]},
+                {"question": f"In {month} your viewing swung away from {swing['from_genre']}. Which genre took over?",
+                 "answer": swing["to_genre"], "answer_type": "genre",
+                 "choices": _choices(swing["to_genre"], [g for g in genres if g != swing["from_genre"]])},
+            ))
+
+    # Top show by time spent
+    if total_minutes > 0:
+        show = ranked_shows[0]
+        share = float(show_minutes.iloc[0]) / total_minutes
+        facts.append(_fact(
+            "top_show", "favorites",
+            f"{show} took {share:.0%} of your viewing time ({_format_minutes(float(show_minutes.iloc[0]))})",
+            round(float(show_minutes.iloc[0]) / 60, 2), "hours",
+            _notability(share * len(show_minutes)),
+            {"show": show, "share": round(share, 3), "shows_watched": int(len(show_minutes))},
+            {"question": "Which show did you spend the most hours on this year?",
+             "answer": show, "answer_type": "show", "choices": _choices(show, ranked_shows)},
+        ))
+
+    # Favorite day of the week
+    weekday_counts = user_df["weekday"].value_counts()
+    if len(weekday_counts):
+        weekday = str(weekday_counts.idxmax())
+        share = float(weekday_counts.max()) / float(weekday_counts.sum())
+        facts.append(_fact(
+            "favorite_weekday", "rhythm",
+            f"{weekday} is your viewing day: {share:.0%} of everything you watched",
+            round(share, 3), "share",
+            _notability(share * 7),
+            {"day_of_week": weekday, "views": int(weekday_counts.max())},
+            {"question": "Which day of the week do you watch the most?",
+             "answer": weekday, "answer_type": "day_of_week", "choices": DAYS_OF_WEEK},
+        ))
+
+    facts.sort(key=lambda f: f["score"], reverse=True)
+    return facts
+
+
+def extract_facts(df: pd.DataFrame, user_column: str = "user_id") -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Ranked fun facts for every user in a viewing frame.
+
+    Derived columns (day, night hour, minutes) and sessions are computed
+    once for the whole frame, then each user's slice is summarized.
+
+    Args:
+        df: Viewing records, optionally for many users
+        user_column: Column identifying the user (frames without it are one user)
+
+    Returns:
+        Facts per user, most notable first
+    """
+    if len(df) == 0:
+        return {}
+    dates = pd.to_datetime(df["date"])
+    hours = dates.dt.hour + dates.dt.minute / 60
+    frame = pd.DataFrame({
+        "user": df[user_column].astype(str) if user_column in df.columns else "user",
+        "date": dates,
+        "day": dates.dt.floor("D"),
+        "weekday": dates.dt.day_name(),
+        "night_hour": hours.where(hours >= NIGHT_ROLLOVER_HOUR, hours + 24),
+        "minutes": df["duration_minutes"].fillna(0) if "duration_minutes" in df.columns else 0.0,
+        "show_name": df["show_name"].fillna("Unknown") if "show_name" in df.columns else "Unknown",
+    }, index=df.index)
+    for column in ("genre", "is_rewatch"):
+        if column in df.columns:
+            frame[column] = df[column]
+
+    sessions = session_table(df, user_column=user_column, sessions=reconstruct_sessions(df, user_column=user_column))
+    if user_column not in df.columns:
+        sessions["user"] = "user"
+    sessions["user"] = sessions["user"].astype(str)
+    sessions_by_user = dict(tuple(sessions.groupby("user", sort=False)))
+
+    return {
+        str(user): _user_facts(user_df, sessions_by_user.get(user, sessions.iloc[:0]))
+        for user, user_df in frame.groupby("user", sort=False)
+    }
+
+
+_materialized: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_FACTS_CACHE_SIZE = 16
+
+
+def materialize_facts(file_path: str, force: bool = False) -> Dict[str, Any]:
+    """
+    Returns the facts table stored with a dataset, building it if needed.
+
+    Args:
+        file_path: Path to the CSV file, or dataset://<id> for an uploaded dataset
+        force: Rebuild even if a current table is stored
+
+    Returns:
+        {"dataset_id", "version", "built_at", "users": {user: [facts]}}
+    """
+    dataset_id = dataset_store.dataset_id_for(file_path)
+    if not force:
+        table = _materialized.get(dataset_id)
+        if table is None:
+            table = dataset_store.read_sidecar(dataset_id, FACTS_SIDECAR)
+            if table is not None and table.get("version") != FACTS_VERSION:
+                table = None
+        if table is not None:
+            _materialized[dataset_id] = table
+            _materialized.move_to_end(dataset_id)
+            return table
+
+    df = dataset_store.load_viewing_frame(file_path)
+    table = {
+        "dataset_id": dataset_id,
+        "version": FACTS_VERSION,
+        "built_at": time.time(),
+        "users": extract_facts(df),
+    }
+    dataset_store.write_sidecar(dataset_id, FACTS_SIDECAR, table)
+    _materialized[dataset_id] = table
+    if len(_materialized) > _FACTS_CACHE_SIZE:
+        _materialized.popitem(last=False)
+    return table
+
+
+def get_user_facts(
+    file_path: str,
+    limit: int = 5,
+    user_id: Optional[str] = None,
+    category: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Looks up the most notable precomputed facts about a user's viewing.
+
+    CUSTOM TOOL for quiz questions and social posts.
+
+    Args:
+        file_path: Path to the CSV file, or dataset://<id> for an uploaded dataset
+        limit: Number of facts to return, most notable first
+        user_id: User to look up (optional for single-user histories)
+        category: Only facts of this category, e.g. "binge" or "night_owl" (optional)
+
+    Returns:
+        Ranked facts, each with a headline, value, score and a quiz seed
+    """
+    try:
+        table = materialize_facts(file_path)
+        users = table["users"]
+        if not users:
+            return {"success": False, "message": "No viewing data found"}
+        if user_id is None and len(users) == 1:
+            user_id = next(iter(users))
+        if user_id not in users:
+            return {
+                "success": False,
+                "error": f"Unknown user: {user_id}",
+                "users": sorted(users)[:20],
+            }
+
+        facts = users[user_id]
+        if category:
+            facts = [f for f in facts if f["category"] == category]
+        return {
+            "success": True,
+            "user_id": user_id,
+            "total_facts": len(users[user_id]),
+            "facts": facts[:limit],
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
@@ -0,0 +1,214 @@
+"""
+Custom Tools for the Weekly Viewing Heatmap
+KEY CONCEPT: 7x24 minutes grid in one bincount, rendered once per dataset
+
+"Night owl" and "weekend warrior" used to be guessed from the average
+viewing hour and the top three days. The heatmap adds up minutes watched
+per (day of week, hour) slot in one vectorized pass over the date column:
+the hour and weekday come straight from the timestamps' integer values and
+a single np.bincount does the summing.
+
+The grid is rendered as an SVG for the wrapped card (and as a PNG when
+cairosvg is installed). Renders are stored next to the dataset, keyed by
+its fingerprint, so repeated wrapped views never re-render.
+"""
+import os
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+from my_agent import dataset_store
+
+try:
+    import cairosvg
+except (ImportError, OSError):
+    cairosvg = None  # cairosvg (or libcairo) not installed, heatmaps are SVG only
+
+PNG_AVAILABLE = cairosvg is not None
+
+# Part of the stored file name, so changing the look never serves stale renders
+HEATMAP_VERSION = 1
+IMAGE_FORMATS = ("svg", "png")
+
+DAY_LABELS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+NIGHT_HOURS = [22, 23, 0, 1, 2, 3]
+MORNING_HOURS = [5, 6, 7, 8, 9, 10]
+
+# Empty slot, then low -> high
+PALETTE = ["#1f2340", "#3b2f6b", "#6a3d9a", "#b24a8f", "#f0626b", "#ffb347"]
+
+_NS_PER_HOUR = 3_600_000_000_000
+_EPOCH_WEEKDAY = 3  # 1970-01-01 was a Thursday
+
+
+def compute_heatmap(df: pd.DataFrame) -> np.ndarray:
+    """
+    Minutes watched per (day of week, hour), Monday first.
+
+    Args:
+        df: Viewing records with 'date' and 'duration_minutes'
+
+    Returns:
+        7 x 24 float array
+    """
+    if len(df) == 0:
+        return np.zeros((7, 24))
+    dates = pd.to_datetime(df["date"])
+    # Missing dates (NaT) would land in an arbitrary slot, so leave them out
+    dated = dates.notna().to_numpy()
+    hours_since_epoch = dates.to_numpy(dtype="datetime64[ns]")[dated].astype(np.int64) // _NS_PER_HOUR
+    weekday = (hours_since_epoch // 24 + _EPOCH_WEEKDAY) % 7
+    slot = weekday * 24 + hours_since_epoch % 24
+    minutes = df["duration_minutes"].fillna(0).to_numpy(dtype=float)[dated] if "duration_minutes" in df.columns else None
+    return np.bincount(slot, weights=minutes, minlength=7 * 24).reshape(7, 24).astype(float)
+
+
+def summarize_heatmap(grid: np.ndarray) -> Dict[str, Any]:
+    """Peak slot, time-of-day shares and the patterns they suggest."""
+    total = float(grid.sum())
+    if total == 0:
+        return {"total_minutes": 0.0, "patterns": []}
+    day, hour = np.unravel_index(int(grid.argmax()), grid.shape)
+    night_share = float(grid[:, NIGHT_HOURS].sum()) / total
+    morning_share = float(grid[:, MORNING_HOURS].sum()) / total
+    weekend_share = float(grid[5:].sum()) / total
+    by_hour = grid.sum(axis=0)
+
+    patterns = []
+    if night_share >= 0.35:
+        patterns.append("Night Owl")
+    if weekend_share >= 0.4:
+        patterns.append("Weekend Warrior")
+    if morning_share >= 0.25:
+        patterns.append("Early Bird")
+    if not patterns and 18 <= int(by_hour.argmax()) <= 21:
+        patterns.append("Prime Time Regular")
+    return {
+        "total_minutes": round(total, 1),
+        "peak_slot": {"day": DAY_LABELS[day], "hour": int(hour), "minutes": round(float(grid[day, hour]), 1)},
+        "busiest_hour": int(by_hour.argmax()),
+        "busiest_day": DAY_LABELS[int(grid.sum(axis=1).argmax())],
+        "night_share": round(night_share, 3),
+        "morning_share": round(morning_share, 3),
+        "weekend_share": round(weekend_share, 3),
+        "patterns": patterns,
+    }
+
+
+def _cell_color(value: float, peak: float) -> str:
+    if value <= 0 or peak <= 0:
+        return PALETTE[0]
+    # Square-root scale so a few huge binges don't wash everything else out
+    level = int(np.ceil(np.sqrt(value / peak) * (len(PALETTE) - 1)))
+    return PALETTE[max(1, min(level, len(PALETTE) - 1))]
+
+
+def render_heatmap_svg(grid: np.ndarray, title: Optional[str] = "When you watch") -> str:
+    """The heatmap as a standalone SVG document."""
+    cell, gap, left, top = 22, 3, 44, 44 if title else 16
+    width = left + 24 * (cell + gap) + 12
+    height = top + 7 * (cell + gap) + 28
+    peak = float(grid.max())
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="Inter, Helvetica, Arial, sans-serif">',
+        f'<rect width="{width}" height="{height}" rx="12" fill="#141728"/>',
+    ]
+    if title:
+        parts.append(f'<text x="{left}" y="28" fill="#ffffff" font-size="16" font-weight="600">{escape(title)}</text>')
+    for day, label in enumerate(DAY_LABELS):
+        y = top + day * (cell + gap)
+        parts.append(f'<text x="{left - 8}" y="{y + cell * 0.7:.1f}" fill="#b8bcd8" font-size="11" text-anchor="end">{label}</text>')
+        for hour in range(24):
+            value = float(grid[day, hour])
+            parts.append(
+                f'<rect x="{left + hour * (cell + gap)}" y="{y}" width="{cell}" height="{cell}" rx="4" '
+                f'fill="{_cell_color(value, peak)}"><title>{label} {hour:02d}:00 - {value:.0f} min</title></rect>'
+            )
+    axis_y = top + 7 * (cell + gap) + 14
+    for hour in range(0, 24, 3):
+        x = left + hour * (cell + gap) + cell / 2
+        parts.append(f'<text x="{x:.1f}" y="{axis_y}" fill="#b8bcd8" font-size="10" text-anchor="middle">{hour:02d}</text>')
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+def render_heatmap_png(svg: str) -> bytes:
+    """Rasterizes a rendered heatmap (needs cairosvg)."""
+    if not PNG_AVAILABLE:
+        raise RuntimeError("PNG heatmaps need cairosvg (pip install cairosvg)")
+    return cairosvg.svg2png(bytestring=svg.encode(), scale=2)
+
+
+_rendered: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+_RENDER_CACHE_SIZE = 64
+
+
+def _heatmap_for(file_path: str) -> np.ndarray:
+    return compute_heatmap(dataset_store.load_viewing_frame(file_path))
+
+
+def get_heatmap_image(file_path: str, image_format: str = "svg", grid: Optional[np.ndarray] = None) -> str:
+    """
+    Path of the rendered heatmap for a dataset, rendering it only once.
+
+    Args:
+        file_path: Path to the CSV file, or dataset://<id> for an uploaded dataset
+        image_format: "svg" or "png"
+        grid: Heatmap if already computed (skips loading the data on a miss)
+    """
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unknown image format: {image_format}")
+    dataset_id = dataset_store.dataset_id_for(file_path)
+    key = (dataset_id, image_format)
+    path = _rendered.get(key)
+    if path is not None and os.path.exists(path):
+        _rendered.move_to_end(key)
+        return path
+
+    name = f"heatmap-v{HEATMAP_VERSION}"
+    path = dataset_store.sidecar_path(dataset_id, name, image_format)
+    if not os.path.exists(path):
+        svg = render_heatmap_svg(_heatmap_for(file_path) if grid is None else grid)
+        payload = svg.encode() if image_format == "svg" else render_heatmap_png(svg)
+        path = dataset_store.write_bytes_sidecar(dataset_id, name, image_format, payload)
+    _rendered[key] = path
+    if len(_rendered) > _RENDER_CACHE_SIZE:
+        _rendered.popitem(last=False)
+    return path
+
+
+def get_viewing_heatmap(file_path: str) -> Dict[str, Any]:
+    """
+    Minutes watched per day of week and hour, with the rendered heatmap image.
+
+    CUSTOM TOOL for night owl / weekend warrior patterns.
+
+    Args:
+        file_path: Path to the CSV file, or dataset://<id> for an uploaded dataset
+
+    Returns:
+        7x24 minutes grid (Monday first, hours 0-23), peak slot, night /
+        morning / weekend shares, detected patterns and the image path
+    """
+    try:
+        grid = _heatmap_for(file_path)
+        images = {"svg": get_heatmap_image(file_path, "svg", grid)}
+        if PNG_AVAILABLE:
+            images["png"] = get_heatmap_image(file_path, "png", grid)
+        return {
+            "success": True,
+            "days": DAY_LABELS,
+            "minutes": np.round(grid).astype(int).tolist(),
+            **summarize_heatmap(grid),
+            "images": images,
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
@@ -0,0 +1,162 @@
+"""
+Memoization for Deterministic Tools
+KEY CONCEPT: Repeat tool calls on the same data return instantly
+
+In one chat the model often calls calculate_stats, get_personality or
+analyze_evolution again and again on the same records. Pure tools decorated
+with @memoize_tool cache their result keyed on the dataset fingerprint plus
+the other arguments, in a bounded LRU per session (or one per process), with
+hit/miss counters per tool.
+"""
+import contextlib
+import contextvars
+import copy
+import functools
+import hashlib
+import inspect
+import json
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from my_agent import config
+from my_agent.tracing import annotate_span
+
+
+def dataset_fingerprint(data: List[Dict[str, Any]]) -> str:
+    """
+    Stable content hash of a list of viewing records.
+
+    Used to key caches and indexes so the same data passed to several tool
+    calls is only processed once.
+    """
+    payload = json.dumps(data, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def _argument_key(value: Any) -> str:
+    if isinstance(value, list) and value and isinstance(value[0], dict):
+        return dataset_fingerprint(value)
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+class MemoCache:
+    """Bounded LRU of tool results."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[tuple, Any]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: tuple) -> Any:
+        value = self.entries.get(key, _MISSING)
+        if value is not _MISSING:
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key: tuple, value: Any):
+        self.entries[key] = value
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+
+_MISSING = object()
+
+# Active memo scope (a session ID); None means the process-wide cache
+_current_scope: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("tool_memo_scope", default=None)
+
+_process_cache = MemoCache(config.TOOL_MEMO_MAX_ENTRIES)
+_session_caches: "OrderedDict[str, MemoCache]" = OrderedDict()
+_tool_counters: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+
+@contextlib.contextmanager
+def memo_scope(scope_id: Optional[str]) -> Iterator[None]:
+    """Tool calls inside the block share the memo cache of scope_id (e.g. a session ID)."""
+    token = _current_scope.set(scope_id)
+    try:
+        yield
+    finally:
+        _current_scope.reset(token)
+
+
+def set_memo_scope(scope_id: Optional[str]):
+    """Sets the memo scope for the rest of the current context (e.g. one CLI session)."""
+    _current_scope.set(scope_id)
+
+
+def _active_cache() -> MemoCache:
+    scope = _current_scope.get()
+    if config.TOOL_MEMO_SCOPE != "session" or scope is None:
+        return _process_cache
+    cache = _session_caches.get(scope)
+    if cache is None:
+        cache = _session_caches[scope] = MemoCache(config.TOOL_MEMO_MAX_ENTRIES)
+        if len(_session_caches) > config.TOOL_MEMO_MAX_SESSIONS:
+            _session_caches.popitem(last=False)
+    else:
+        _session_caches.move_to_end(scope)
+    return cache
+
+
+def memoize_tool(func: Callable) -> Callable:
+    """
+    Caches a pure tool's result by dataset fingerprint + arguments.
+
+    Failed results ({"success": False, ...}) aren't cached. Callers get a
+    copy, so mutating a result never corrupts the cache.
+    """
+    signature = inspect.signature(func)
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not config.TOOL_MEMO_ENABLED:
+            return func(*args, **kwargs)
+
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (name, *(_argument_key(v) for v in bound.arguments.values()))
+        cache = _active_cache()
+        counters = _tool_counters[name]
+
+        result = cache.get(key)
+        annotate_span(**{"tool.memo_hit": result is not _MISSING})
+        if result is _MISSING:
+            counters["misses"] += 1
+            result = func(*args, **kwargs)
+            if not (isinstance(result, dict) and result.get("success") is False):
+                cache.put(key, result)
+        else:
+            counters["hits"] += 1
+        return copy.deepcopy(result)
+
+    return wrapper
+
+
+def memo_stats() -> Dict[str, Any]:
+    """Hit rates per tool and cache sizes."""
+    hits = sum(c["hits"] for c in _tool_counters.values())
+    misses = sum(c["misses"] for c in _tool_counters.values())
+    return {
+        "enabled": config.TOOL_MEMO_ENABLED,
+        "scope": config.TOOL_MEMO_SCOPE,
+        "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+        "tools": {
+            name: {**c, "hit_rate": round(c["hits"] / (c["hits"] + c["misses"]), 4)}
+            for name, c in _tool_counters.items() if c["hits"] + c["misses"]
+        },
+        "process_entries": len(_process_cache.entries),
+        "sessions": len(_session_caches),
+        "session_entries": sum(len(c.entries) for c in _session_caches.values()),
+        "evictions": _process_cache.evictions + sum(c.evictions for c in _session_caches.values()),
+    }
+
+
+def clear_memo(scope_id: Optional[str] = None):
+    """Drops one session's cache, or every cache when scope_id is None."""
+    if scope_id is not None:
+        _session_caches.pop(scope_id, None)
+        return
+    _process_cache.entries.clear()
+    _session_caches.clear()
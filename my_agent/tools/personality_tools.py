@@ -4,7 +4,10 @@ KEY CONCEPT: Custom tools with business logic
 """
 from typing import Dict, Any, List
 
+from my_agent.tools.memo import memoize_tool
 
+
+@memoize_tool
 def determine_viewing_personality(stats: Dict[str, Any]) -> Dict[str, Any]:
     """
     Determines user's viewing personality type based on their habits.
@@ -141,45 +144,192 @@ def determine_viewing_personality(stats: Dict[str, Any]) -> Dict[str, Any]:
         }
 
 
-def analyze_viewing_evolution(data: List[Dict[str, Any]]) -> Dict[str, Any]:
+# Period definitions for evolution analysis (pandas period frequency)
+EVOLUTION_GRANULARITIES = {
+    "week": "W-SUN",
+    "month": "M",
+    "quarter": "Q",
+}
+
+# Minimum genre-mix shift (total variation distance, 0-1) for a turning point
+CHANGE_POINT_THRESHOLD = 0.25
+
+_QUARTER_NAMES = ["Q1 (Jan-Mar)", "Q2 (Apr-Jun)", "Q3 (Jul-Sep)", "Q4 (Oct-Dec)"]
+
+
+def _top_by_period(df, period, column):
+    """Most frequent value of column per period (ties -> alphabetical, like .mode())."""
+    counts = df.groupby([period, column], observed=True).size().reset_index(name='n')
+    counts = counts.sort_values([period, 'n', column], ascending=[True, False, True])
+    return counts.drop_duplicates(period).set_index(period)[column]
+
+
+def _period_labels(periods, granularity):
+    """Human-readable labels for period start/end timestamps."""
+    if granularity == "quarter":
+        multi_year = len({p.year for p in periods}) > 1
+        return [
+            f"{p.year} {_QUARTER_NAMES[p.quarter - 1]}" if multi_year else _QUARTER_NAMES[p.quarter - 1]
+            for p in periods
+        ]
+    if granularity == "month":
+        return [p.strftime('%Y-%m') for p in periods]
+    if granularity == "week":
+        return [f"Week of {p.start_time.strftime('%Y-%m-%d')}" for p in periods]
+    return [str(p) for p in periods]
+
+
+def _rolling_genre_counts(df, window_days, step_days):
+    """Genre counts over rolling windows of window_days, sampled every step_days."""
+    import pandas as pd
+    
+    daily = df.groupby([df['date'].dt.floor('D'), 'genre']).size().unstack(fill_value=0)
+    full_range = pd.date_range(daily.index.min(), daily.index.max(), freq='D')
+    rolling = daily.reindex(full_range, fill_value=0).rolling(window_days, min_periods=1).sum()
+    sampled = rolling.iloc[::-1].iloc[::step_days].iloc[::-1]
+    return sampled[sampled.sum(axis=1) > 0]
+
+
+def detect_genre_change_points(genre_counts, neighborhood: int = 2,
+                               threshold: float = CHANGE_POINT_THRESHOLD) -> List[Dict[str, Any]]:
     """
-    Analyzes how viewing habits evolved over the year.
+    Finds the periods where the genre mix actually shifted.
+    
+    Compares the average genre share of the `neighborhood` periods before
+    each boundary with the ones after it (total variation distance) and keeps
+    local maxima above the threshold. Fully vectorized over periods.
+    
+    Args:
+        genre_counts: DataFrame of periods x genres with view counts
+        neighborhood: Periods on each side of a boundary to compare
+        threshold: Minimum shift (0-1) to report
+        
+    Returns:
+        List of turning points in chronological order
+    """
+    import numpy as np
+    import pandas as pd
+    
+    n = len(genre_counts)
+    if n < 2:
+        return []
+    
+    counts = genre_counts.to_numpy(dtype=float)
+    shares = counts / np.maximum(counts.sum(axis=1, keepdims=True), 1)
+    cumulative = np.vstack([np.zeros(shares.shape[1]), np.cumsum(shares, axis=0)])
+    
+    boundary = np.arange(1, n)
+    lo = np.maximum(boundary - neighborhood, 0)
+    hi = np.minimum(boundary + neighborhood, n)
+    before = (cumulative[boundary] - cumulative[lo]) / (boundary - lo)[:, None]
+    after = (cumulative[hi] - cumulative[boundary]) / (hi - boundary)[:, None]
+    shift = 0.5 * np.abs(after - before).sum(axis=1)
+    
+    local_max = pd.Series(shift).rolling(2 * neighborhood + 1, center=True, min_periods=1).max().to_numpy()
+    selected = np.flatnonzero((shift >= threshold) & (shift >= local_max))
+    
+    # Genre that lost / gained the most share across each boundary
+    delta = after - before
+    genres = np.asarray(genre_counts.columns)
+    return [
+        {
+            "index": int(boundary[i]),
+            "from_genre": str(genres[delta[i].argmin()]),
+            "to_genre": str(genres[delta[i].argmax()]),
+            "shift_score": round(float(shift[i]), 3)
+        }
+        for i in selected
+    ]
+
+
+@memoize_tool
+def analyze_viewing_evolution(
+    data: List[Dict[str, Any]],
+    granularity: str = "quarter",
+    window_days: int = 30
+) -> Dict[str, Any]:
+    """
+    Analyzes how viewing habits evolved over time.
+    
+    All periods are computed in a single groupby, so multi-year histories at
+    week granularity cost about the same as a single year by quarter.
     
     Args:
         data: List of viewing records
+        granularity: "week", "month", "quarter" or "rolling"
+        window_days: Window length for rolling granularity
         
     Returns:
-        Dictionary describing viewing evolution
+        Dictionary describing viewing evolution and turning points
     """
     try:
         import pandas as pd
         
+        if granularity not in EVOLUTION_GRANULARITIES and granularity != "rolling":
+            return {
+                "success": False,
+                "error": f"Unknown granularity '{granularity}'. Use week, month, quarter or rolling."
+            }
+        
         df = pd.DataFrame(data)
         df['date'] = pd.to_datetime(df['date'])
+        if 'genre' not in df.columns:
+            df['genre'] = "Unknown"
         
-        # Split year into quarters
-        df['quarter'] = df['date'].dt.quarter
+        if granularity == "rolling":
+            window_days = max(int(window_days), 1)
+            step_days = max(window_days // 4, 1)
+            genre_counts = _rolling_genre_counts(df, window_days, step_days)
+            window_ends = genre_counts.index
+            labels = [
+                f"{(end - pd.Timedelta(days=window_days - 1)).strftime('%Y-%m-%d')} to {end.strftime('%Y-%m-%d')}"
+                for end in window_ends
+            ]
+            period_starts = list(window_ends)
+            top_genres = genre_counts.idxmax(axis=1).tolist()
+            total_views = genre_counts.sum(axis=1).astype(int).tolist()
+            top_shows = [None] * len(labels)
+        else:
+            df['period'] = df['date'].dt.to_period(EVOLUTION_GRANULARITIES[granularity])
+            genre_counts = df.groupby(['period', 'genre']).size().unstack(fill_value=0)
+            periods = list(genre_counts.index)
+            labels = _period_labels(periods, granularity)
+            period_starts = [p.start_time for p in periods]
+            top_genres = genre_counts.idxmax(axis=1).tolist()
+            total_views = genre_counts.sum(axis=1).astype(int).tolist()
+            top_shows = (
+                _top_by_period(df, 'period', 'show_name').reindex(periods).tolist()
+                if 'show_name' in df.columns else ["Unknown"] * len(periods)
+            )
         
-        # Analyze genre shifts by quarter
         evolution = {}
-        for quarter in sorted(df['quarter'].unique()):
-            quarter_data = df[df['quarter'] == quarter]
-            top_genre = quarter_data['genre'].mode()[0] if 'genre' in quarter_data.columns and len(quarter_data) > 0 else "Unknown"
-            top_show = quarter_data['show_name'].mode()[0] if 'show_name' in quarter_data.columns and len(quarter_data) > 0 else "Unknown"
-            
-            quarter_name = ["Q1 (Jan-Mar)", "Q2 (Apr-Jun)", "Q3 (Jul-Sep)", "Q4 (Oct-Dec)"][quarter - 1]
-            
-            evolution[quarter_name] = {
-                "top_genre": top_genre,
-                "top_show": top_show,
-                "total_views": len(quarter_data)
-            }
+        for label, top_genre, top_show, views in zip(labels, top_genres, top_shows, total_views):
+            entry = {"top_genre": top_genre}
+            if top_show is not None:
+                entry["top_show"] = top_show
+            entry["total_views"] = views
+            evolution[label] = entry
+        
+        # Detect when the genre mix actually shifted
+        turning_points = []
+        for point in detect_genre_change_points(genre_counts):
+            index = point.pop("index")
+            start = period_starts[index]
+            if granularity == "rolling":
+                start = start - pd.Timedelta(days=window_days - 1)
+            # Pin the turning point to the first day the new genre was watched
+            new_genre_dates = df.loc[(df['date'] >= start) & (df['genre'] == point["to_genre"]), 'date']
+            turning_date = new_genre_dates.min() if len(new_genre_dates) else start
+            turning_points.append({
+                "date": turning_date.strftime('%Y-%m-%d'),
+                "period": labels[index],
+                **point
+            })
         
         # Detect transformation
-        quarters = list(evolution.keys())
-        if len(quarters) >= 2:
-            first_genre = evolution[quarters[0]]['top_genre']
-            last_genre = evolution[quarters[-1]]['top_genre']
+        if len(labels) >= 2:
+            first_genre = top_genres[0]
+            last_genre = top_genres[-1]
             
             if first_genre != last_genre:
                 transformation = f"From {first_genre} to {last_genre}"
@@ -190,7 +340,9 @@ def analyze_viewing_evolution(data: List[Dict[str, Any]]) -> Dict[str, Any]:
         
         return {
             "success": True,
+            "granularity": granularity,
             "evolution": evolution,
+            "turning_points": turning_points,
             "transformation": transformation
         }
         
@@ -199,5 +351,3 @@ def analyze_viewing_evolution(data: List[Dict[str, Any]]) -> Dict[str, Any]:
             "success": False,
             "error": str(e)
         }
-
-
@@ -0,0 +1,404 @@
+"""
+Custom Tools for Population Benchmarks
+KEY CONCEPT: Mergeable streaming quantile sketches
+
+Lets the agents say things like "you watched more than 87% of Astro viewers"
+without sorting the whole population at request time. Each metric produced by
+calculate_personal_stats is summarized by a KLL-style sketch that is built
+incrementally, merged across shards/workers and serialized to JSON.
+"""
+import bisect
+import json
+import math
+import os
+import random
+import sys
+from typing import Dict, Any, List, Optional, Tuple
+
+import pandas as pd
+
+from my_agent import config
+from my_agent.tools.session_tools import reconstruct_sessions
+
+
+# Metrics from calculate_personal_stats that we benchmark against the population
+BENCHMARK_METRICS = [
+    "total_hours",
+    "completion_rate",
+    "avg_episodes_per_session",
+    "rewatch_count",
+]
+
+# Size of the precomputed rank table used for request-time lookups
+RANK_TABLE_SIZE = 1001
+
+
+class QuantileSketch:
+    """
+    KLL-style mergeable quantile sketch.
+
+    Keeps a stack of compactors; level h holds items of weight 2**h. When a
+    level overflows it is sorted and every other item is promoted, so memory
+    stays O(k log(n/k)) while rank error stays around 1/k.
+    """
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None):
+        self.k = k
+        self.count = 0
+        self.min_value = math.inf
+        self.max_value = -math.inf
+        self.compactors: List[List[float]] = [[]]
+        self._rng = random.Random(seed)
+        self._rank_table: Optional[List[float]] = None
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _size(self) -> int:
+        return sum(len(c) for c in self.compactors)
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _compress(self):
+        while self._size() > self._max_size():
+            for level, items in enumerate(self.compactors):
+                if len(items) >= self._capacity(level):
+                    if level + 1 == len(self.compactors):
+                        self.compactors.append([])
+                    items.sort()
+                    # Keep one item behind when the level has odd length
+                    leftover = [items.pop()] if len(items) % 2 else []
+                    offset = self._rng.randint(0, 1)
+                    self.compactors[level + 1].extend(items[offset::2])
+                    self.compactors[level] = leftover
+                    break
+        self._rank_table = None
+
+    def update(self, value: float):
+        """Adds a single observation to the sketch."""
+        value = float(value)
+        if math.isnan(value):
+            return
+        self.compactors[0].append(value)
+        self.count += 1
+        self.min_value = min(self.min_value, value)
+        self.max_value = max(self.max_value, value)
+        if len(self.compactors[0]) >= self._capacity(0):
+            self._compress()
+        else:
+            self._rank_table = None
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Merges another sketch (e.g. from another shard) into this one."""
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.count += other.count
+        self.min_value = min(self.min_value, other.min_value)
+        self.max_value = max(self.max_value, other.max_value)
+        self._compress()
+        return self
+
+    def _weighted_items(self) -> Tuple[List[float], List[float]]:
+        pairs = sorted(
+            (value, 2 ** level)
+            for level, items in enumerate(self.compactors)
+            for value in items
+        )
+        values = [v for v, _ in pairs]
+        cumulative = []
+        running = 0
+        for _, weight in pairs:
+            running += weight
+            cumulative.append(running)
+        return values, cumulative
+
+    def quantile(self, q: float) -> float:
+        """Returns the approximate value at quantile q (0-1)."""
+        if self.count == 0:
+            return math.nan
+        values, cumulative = self._weighted_items()
+        target = q * cumulative[-1]
+        index = min(bisect.bisect_left(cumulative, target), len(values) - 1)
+        return values[index]
+
+    def rank_table(self) -> List[float]:
+        """
+        Fixed-size table of quantile boundaries (0%, 0.1%, ..., 100%).
+
+        Computed once per sketch, so request-time lookups cost the same
+        regardless of how many users were sketched.
+        """
+        if self._rank_table is None:
+            if self.count == 0:
+                self._rank_table = []
+            else:
+                values, cumulative = self._weighted_items()
+                total = cumulative[-1]
+                table = []
+                index = 0
+                for i in range(RANK_TABLE_SIZE):
+                    target = total * i / (RANK_TABLE_SIZE - 1)
+                    while index < len(values) - 1 and cumulative[index] < target:
+                        index += 1
+                    table.append(values[index])
+                table[0] = self.min_value
+                table[-1] = self.max_value
+                self._rank_table = table
+        return self._rank_table
+
+    def median(self) -> float:
+        """Returns the approximate median, read from the rank table."""
+        table = self.rank_table()
+        return table[RANK_TABLE_SIZE // 2] if table else math.nan
+
+    def percentile_rank(self, value: float) -> float:
+        """Returns the percentage (0-100) of the population strictly below value."""
+        table = self.rank_table()
+        if not table:
+            return math.nan
+        position = bisect.bisect_left(table, float(value))
+        return round(100.0 * max(position - 1, 0) / (RANK_TABLE_SIZE - 1), 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "k": self.k,
+            "count": self.count,
+            "min": self.min_value if self.count else None,
+            "max": self.max_value if self.count else None,
+            "compactors": self.compactors,
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> "QuantileSketch":
+        sketch = cls(k=payload.get("k", 200))
+        sketch.count = payload.get("count", 0)
+        if sketch.count:
+            sketch.min_value = payload["min"]
+            sketch.max_value = payload["max"]
+        sketch.compactors = [list(map(float, c)) for c in payload.get("compactors", [[]])] or [[]]
+        return sketch
+
+
+class PopulationBenchmarks:
+    """
+    One quantile sketch per benchmark metric.
+
+    Built incrementally from per-user stats, merged across shards and
+    persisted as a single JSON file.
+    """
+
+    def __init__(self, k: int = 200):
+        self.sketches = {metric: QuantileSketch(k=k) for metric in BENCHMARK_METRICS}
+
+    @property
+    def user_count(self) -> int:
+        return max((s.count for s in self.sketches.values()), default=0)
+
+    def add_user_stats(self, stats: Dict[str, Any]):
+        """Adds one user's stats (as returned by calculate_personal_stats)."""
+        for metric, sketch in self.sketches.items():
+            value = stats.get(metric)
+            if value is not None:
+                sketch.update(value)
+
+    def merge(self, other: "PopulationBenchmarks") -> "PopulationBenchmarks":
+        for metric, sketch in other.sketches.items():
+            self.sketches.setdefault(metric, QuantileSketch(k=sketch.k)).merge(sketch)
+        return self
+
+    def percentiles(self, stats: Dict[str, Any]) -> Dict[str, Any]:
+        """Returns the population percentile of each metric in stats."""
+        result = {}
+        for metric, sketch in self.sketches.items():
+            value = stats.get(metric)
+            if value is None or sketch.count == 0:
+                continue
+            percentile = sketch.percentile_rank(value)
+            result[metric] = {
+                "value": value,
+                "percentile": percentile,
+                "population_median": round(sketch.median(), 3),
+            }
+        return result
+
+    def save(self, path: str):
+        """Writes the sketches to disk atomically."""
+        payload = {
+            "version": 1,
+            "user_count": self.user_count,
+            "sketches": {m: s.to_dict() for m, s in self.sketches.items()},
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "PopulationBenchmarks":
+        with open(path) as f:
+            payload = json.load(f)
+        benchmarks = cls()
+        benchmarks.sketches = {
+            m: QuantileSketch.from_dict(s) for m, s in payload.get("sketches", {}).items()
+        }
+        # Build the rank tables (and so the medians) once, not on the first request
+        for sketch in benchmarks.sketches.values():
+            sketch.rank_table()
+        return benchmarks
+
+
+def per_user_metrics(df: pd.DataFrame, user_column: str = "user_id") -> pd.DataFrame:
+    """
+    Computes the benchmark metrics for every user in one groupby.
+
+    Mirrors the definitions used by calculate_personal_stats. Frames without
+    a user column are treated as a single user.
+
+    Args:
+        df: Viewing records, optionally for many users
+        user_column: Column identifying the user
+
+    Returns:
+        DataFrame indexed by user with one column per benchmark metric
+    """
+    if user_column not in df.columns:
+        df = df.assign(**{user_column: "user"})
+    grouped = df.groupby(user_column, sort=False)
+
+    metrics = pd.DataFrame(index=grouped.size().index)
+    metrics["total_hours"] = (
+        grouped["duration_minutes"].sum() / 60 if "duration_minutes" in df.columns else 0.0
+    )
+    metrics["completion_rate"] = (
+        grouped["completed"].mean() if "completed" in df.columns else 0.0
+    )
+    if "session_id" in df.columns and df["session_id"].notna().all():
+        sessions = df["session_id"]
+    else:
+        sessions = reconstruct_sessions(df, user_column=user_column)
+    metrics["avg_episodes_per_session"] = grouped.size() / sessions.groupby(df[user_column]).nunique()
+    metrics["rewatch_count"] = (
+        grouped["is_rewatch"].sum() if "is_rewatch" in df.columns else 0
+    )
+    return metrics
+
+
+def build_population_benchmarks(
+    file_paths: List[str],
+    user_column: str = "user_id",
+    benchmarks: Optional[PopulationBenchmarks] = None
+) -> PopulationBenchmarks:
+    """
+    Streams viewing history files into population sketches.
+
+    Each file is processed independently, so a worker can build sketches
+    for its own shard and the results can be merged afterwards.
+
+    Args:
+        file_paths: CSV files with viewing records
+        user_column: Column identifying the user
+        benchmarks: Existing sketches to extend (optional)
+
+    Returns:
+        PopulationBenchmarks with every user added
+    """
+    benchmarks = benchmarks or PopulationBenchmarks()
+    for file_path in file_paths:
+        df = pd.read_csv(file_path)
+        for row in per_user_metrics(df, user_column).itertuples(index=False):
+            benchmarks.add_user_stats(row._asdict())
+    return benchmarks
+
+
+_loaded_benchmarks: Dict[str, Tuple[float, PopulationBenchmarks]] = {}
+
+
+def load_population_benchmarks(path: Optional[str] = None) -> Optional[PopulationBenchmarks]:
+    """Loads sketches from disk, reusing the cached copy until the file changes."""
+    path = path or config.POPULATION_BENCHMARKS_PATH
+    if not path or not os.path.exists(path):
+        return None
+    mtime = os.path.getmtime(path)
+    cached = _loaded_benchmarks.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    benchmarks = PopulationBenchmarks.load(path)
+    # Build the rank tables up front so lookups never pay for it
+    for sketch in benchmarks.sketches.values():
+        sketch.rank_table()
+    _loaded_benchmarks[path] = (mtime, benchmarks)
+    return benchmarks
+
+
+def compare_to_population(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compares a user's stats to the whole viewer population.
+
+    CUSTOM TOOL for population benchmarks.
+
+    Args:
+        stats: Dictionary with viewing statistics (from calculate_personal_stats)
+
+    Returns:
+        Percentile of each metric within the population
+    """
+    try:
+        benchmarks = load_population_benchmarks()
+        if benchmarks is None:
+            return {
+                "success": False,
+                "error": "Population benchmarks not available",
+                "message": f"No benchmark file at {config.POPULATION_BENCHMARKS_PATH}"
+            }
+
+        percentiles = benchmarks.percentiles(stats)
+        highlights = [
+            f"More {metric.replace('_', ' ')} than {info['percentile']}% of viewers"
+            for metric, info in percentiles.items()
+            if info["percentile"] >= 50
+        ]
+
+        return {
+            "success": True,
+            "population_size": benchmarks.user_count,
+            "percentiles": percentiles,
+            "highlights": highlights
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
+def main():
+    """
+    CLI for building and merging population sketches.
+
+    Usage:
+        python -m my_agent.tools.population_tools build <output.json> <file.csv> [...]
+        python -m my_agent.tools.population_tools merge <output.json> <shard.json> [...]
+    """
+    if len(sys.argv) < 4 or sys.argv[1] not in ("build", "merge"):
+        print(main.__doc__)
+        sys.exit(1)
+
+    command, output_path, inputs = sys.argv[1], sys.argv[2], sys.argv[3:]
+
+    if command == "build":
+        benchmarks = build_population_benchmarks(inputs)
+    else:
+        benchmarks = PopulationBenchmarks()
+        for shard_path in inputs:
+            benchmarks.merge(PopulationBenchmarks.load(shard_path))
+
+    benchmarks.save(output_path)
+    print(f"✅ Wrote sketches for {benchmarks.user_count} users to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""
+Custom Tools for Ad-Hoc Viewing Slices
+KEY CONCEPT: Pre-aggregated rollup cube, sliced without touching raw rows
+
+Questions like "How much Drama did I watch on weekend nights in Q3?" don't
+fit the fixed outputs of calculate_personal_stats. The rollup cube holds
+minutes, views, completions and rewatches per (user, month, genre,
+day_of_week, hour, show) cell, built in one groupby and stored next to the
+dataset as small integer-coded arrays. A query masks cells with per-dimension
+lookup tables and sums the measures with bincount, which takes well under a
+millisecond for a year of viewing.
+"""
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from my_agent import dataset_store
+from my_agent.tools.matching_tools import MATCH_THRESHOLD, get_show_index
+
+# Bump when the cube layout changes so stored cubes are rebuilt
+ROLLUP_VERSION = 1
+ROLLUP_SIDECAR = "rollup"
+
+DIMENSIONS = ("user", "month", "genre", "day_of_week", "hour", "show")
+MEASURES = ("minutes", "views", "completed", "rewatches")
+
+DAYS_OF_WEEK = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+DAY_GROUPS = {
+    "weekend": ["Saturday", "Sunday"],
+    "weekends": ["Saturday", "Sunday"],
+    "weekday": DAYS_OF_WEEK[:5],
+    "weekdays": DAYS_OF_WEEK[:5],
+}
+MONTH_NAMES = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+
+
+def _code_dtype(size: int) -> np.dtype:
+    return np.min_scalar_type(max(size - 1, 0))
+
+
+class RollupCube:
+    """
+    Viewing totals per (user, month, genre, day_of_week, hour, show) cell.
+
+    Each dimension is stored as integer codes into its label list; measures
+    are parallel arrays. Only cells that occur in the data are stored.
+    """
+
+    def __init__(self, codes: Dict[str, np.ndarray], labels: Dict[str, list], measures: Dict[str, np.ndarray]):
+        self.codes = codes
+        self.labels = labels
+        self.measures = measures
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, user_column: str = "user_id") -> "RollupCube":
+        dates = pd.to_datetime(df["date"])
+        user_codes, users = pd.factorize(
+            df[user_column].astype(str) if user_column in df.columns else pd.Series("user", index=df.index),
+            sort=True
+        )
+        month_codes, months = pd.factorize(dates.dt.to_period("M").astype(str), sort=True)
+        genre_codes, genres = pd.factorize(df["genre"].fillna("Unknown") if "genre" in df.columns
+                                           else pd.Series("Unknown", index=df.index), sort=True)
+        show_codes, shows = pd.factorize(df["show_name"].fillna("Unknown"), sort=True)
+
+        frame = pd.DataFrame({
+            "user": user_codes,
+            "month": month_codes,
+            "genre": genre_codes,
+            "day_of_week": dates.dt.dayofweek.to_numpy(),
+            "hour": dates.dt.hour.to_numpy(),
+            "show": show_codes,
+            "minutes": df["duration_minutes"].fillna(0).to_numpy(dtype=float) if "duration_minutes" in df.columns else 0.0,
+            "completed": df["completed"].fillna(False).astype(bool).to_numpy() if "completed" in df.columns else False,
+            "rewatches": df["is_rewatch"].fillna(False).astype(bool).to_numpy() if "is_rewatch" in df.columns else False,
+        })
+        cells = frame.groupby(list(DIMENSIONS), sort=True).agg(
+            minutes=("minutes", "sum"),
+            views=("minutes", "size"),
+            completed=("completed", "sum"),
+            rewatches=("rewatches", "sum"),
+        ).reset_index()
+
+        labels = {
+            "user": [str(u) for u in users],
+            "month": [str(m) for m in months],
+            "genre": [str(g) for g in genres],
+            "day_of_week": DAYS_OF_WEEK,
+            "hour": list(range(24)),
+            "show": [str(s) for s in shows],
+        }
+        codes = {dim: cells[dim].to_numpy().astype(_code_dtype(len(labels[dim]))) for dim in DIMENSIONS}
+        measures = {
+            "minutes": cells["minutes"].to_numpy(dtype=np.float32),
+            "views": cells["views"].to_numpy(dtype=np.uint32),
+            "completed": cells["completed"].to_numpy(dtype=np.uint32),
+            "rewatches": cells["rewatches"].to_numpy(dtype=np.uint32),
+        }
+        return cls(codes, labels, measures)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        arrays = {"version": np.array(ROLLUP_VERSION)}
+        for dim in DIMENSIONS:
+            arrays[f"codes_{dim}"] = self.codes[dim]
+            arrays[f"labels_{dim}"] = np.array(self.labels[dim])
+        for measure in MEASURES:
+            arrays[f"measure_{measure}"] = self.measures[measure]
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> Optional["RollupCube"]:
+        if int(arrays.get("version", -1)) != ROLLUP_VERSION:
+            return None
+        return cls(
+            codes={dim: arrays[f"codes_{dim}"] for dim in DIMENSIONS},
+            labels={dim: arrays[f"labels_{dim}"].tolist() for dim in DIMENSIONS},
+            measures={measure: arrays[f"measure_{measure}"] for measure in MEASURES},
+        )
+
+    @property
+    def cells(self) -> int:
+        return len(self.measures["minutes"])
+
+    def query(
+        self,
+        filters: Optional[Dict[str, List[int]]] = None,
+        group_by: Optional[List[str]] = None,
+        limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Sums the measures over the cells matching every filter.
+
+        Args:
+            filters: Allowed label codes per dimension
+            group_by: Dimensions to break the totals down by
+            limit: Number of groups to return, by minutes watched
+
+        Returns:
+            {"totals": {...}, "groups": [{dims..., measures...}]}
+        """
+        mask = np.ones(self.cells, dtype=bool)
+        for dim, allowed in (filters or {}).items():
+            lookup = np.zeros(len(self.labels[dim]), dtype=bool)
+            lookup[allowed] = True
+            mask &= lookup[self.codes[dim]]
+
+        selected = {measure: values[mask] for measure, values in self.measures.items()}
+        result = {"totals": {measure: values.sum().item() for measure, values in selected.items()}, "groups": []}
+        if not group_by:
+            return result
+
+        # Mixed-radix key over the grouped dimensions, then one bincount per measure
+        key = np.zeros(int(mask.sum()), dtype=np.int64)
+        for dim in group_by:
+            key = key * len(self.labels[dim]) + self.codes[dim][mask]
+        group_keys, inverse = np.unique(key, return_inverse=True)
+        sums = {measure: np.bincount(inverse, weights=values, minlength=len(group_keys))
+                for measure, values in selected.items()}
+
+        order = np.argsort(-sums["minutes"], kind="stable")
+        if limit is not None:
+            order = order[:limit]
+        for i in order:
+            group, remainder = {}, int(group_keys[i])
+            for dim in reversed(group_by):
+                remainder, code = divmod(remainder, len(self.labels[dim]))
+                group[dim] = self.labels[dim][code]
+            group = {dim: group[dim] for dim in group_by}
+            group.update({measure: sums[measure][i].item() if measure == "minutes" else int(sums[measure][i])
+                          for measure in MEASURES})
+            result["groups"].append(group)
+        return result
+
+
+_cubes: "OrderedDict[str, RollupCube]" = OrderedDict()
+_ROLLUP_CACHE_SIZE = 16
+
+
+def materialize_rollup(file_path: str, force: bool = False) -> RollupCube:
+    """
+    Returns the rollup cube stored with a dataset, building it if needed.
+
+    Args:
+        file_path: Path to the CSV file, or dataset://<id> for an uploaded dataset
+        force: Rebuild even if a current cube is stored
+    """
+    dataset_id = dataset_store.dataset_id_for(file_path)
+    if not force:
+        cube = _cubes.get(dataset_id)
+        if cube is None:
+            arrays = dataset_store.read_array_sidecar(dataset_id, ROLLUP_SIDECAR)
+            cube = RollupCube.from_arrays(arrays) if arrays is not None else None
+        if cube is not None:
+            _cubes[dataset_id] = cube
+            _cubes.move_to_end(dataset_id)
+            return cube
+
+    cube = RollupCube.from_dataframe(dataset_store.load_viewing_frame(file_path))
+    dataset_store.write_array_sidecar(dataset_id, ROLLUP_SIDECAR, cube.to_arrays())
+    _cubes[dataset_id] = cube
+    if len(_cubes) > _ROLLUP_CACHE_SIZE:
+        _cubes.popitem(last=False)
+    return cube
+
+
+def _resolve_months(values: List[str], labels: List[str]) -> List[str]:
+    """'2024-07', 'July', 'March 2023', 'Q3' or '2024-Q3' -> matching month labels."""
+    resolved = []
+    for value in values:
+        token = str(value).strip().lower()
+        if token in labels:
+            resolved.append(token)
+            continue
+        year_match = re.search(r"\b\d{4}\b", token)
+        year, part = "", token
+        if year_match:
+            year = year_match.group(0)
+            part = (token[:year_match.start()] + " " + token[year_match.end():]).strip(" -,")
+        if part.startswith("q") and part[1:].isdigit():
+            quarter = int(part[1:])
+            matches = [m for m in labels if (int(m[5:7]) - 1) // 3 + 1 == quarter and m.startswith(year)]
+        elif part[:3] in MONTH_NAMES and part.isalpha():
+            month = MONTH_NAMES.index(part[:3]) + 1
+            matches = [m for m in labels if int(m[5:7]) == month and m.startswith(year)]
+        else:
+            raise ValueError(f"Unknown month '{value}' (have {labels[0]} to {labels[-1]})" if labels
+                             else f"Unknown month '{value}'")
+        if year and not matches:
+            raise ValueError(f"No data for '{value}' (have {labels[0]} to {labels[-1]})" if labels
+                             else f"No data for '{value}'")
+        resolved += matches
+    return resolved
+
+
+def _resolve_days(values: List[str]) -> List[str]:
+    resolved = []
+    for value in values:
+        token = str(value).strip().lower()
+        if token in DAY_GROUPS:
+            resolved += DAY_GROUPS[token]
+            continue
+        matches = [day for day in DAYS_OF_WEEK if len(token) >= 2 and day.lower().startswith(token[:3])]
+        if not matches:
+            raise ValueError(f"Unknown day of week '{value}'")
+        resolved += matches
+    return resolved
+
+
+def _resolve_names(values: List[str], labels: List[str], dim: str) -> List[str]:
+    """Case-insensitive match, then typo-tolerant for shows."""
+    by_lower = {label.lower(): label for label in labels}
+    resolved = []
+    for value in values:
+        label = by_lower.get(str(value).strip().lower())
+        if label is None and dim == "show":
+            candidates = get_show_index(labels).match(str(value), limit=1)
+            if candidates and candidates[0]["similarity"] >= MATCH_THRESHOLD:
+                label = candidates[0]["show_name"]
+        if label is None:
+            raise ValueError(f"Unknown {dim} '{value}'" + (f" (have: {', '.join(labels[:15])})" if dim == "genre" else ""))
+        resolved.append(label)
+    return resolved
+
+
+def query_viewing_rollup(
+    file_path: str,
+    group_by: Optional[List[str]] = None,
+    months: Optional[List[str]] = None,
+    genres: Optional[List[str]] = None,
+    days_of_week: Optional[List[str]] = None,
+    hours: Optional[List[int]] = None,
+    shows: Optional[List[str]] = None,
+    user_id: Optional[str] = None,
+    limit: int = 20
+) -> Dict[str, Any]:
+    """
+    Slices viewing totals by any combination of month, genre, day of week, hour and show.
+
+    CUSTOM TOOL for ad-hoc analytics questions.
+
+    Args:
+        file_path: Path to the CSV file, or dataset://<id> for an uploaded dataset
+        group_by: Break totals down by any of "month", "genre", "day_of_week", "hour", "show"
+        months: "2024-07", month names ("July", "March 2023") or quarters ("Q3", "2024-Q3")
+        genres: Genres to include
+        days_of_week: Day names, "weekend" or "weekday"
+        hours: Starting hours to include (0-23), e.g. [21, 22, 23, 0, 1] for late nights
+        shows: Shows to include (typos are fine)
+        user_id: User to look at (optional for single-user histories)
+        limit: Maximum number of groups returned, by minutes watched
+
+    Returns:
+        Totals (minutes, hours, views, completed, rewatches) for the slice and per group
+    """
+    try:
+        started = time.perf_counter()
+        cube = materialize_rollup(file_path)
+        group_by = list(group_by or [])
+        unknown = [dim for dim in group_by if dim not in DIMENSIONS or dim == "user"]
+        if unknown:
+            return {"success": False, "error": f"Cannot group by {unknown}; use {list(DIMENSIONS[1:])}"}
+
+        requested = {
+            "month": _resolve_months(months, cube.labels["month"]) if months else None,
+            "genre": _resolve_names(genres, cube.labels["genre"], "genre") if genres else None,
+            "day_of_week": _resolve_days(days_of_week) if days_of_week else None,
+            "hour": [int(h) % 24 for h in hours] if hours else None,
+            "show": _resolve_names(shows, cube.labels["show"], "show") if shows else None,
+        }
+        if user_id is not None:
+            if user_id not in cube.labels["user"]:
+                return {"success": False, "error": f"Unknown user: {user_id}"}
+            requested["user"] = [user_id]
+        elif len(cube.labels["user"]) > 1:
+            return {"success": False, "error": "This history has several users; pass user_id"}
+
+        filters = {}
+        for dim, values in requested.items():
+            if values is not None:
+                positions = {label: i for i, label in enumerate(cube.labels[dim])}
+                filters[dim] = [positions[v] for v in dict.fromkeys(values) if v in positions]
+
+        result = cube.query(filters, group_by, limit)
+        for row in [result["totals"]] + result["groups"]:
+            row["minutes"] = round(row["minutes"], 1)
+            row["hours"] = round(row["minutes"] / 60, 2)
+        return {
+            "success": True,
+            "filters": {dim: values for dim, values in requested.items() if values is not None and dim != "user"},
+            "totals": result["totals"],
+            "groups": result["groups"],
+            "query_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
@@ -0,0 +1,155 @@
+"""
+Custom Tools for Viewing Session Reconstruction
+KEY CONCEPT: Vectorized sessionization from timestamps
+
+Real MyAstro exports often lack a session_id column or assign it
+inconsistently. Sessions are rebuilt from each record's start time plus its
+duration: a new session starts whenever the idle gap since the previous
+episode ended exceeds a threshold. Works per user across multi-user frames
+with no Python-level loops.
+"""
+from typing import Dict, Any, List, Optional
+
+import pandas as pd
+
+from my_agent import config
+
+
+def reconstruct_sessions(
+    df: pd.DataFrame,
+    idle_minutes: Optional[float] = None,
+    user_column: str = "user_id"
+) -> pd.Series:
+    """
+    Assigns a session number to every viewing record.
+
+    Args:
+        df: Viewing records with a datetime-parsable 'date' column
+        idle_minutes: Gap (after the previous episode ended) that starts a new session
+        user_column: Column identifying the user (optional)
+
+    Returns:
+        Integer session numbers aligned with df's index
+    """
+    idle_minutes = config.SESSION_IDLE_MINUTES if idle_minutes is None else idle_minutes
+    if len(df) == 0:
+        return pd.Series([], index=df.index, dtype="int64")
+
+    users = df[user_column] if user_column in df.columns else pd.Series(0, index=df.index)
+    starts = pd.to_datetime(df["date"])
+    durations = (
+        pd.to_timedelta(df["duration_minutes"].fillna(0), unit="m")
+        if "duration_minutes" in df.columns else pd.Timedelta(0)
+    )
+
+    frame = pd.DataFrame({"user": users, "start": starts, "end": starts + durations})
+    frame = frame.sort_values(["user", "start"], kind="stable")
+
+    # Latest end so far per user handles overlapping records
+    latest_end = frame.groupby("user", sort=False)["end"].cummax()
+    previous_end = latest_end.groupby(frame["user"], sort=False).shift()
+    gap = frame["start"] - previous_end
+
+    new_session = previous_end.isna() | (gap > pd.Timedelta(minutes=idle_minutes))
+    session_numbers = new_session.cumsum().astype("int64")
+    return session_numbers.reindex(df.index)
+
+
+def session_table(
+    df: pd.DataFrame,
+    idle_minutes: Optional[float] = None,
+    user_column: str = "user_id",
+    sessions: Optional[pd.Series] = None
+) -> pd.DataFrame:
+    """
+    One row per reconstructed session.
+
+    Columns: user, start, end, episodes, watched_minutes, length_minutes
+    and shows (distinct show count). Pass sessions to reuse numbers from
+    reconstruct_sessions.
+    """
+    if sessions is None:
+        sessions = reconstruct_sessions(df, idle_minutes, user_column)
+    starts = pd.to_datetime(df["date"])
+    durations = df["duration_minutes"].fillna(0) if "duration_minutes" in df.columns else 0
+    frame = pd.DataFrame({
+        "session": sessions,
+        "user": df[user_column] if user_column in df.columns else 0,
+        "start": starts,
+        "end": starts + pd.to_timedelta(durations, unit="m"),
+        "minutes": durations,
+        "show_name": df["show_name"] if "show_name" in df.columns else "Unknown",
+    })
+
+    grouped = frame.groupby("session", sort=True)
+    table = grouped.agg(
+        user=("user", "first"),
+        start=("start", "min"),
+        end=("end", "max"),
+        episodes=("minutes", "size"),
+        watched_minutes=("minutes", "sum"),
+        shows=("show_name", "nunique"),
+    )
+    table["length_minutes"] = (table["end"] - table["start"]).dt.total_seconds() / 60
+    return table
+
+
+def get_session_stats(data: List[Dict[str, Any]], idle_minutes: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Rebuilds viewing sessions from timestamps and summarizes binge behavior.
+
+    CUSTOM TOOL for session analysis that doesn't rely on session_id.
+
+    Args:
+        data: List of viewing records
+        idle_minutes: Minutes of inactivity that end a session (SESSION_IDLE_MINUTES by default)
+
+    Returns:
+        Dictionary with session counts, length distribution and longest marathon
+    """
+    try:
+        idle_minutes = config.SESSION_IDLE_MINUTES if idle_minutes is None else idle_minutes
+        df = pd.DataFrame(data)
+        sessions = reconstruct_sessions(df, idle_minutes)
+        table = session_table(df, sessions=sessions)
+        if len(table) == 0:
+            return {
+                "success": True,
+                "total_sessions": 0,
+                "message": "No viewing sessions found"
+            }
+
+        marathon = table.loc[table["watched_minutes"].idxmax()]
+        marathon_rows = df.loc[sessions == marathon.name]
+        lengths = table["length_minutes"]
+        episodes = table["episodes"]
+
+        return {
+            "success": True,
+            "idle_minutes": idle_minutes,
+            "total_sessions": int(len(table)),
+            "avg_episodes_per_session": round(float(episodes.mean()), 2),
+            "episodes_per_session_distribution": {
+                str(k): int(v) for k, v in episodes.value_counts().sort_index().items()
+            },
+            "session_length_minutes": {
+                "median": round(float(lengths.median()), 1),
+                "p90": round(float(lengths.quantile(0.9)), 1),
+                "max": round(float(lengths.max()), 1)
+            },
+            "longest_marathon": {
+                "date": marathon["start"].strftime('%Y-%m-%d'),
+                "start_time": marathon["start"].strftime('%H:%M'),
+                "episodes": int(marathon["episodes"]),
+                "total_minutes": int(marathon["watched_minutes"]),
+                "shows": (
+                    marathon_rows["show_name"].value_counts().to_dict()
+                    if "show_name" in marathon_rows.columns else {}
+                )
+            }
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
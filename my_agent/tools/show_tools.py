@@ -0,0 +1,212 @@
+"""
+Custom Tools for Per-Show History
+KEY CONCEPT: One-pass per-show index with O(1) lookups
+
+Answers "When did I start watching X?" without scanning every record. The
+index holds first/last watched, episode count, total minutes, longest daily
+streak and season progression per show_name, and can be extended with new
+rows without rebuilding: uploads feed it each parsed batch as it arrives.
+Indexes are cached by dataset ID, so a lookup never rehashes the history.
+"""
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from my_agent import dataset_store
+from my_agent.tools.matching_tools import MATCH_THRESHOLD, get_show_index
+
+
+def _longest_streak(days: np.ndarray) -> Dict[str, Any]:
+    """Longest run of consecutive days in a sorted array of unique datetime64[D]."""
+    breaks = np.flatnonzero(np.diff(days).astype(int) != 1) + 1
+    starts = np.concatenate([[0], breaks])
+    ends = np.concatenate([breaks, [len(days)]])
+    best = int(np.argmax(ends - starts))
+    return {
+        "days": int(ends[best] - starts[best]),
+        "start": str(days[starts[best]]),
+        "end": str(days[ends[best] - 1]),
+    }
+
+
+class ShowHistoryIndex:
+    """
+    Per-show viewing history keyed by show_name.
+
+    Aggregates for a batch of rows are computed in one groupby and merged
+    into the existing entries, so new rows only touch the shows they mention.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._days: Dict[str, np.ndarray] = {}
+        self._seasons: Dict[str, Dict[int, Dict[str, Any]]] = {}
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "ShowHistoryIndex":
+        index = cls()
+        index.update(df)
+        return index
+
+    def update(self, df: pd.DataFrame):
+        """Merges new viewing rows into the index."""
+        if len(df) == 0 or 'show_name' not in df.columns:
+            return
+
+        dates = pd.to_datetime(df['date'])
+        batch = pd.DataFrame({
+            "show_name": df['show_name'],
+            "date": dates,
+            "day": dates.dt.floor('D'),
+            "minutes": df['duration_minutes'] if 'duration_minutes' in df.columns else 0,
+            "season": df['season'] if 'season' in df.columns else 0,
+            "episode": df['episode'] if 'episode' in df.columns else 0,
+        })
+
+        totals = batch.groupby('show_name').agg(
+            first=('date', 'min'),
+            last=('date', 'max'),
+            episodes=('date', 'size'),
+            minutes=('minutes', 'sum'),
+        )
+        # Rows without a season (movies, specials) count towards the totals only
+        seasons = batch.dropna(subset=['season']).groupby(['show_name', 'season']).agg(
+            first=('date', 'min'),
+            last=('date', 'max'),
+            episodes=('date', 'size'),
+            max_episode=('episode', 'max'),
+        )
+        days = batch[['show_name', 'day']].drop_duplicates().groupby('show_name')['day'].agg(list)
+
+        for show, row in totals.iterrows():
+            entry = self.entries.get(show)
+            if entry is None:
+                entry = self.entries[show] = {
+                    "show_name": show,
+                    "first_watched": row['first'],
+                    "last_watched": row['last'],
+                    "episode_count": 0,
+                    "total_minutes": 0,
+                }
+            entry["first_watched"] = min(entry["first_watched"], row['first'])
+            entry["last_watched"] = max(entry["last_watched"], row['last'])
+            entry["episode_count"] += int(row['episodes'])
+            entry["total_minutes"] += int(row['minutes'])
+
+            new_days = np.array(days[show], dtype='datetime64[D]')
+            merged = np.union1d(self._days.get(show, new_days[:0]), new_days)
+            self._days[show] = merged
+            entry["days_watched"] = int(len(merged))
+            entry["longest_daily_streak"] = _longest_streak(merged)
+
+        for (show, season), row in seasons.iterrows():
+            by_season = self._seasons.setdefault(show, {})
+            current = by_season.get(season)
+            # max_episode is NaN when no row of the season has an episode number
+            max_episode = None if pd.isna(row['max_episode']) else int(row['max_episode'])
+            if current is None:
+                by_season[season] = {
+                    "first": row['first'], "last": row['last'],
+                    "episodes": int(row['episodes']), "max_episode": max_episode,
+                }
+            else:
+                current["first"] = min(current["first"], row['first'])
+                current["last"] = max(current["last"], row['last'])
+                current["episodes"] += int(row['episodes'])
+                if max_episode is not None:
+                    current["max_episode"] = max(current["max_episode"] or 0, max_episode)
+
+        for show in totals.index:
+            self.entries[show]["season_progression"] = [
+                {
+                    "season": int(season),
+                    "first_watched": info["first"].strftime('%Y-%m-%d'),
+                    "last_watched": info["last"].strftime('%Y-%m-%d'),
+                    "episodes": info["episodes"],
+                    "furthest_episode": info["max_episode"],
+                }
+                for season, info in sorted(self._seasons.get(show, {}).items(), key=lambda item: item[1]["first"])
+            ]
+
+    def get(self, show_name: str) -> Optional[Dict[str, Any]]:
+        """Returns the history for one show (exact name), or None."""
+        entry = self.entries.get(show_name)
+        if entry is None:
+            return None
+        return {
+            **entry,
+            "first_watched": entry["first_watched"].strftime('%Y-%m-%d %H:%M'),
+            "last_watched": entry["last_watched"].strftime('%Y-%m-%d %H:%M'),
+        }
+
+
+_show_histories: "OrderedDict[str, ShowHistoryIndex]" = OrderedDict()
+_SHOW_HISTORY_CACHE_SIZE = 16
+
+
+def _cache_index(dataset_id: str, index: ShowHistoryIndex):
+    _show_histories[dataset_id] = index
+    _show_histories.move_to_end(dataset_id)
+    if len(_show_histories) > _SHOW_HISTORY_CACHE_SIZE:
+        _show_histories.popitem(last=False)
+
+
+def register_show_history(dataset_id: str, index: ShowHistoryIndex):
+    """Caches an index built incrementally (e.g. batch by batch during an upload)."""
+    _cache_index(dataset_id, index)
+
+
+def get_show_history_index(file_path: str) -> ShowHistoryIndex:
+    """Returns the (cached) per-show index for a dataset."""
+    dataset_id = dataset_store.dataset_id_for(file_path)
+    index = _show_histories.get(dataset_id)
+    if index is None:
+        index = ShowHistoryIndex.from_dataframe(dataset_store.load_viewing_frame(file_path))
+    _cache_index(dataset_id, index)
+    return index
+
+
+def get_show_history(file_path: str, show_name: str) -> Dict[str, Any]:
+    """
+    Looks up when a show was started, finished and binged.
+
+    CUSTOM TOOL for per-show questions.
+
+    Args:
+        file_path: Path to the CSV file, or dataset://<id> for an uploaded dataset
+        show_name: Show to look up (typos and nicknames are fine)
+
+    Returns:
+        First/last watched, episode count, minutes, longest streak and seasons
+    """
+    try:
+        index = get_show_history_index(file_path)
+        history = index.get(show_name)
+        matched_name = show_name
+
+        if history is None:
+            candidates = get_show_index(index.entries).match(show_name, limit=3)
+            if not candidates or candidates[0]["similarity"] < MATCH_THRESHOLD:
+                return {
+                    "success": True,
+                    "found": False,
+                    "message": f"'{show_name}' doesn't appear in the viewing history",
+                    "did_you_mean": [c["show_name"] for c in candidates]
+                }
+            matched_name = candidates[0]["show_name"]
+            history = index.get(matched_name)
+
+        return {
+            "success": True,
+            "found": True,
+            "query": show_name,
+            "matched_show": matched_name,
+            **history
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
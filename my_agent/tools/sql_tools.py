@@ -0,0 +1,248 @@
+"""
+Custom Tools for SQL over Viewing Data
+KEY CONCEPT: Embedded read-only SQL with prepared statement caching
+
+One analytical question used to take a chain of narrow tool calls. Each
+dataset gets a SQLite copy of its viewing table (built once, stored next to
+the dataset, indexed on date, show and genre) that pattern_finder can query
+with arbitrary SELECTs. Queries run sandboxed: the database is opened
+read-only, an authorizer only allows reads, a progress handler enforces a
+time budget, and results are row-limited.
+
+Literal strings and compared numbers are turned into bound parameters, so
+the same question asked for another month or show reuses the connection's
+prepared statement (and query plan) instead of compiling it again.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+from my_agent import config, dataset_store
+
+# Bump when the table layout changes so stored databases are rebuilt
+SQL_SCHEMA_VERSION = 1
+SQL_SIDECAR = "sql"
+TABLE_NAME = "viewing"
+
+COLUMN_NOTES = {
+    "date": "TEXT 'YYYY-MM-DD HH:MM:SS', when the episode started",
+    "month": "TEXT 'YYYY-MM'",
+    "day_of_week": "TEXT, e.g. 'Saturday'",
+    "hour": "INTEGER 0-23, starting hour",
+    "duration_minutes": "minutes watched",
+    "completed": "INTEGER 0/1",
+    "is_rewatch": "INTEGER 0/1",
+}
+
+_ALLOWED_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+# String literals, and numbers right after a comparison operator
+_LITERAL = re.compile(r"'(?:[^']|'')*'|(?<=[=<>])\s*-?\d+(?:\.\d+)?\b")
+
+
+def _build_database(file_path: str, path: str):
+    """Writes the dataset's viewing table to a new SQLite file."""
+    df = dataset_store.load_viewing_frame(file_path).copy()
+    dates = df["date"] = df["date"].astype("datetime64[ns]")
+    df["month"] = dates.dt.strftime("%Y-%m")
+    df["day_of_week"] = dates.dt.day_name()
+    df["hour"] = dates.dt.hour
+    df["date"] = dates.dt.strftime("%Y-%m-%d %H:%M:%S")
+    for column in ("completed", "is_rewatch"):
+        if column in df.columns:
+            df[column] = df[column].fillna(False).astype(bool).astype(int)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        df.to_sql(TABLE_NAME, conn, index=False)
+        for column in ("date", "show_name", "genre", "month"):
+            if column in df.columns:
+                conn.execute(f"CREATE INDEX idx_{column} ON {TABLE_NAME} ({column})")
+        conn.execute(f"PRAGMA user_version = {SQL_SCHEMA_VERSION}")
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+
+
+def _authorize(action, arg1, arg2, db_name, trigger):
+    return sqlite3.SQLITE_OK if action in _ALLOWED_ACTIONS else sqlite3.SQLITE_DENY
+
+
+class SqlSandbox:
+    """
+    Read-only connection to one dataset's SQLite table.
+
+    Connections aren't shared between threads, so each thread opens its
+    own (see get_sandbox); each keeps its own prepared statement cache.
+    """
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(
+            f"file:{path}?mode=ro", uri=True,
+            cached_statements=config.SQL_STATEMENT_CACHE_SIZE
+        )
+        self.schema = [
+            {"name": row[1], "type": row[2] or "TEXT"}
+            for row in self.conn.execute(f"PRAGMA table_info({TABLE_NAME})")
+        ]
+        self.conn.execute("PRAGMA query_only = ON")
+        # A single randomblob()/zeroblob() call can't be interrupted by the
+        # progress handler, so cap how large any string or blob can get
+        self.conn.setlimit(sqlite3.SQLITE_LIMIT_LENGTH, config.SQL_MAX_VALUE_BYTES)
+        self.conn.set_authorizer(_authorize)
+        self._deadline = 0.0
+        self.conn.set_progress_handler(lambda: time.perf_counter() > self._deadline, 1000)
+        # Statement shapes this connection has prepared (sqlite3 caches the statements themselves)
+        self.shapes: Counter = Counter()
+
+    def execute(self, query: str, limit: int) -> Dict[str, Any]:
+        shape, params = parameterize(query)
+        cached = shape in self.shapes
+        if not cached and len(self.shapes) >= config.SQL_STATEMENT_CACHE_SIZE:
+            self.shapes.clear()  # Roughly tracks sqlite3's LRU without mirroring it
+        self.shapes[shape] += 1
+        self._deadline = time.perf_counter() + config.SQL_TIMEOUT_MS / 1000
+        cursor = self.conn.execute(shape, params)
+        try:
+            rows = cursor.fetchmany(limit + 1)
+        finally:
+            cursor.close()
+        return {
+            "columns": [d[0] for d in cursor.description or []],
+            "rows": [[_cell(value) for value in row] for row in rows[:limit]],
+            "truncated": len(rows) > limit,
+            "statement_cached": cached,
+        }
+
+
+def _cell(value: Any) -> Any:
+    """A returned value, with blobs described and long text cut to SQL_MAX_CELL_CHARS."""
+    if isinstance(value, bytes):
+        return f"<blob, {len(value)} bytes>"
+    if isinstance(value, str) and len(value) > config.SQL_MAX_CELL_CHARS:
+        return value[:config.SQL_MAX_CELL_CHARS] + f"... ({len(value)} chars)"
+    return value
+
+
+def parameterize(query: str) -> Tuple[str, List[Any]]:
+    """
+    Replaces literal values with ? placeholders.
+
+    Only string literals (not 'quoted' aliases) and numbers compared with
+    =, <, > are bound, so GROUP BY 1 or LIMIT 10 keep their meaning.
+    """
+    params: List[Any] = []
+
+    def bind(match):
+        token = match.group().strip()
+        if re.search(r"\bAS\s*$", match.string[:match.start()], re.IGNORECASE):
+            return match.group()  # SQLite accepts 'quoted' column aliases
+        if token.startswith("'"):
+            params.append(token[1:-1].replace("''", "'"))
+        else:
+            params.append(float(token) if "." in token else int(token))
+        return " ?" if match.group()[0].isspace() else "?"
+
+    return _LITERAL.sub(bind, query.strip().rstrip(";")), params
+
+
+_local = threading.local()
+_build_lock = threading.Lock()
+
+
+def get_sandbox(file_path: str) -> SqlSandbox:
+    """This thread's sandbox for a dataset, building its SQLite file if needed."""
+    dataset_id = dataset_store.dataset_id_for(file_path)
+    sandboxes: Dict[str, SqlSandbox] = getattr(_local, "sandboxes", None)
+    if sandboxes is None:
+        sandboxes = _local.sandboxes = {}
+    sandbox = sandboxes.get(dataset_id)
+    if sandbox is not None:
+        return sandbox
+
+    path = dataset_store.sidecar_path(dataset_id, SQL_SIDECAR, "sqlite")
+    with _build_lock:
+        if not os.path.exists(path) or _schema_version(path) != SQL_SCHEMA_VERSION:
+            _build_database(file_path, path)
+    sandbox = sandboxes[dataset_id] = SqlSandbox(path)
+    return sandbox
+
+
+def _schema_version(path: str) -> Optional[int]:
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+
+
+def describe_table(sandbox: SqlSandbox) -> List[Dict[str, str]]:
+    return [
+        {**column, **({"note": COLUMN_NOTES[column["name"]]} if column["name"] in COLUMN_NOTES else {})}
+        for column in sandbox.schema
+    ]
+
+
+def run_sql_query(file_path: str, query: str, limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Runs a read-only SQL SELECT over the user's viewing table.
+
+    CUSTOM TOOL for arbitrary aggregates in one call.
+
+    Args:
+        file_path: Path to the CSV file, or dataset://<id> for an uploaded dataset
+        query: One SQLite SELECT over the table `viewing`
+        limit: Maximum rows returned (capped at SQL_MAX_ROWS)
+
+    Returns:
+        Column names and rows (truncated flag if the limit was hit); on
+        errors, the message and the table's schema
+    """
+    limit = max(1, min(limit or config.SQL_MAX_ROWS, config.SQL_MAX_ROWS))
+    sandbox = None
+    try:
+        started = time.perf_counter()
+        sandbox = get_sandbox(file_path)
+        result = sandbox.execute(query, limit)
+        return {
+            "success": True,
+            **result,
+            "row_count": len(result["rows"]),
+            "query_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+    except sqlite3.DatabaseError as e:
+        message = str(e)
+        if message == "interrupted":
+            message = f"Query took longer than {config.SQL_TIMEOUT_MS:.0f} ms and was stopped"
+        elif message == "string or blob too big":
+            message = f"Query built a value over {config.SQL_MAX_VALUE_BYTES} bytes and was stopped"
+        elif message == "not authorized":
+            message = "Only read-only SELECT queries over the viewing table are allowed"
+        response = {"success": False, "error": message}
+        if sandbox is not None:
+            response.update({"table": TABLE_NAME, "schema": describe_table(sandbox)})
+        return response
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
+def sql_stats() -> Dict[str, Any]:
+    """Statement shapes prepared by this thread's connections, per dataset."""
+    return {
+        dataset_id: {"shapes": len(sandbox.shapes), "executions": sum(sandbox.shapes.values())}
+        for dataset_id, sandbox in getattr(_local, "sandboxes", {}).items()
+    }
@@ -0,0 +1,114 @@
+"""
+Trace Report
+KEY CONCEPT: Where did a request's time go?
+
+Reads the spans written with TRACING_EXPORTER=file (see tracing.py) and
+prints each request's span tree - HTTP request, agent turns, model calls,
+tools - with start offsets, durations, token usage and our myyear.*
+attributes. Spans on the critical path are marked with *.
+
+Usage:
+    python -m my_agent.trace_report                 # latest trace in TRACE_FILE
+    python -m my_agent.trace_report traces.jsonl --last 5
+"""
+import argparse
+import json
+from typing import Dict, Any, List
+
+from my_agent import config
+from my_agent.tracing import ATTRIBUTE_PREFIX
+
+TOKEN_ATTRIBUTES = ("gen_ai.usage.input_tokens", "gen_ai.usage.output_tokens")
+
+
+def load_traces(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Spans grouped by trace ID."""
+    traces: Dict[str, List[Dict[str, Any]]] = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                span = json.loads(line)
+                traces.setdefault(span["trace_id"], []).append(span)
+    return traces
+
+
+def _children(spans: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    children: Dict[str, List[Dict[str, Any]]] = {}
+    for span in spans:
+        children.setdefault(span["parent_id"], []).append(span)
+    return children
+
+
+def critical_path(spans: List[Dict[str, Any]], root: Dict[str, Any]) -> List[str]:
+    """
+    Span IDs on the critical path under root.
+
+    Walking back from a span's end, the child that finished last is the one
+    it was waiting on; before that child started, the previous child to
+    finish was being waited on, and so on. Repeated down the tree.
+    """
+    children = _children(spans)
+    path: List[str] = []
+
+    def walk(span):
+        path.append(span["span_id"])
+        cursor = span["end_ns"]
+        for child in sorted(children.get(span["span_id"], []), key=lambda s: s["end_ns"], reverse=True):
+            if child["end_ns"] <= cursor:
+                walk(child)
+                cursor = child["start_ns"]
+
+    walk(root)
+    return path
+
+
+def format_trace(spans: List[Dict[str, Any]]) -> str:
+    """Indented span tree of one trace; * marks the critical path."""
+    ids = {s["span_id"] for s in spans}
+    roots = sorted((s for s in spans if s["parent_id"] not in ids), key=lambda s: s["start_ns"])
+    children = _children(spans)
+    origin = min(s["start_ns"] for s in spans)
+    on_path = {span_id for root in roots for span_id in critical_path(spans, root)}
+
+    lines = [f"{'':2}{'offset':>10}{'duration':>11}  span"]
+
+    def walk(span, depth):
+        attrs = {k[len(ATTRIBUTE_PREFIX):]: v for k, v in span["attributes"].items() if k.startswith(ATTRIBUTE_PREFIX)}
+        for key in TOKEN_ATTRIBUTES:
+            if key in span["attributes"]:
+                attrs[key.rsplit(".", 1)[1]] = span["attributes"][key]
+        events = [e["name"] for e in span.get("events", [])]
+        detail = " ".join(f"{k}={v}" for k, v in attrs.items())
+        if events:
+            detail += f" events={','.join(events)}"
+        marker = "*" if span["span_id"] in on_path else " "
+        offset = (span["start_ns"] - origin) / 1e6
+        lines.append(f"{marker} {offset:>8.1f}ms {span['duration_ms']:>8.1f}ms  {'  ' * depth}{span['name']}  {detail}".rstrip())
+        for child in sorted(children.get(span["span_id"], []), key=lambda s: s["start_ns"]):
+            walk(child, depth + 1)
+
+    for root in roots:
+        walk(root, 0)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print traces exported with TRACING_EXPORTER=file")
+    parser.add_argument("path", nargs="?", default=config.TRACE_FILE)
+    parser.add_argument("--last", type=int, default=1, help="Number of most recent traces to print")
+    parser.add_argument("--trace-id", help="Print this trace only")
+    args = parser.parse_args()
+
+    traces = load_traces(args.path)
+    if args.trace_id:
+        selected = [args.trace_id]
+    else:
+        selected = sorted(traces, key=lambda t: min(s["start_ns"] for s in traces[t]))[-args.last:]
+    for trace_id in selected:
+        print(f"trace {trace_id} ({len(traces[trace_id])} spans)")
+        print(format_trace(traces[trace_id]))
+        print()
+
+
+if __name__ == "__main__":
+    main()
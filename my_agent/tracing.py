@@ -0,0 +1,203 @@
+"""
+Distributed Tracing for MyYear.AI
+KEY CONCEPT: One trace per request, across agent delegation and tool calls
+
+ADK already emits OpenTelemetry spans for each invocation, agent turn
+(invoke_agent), model call (call_llm / generate_content, with token usage)
+and tool execution (execute_tool). This module:
+- installs a tracer provider exporting to a local JSONL file, the console
+  or an OTLP collector (TRACING_EXPORTER; "none" keeps tracing off)
+- adds a root span per HTTP request, so a /chat/stream request's agents,
+  model calls and tools form one trace
+- adds our own attributes: admission queue wait, retries and hedges of
+  model calls, rows scanned and memo cache hits of tools, compaction
+
+Exported file traces can be read with trace_report.py.
+"""
+import json
+import logging
+import os
+import threading
+from typing import Dict, Any, Optional, Sequence
+
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor, ConsoleSpanExporter, SpanExporter, SpanExportResult
+)
+
+from my_agent import config
+
+logger = logging.getLogger(__name__)
+
+tracer = trace.get_tracer("myyear")
+ATTRIBUTE_PREFIX = "myyear."
+
+_setup_done = False
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Appends one compact JSON object per finished span to a file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = []
+        for span in spans:
+            lines.append(json.dumps({
+                "trace_id": format(span.context.trace_id, "032x"),
+                "span_id": format(span.context.span_id, "016x"),
+                "parent_id": format(span.parent.span_id, "016x") if span.parent else None,
+                "name": span.name,
+                "start_ns": span.start_time,
+                "end_ns": span.end_time,
+                "duration_ms": round((span.end_time - span.start_time) / 1e6, 3),
+                "status": span.status.status_code.name,
+                "attributes": dict(span.attributes or {}),
+                "events": [
+                    {"name": e.name, "time_ns": e.timestamp, "attributes": dict(e.attributes or {})}
+                    for e in span.events
+                ],
+            }, default=str))
+        with self._lock, open(self.path, "a") as f:
+            f.write("".join(line + "\n" for line in lines))
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+
+def _otlp_exporter() -> Optional[SpanExporter]:
+    # Optional dependency: opentelemetry-exporter-otlp (endpoint from OTEL_EXPORTER_OTLP_*)
+    try:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        try:
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning("TRACING_EXPORTER=otlp needs opentelemetry-exporter-otlp; tracing disabled")
+            return None
+    return OTLPSpanExporter()
+
+
+def setup_tracing() -> bool:
+    """
+    Installs the global tracer provider for TRACING_EXPORTER (once).
+
+    Returns whether spans are being exported.
+    """
+    global _setup_done
+    if _setup_done:
+        return isinstance(trace.get_tracer_provider(), TracerProvider)
+    _setup_done = True
+
+    exporter_name = config.TRACING_EXPORTER
+    if exporter_name in ("", "none"):
+        return False
+    if exporter_name == "file":
+        exporter = JsonLinesSpanExporter(config.TRACE_FILE)
+    elif exporter_name == "console":
+        exporter = ConsoleSpanExporter()
+    elif exporter_name == "otlp":
+        exporter = _otlp_exporter()
+    else:
+        raise ValueError(f"Unknown TRACING_EXPORTER: {exporter_name}")
+    if exporter is None:
+        return False
+
+    if not config.TRACE_CAPTURE_CONTENT:
+        # Tool results carry the user's whole viewing history; keep it out of span attributes
+        os.environ.setdefault("ADK_CAPTURE_MESSAGE_CONTENT_IN_SPANS", "false")
+    provider = TracerProvider(resource=Resource.create({"service.name": config.TRACE_SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    return True
+
+
+def annotate_span(**attributes):
+    """Adds myyear.* attributes to the current span (a no-op when tracing is off)."""
+    span = trace.get_current_span()
+    if span.is_recording():
+        span.set_attributes({
+            ATTRIBUTE_PREFIX + key: value for key, value in attributes.items() if value is not None
+        })
+
+
+def add_span_event(name: str, **attributes):
+    """Adds an event with myyear.* attributes to the current span, if tracing."""
+    span = trace.get_current_span()
+    if span.is_recording():
+        span.add_event(name, {ATTRIBUTE_PREFIX + key: value for key, value in attributes.items() if value is not None})
+
+
+def annotate_tool_span(tool, args: Dict[str, Any], tool_context, tool_response) -> Optional[Dict]:
+    """
+    after_tool_callback: records rows scanned and success on the tool's span.
+
+    Returns None so the tool's response is used unchanged.
+    """
+    span = trace.get_current_span()
+    if not span.is_recording():
+        return None
+    rows = None
+    if isinstance(args.get("data"), list):
+        rows = len(args["data"])
+    elif isinstance(tool_response, dict):
+        rows = tool_response.get("total_rows")
+    annotate_span(**{
+        "tool.rows_scanned": rows,
+        "tool.success": tool_response.get("success") if isinstance(tool_response, dict) else None,
+    })
+    return None
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening a root span per HTTP request.
+
+    The span stays open until the last body chunk is sent, so a streamed
+    response's agent turns, model calls and tools are all its children.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not setup_tracing():
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        method = scope.get("method", "GET")
+        with tracer.start_as_current_span(
+            f"{method} {path}",
+            kind=trace.SpanKind.SERVER,
+            attributes={"http.request.method": method, "url.path": path},
+            end_on_exit=False,
+        ) as span:
+            first_body = True
+
+            async def send_wrapper(message):
+                nonlocal first_body
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.response.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.set_status(trace.Status(trace.StatusCode.ERROR))
+                await send(message)
+                if message["type"] == "http.response.body":
+                    if first_body:
+                        first_body = False
+                        span.add_event("first_body_chunk")
+                    if not message.get("more_body", False):
+                        span.end()
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                if span.is_recording():
+                    span.end()
+
@@ -0,0 +1,24 @@
+import pandas as pd
+
+from my_agent.tools.show_tools import ShowHistoryIndex
+
+
+def test_rows_without_season_or_episode():
+    index = ShowHistoryIndex.from_dataframe(pd.DataFrame({
+        "show_name": ["Some Movie", "Some Show", "Some Show"],
+        "date": ["2024-01-01 20:00", "2024-01-01 21:00", "2024-01-02 21:00"],
+        "duration_minutes": [90, 40, 40],
+        "season": [None, 1, 1],
+        "episode": [None, None, 3],
+    }))
+
+    movie = index.get("Some Movie")
+    assert movie["episode_count"] == 1
+    assert movie["total_minutes"] == 90
+    assert movie["season_progression"] == []
+
+    index.update(pd.DataFrame({
+        "show_name": ["Some Show"], "date": ["2024-01-03 21:00"], "season": [1], "episode": [None],
+    }))
+    seasons = index.get("Some Show")["season_progression"]
+    assert [(s["season"], s["episodes"], s["furthest_episode"]) for s in seasons] == [(1, 3, 3)]